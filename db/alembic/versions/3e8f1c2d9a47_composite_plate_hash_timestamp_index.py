@@ -0,0 +1,34 @@
+"""composite plate_hash timestamp index
+
+Revision ID: 3e8f1c2d9a47
+Revises: 97b047fbba19
+Create Date: 2026-10-18 09:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8f1c2d9a47'
+down_revision: Union[str, Sequence[str], None] = '97b047fbba19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction, building without it would block inserts
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_ingestion_schema_vehicle_observations_plate_hash_timestamp'), 'vehicle_observations', ['plate_hash', 'timestamp'], unique=False, schema='ingestion_schema', postgresql_concurrently=True)
+        # the composite index serves every lookup by plate_hash, the timestamp index stays for range queries
+        op.drop_index(op.f('ix_ingestion_schema_vehicle_observations_plate_hash'), table_name='vehicle_observations', schema='ingestion_schema', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_ingestion_schema_vehicle_observations_plate_hash'), 'vehicle_observations', ['plate_hash'], unique=False, schema='ingestion_schema', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_ingestion_schema_vehicle_observations_plate_hash_timestamp'), table_name='vehicle_observations', schema='ingestion_schema', postgresql_concurrently=True)
@@ -0,0 +1,326 @@
+"""Microbenchmarks of the ingestion handlers, compared against the previous run
+
+Times single calls of the handler methods a detection passes through: parsing a
+recognizer result, the municipality lookup, plate hashing, the insert that skips plates
+stored within the duplicate interval against a seeded table and the single row insert.
+Every case reports calls per second and the p50/p99 latency of a call. The results are
+stored in a baseline file, and the next run flags cases whose throughput dropped or
+whose p50 grew by more than the threshold, exiting with status 1. A run with
+regressions leaves the baseline alone unless `--update-baseline` accepts its results.
+
+The database cases write rows far in the past into the configured database and delete
+them afterwards, `--skip-db` leaves them out. Run from the service directory:
+
+    python -m benchmarks.ingestion_handlers --municipalities ../../shared-data/municipalities.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+
+from sqlalchemy import delete, insert
+
+from src.config import settings
+from src.db.session import get_db
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.handlers.country_handler import CountryHandler
+from src.handlers.database_handler import OBSERVATION_COLUMNS, DatabaseHandler
+from src.models.vehicle_observation import VehicleObservation
+from src.schemas.vehicle_observation import VehicleObservationRecord
+
+# rows are written far in the past so they never collide with real observations
+BENCHMARK_EPOCH = datetime(1972, 1, 1, tzinfo=timezone.utc)
+SEED_SPAN = timedelta(days=30)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'ingestion_handlers.json')
+
+# recognizer regions with a plate prefix of theirs, 'de' has no municipality codes and 'unknown' is guessed
+REGIONS = (('at', 'w'), ('at', 'gu'), ('at', 'kl'), ('si', 'lj'), ('si', 'mb'), ('de', 'm'), ('unknown', 'lj'))
+COLORS = ('white', 'black', 'silver', 'blue', 'red')
+MAKES = (('volkswagen', 'golf'), ('skoda', 'octavia'), ('bmw', '3-series'), ('renault', 'clio'))
+
+
+@dataclass(slots=True)
+class Result:
+    """timings of one case"""
+
+    iterations: int
+    ops_per_sec: float
+    p50_us: float
+    p99_us: float
+
+
+def random_plate(prefix: str) -> str:
+    """a plate as the recognizer returns it, lower case without separators"""
+    digits = ''.join(random.choices(string.digits, k=random.randint(2, 4)))
+    return prefix + digits + ''.join(random.choices(string.ascii_lowercase, k=random.randint(1, 2)))
+
+
+def make_vehicle(plate: str, region: str) -> dict:
+    """one entry of `results` with every field Plate Recognizer returns for it"""
+    make, model = random.choice(MAKES)
+    score = round(random.uniform(0.7, 0.99), 3)
+    return {
+        'box': {'xmin': 512, 'ymin': 734, 'xmax': 638, 'ymax': 768},
+        'plate': plate,
+        'region': {'code': region, 'score': round(random.uniform(0.5, 0.95), 3)},
+        'score': score,
+        'candidates': [{'score': score, 'plate': plate}, {'score': round(score - 0.1, 3), 'plate': plate[:-1]}],
+        'dscore': round(random.uniform(0.6, 0.95), 3),
+        'vehicle': {
+            'score': round(random.uniform(0.6, 0.95), 3),
+            'type': random.choice(('Sedan', 'SUV', 'Van', 'Pickup Truck')),
+            'box': {'xmin': 300, 'ymin': 420, 'xmax': 910, 'ymax': 880},
+        },
+        'model_make': [{'make': make, 'model': model, 'score': 0.42}],
+        'color': [{'color': color, 'score': 0.3} for color in random.sample(COLORS, 3)],
+        'orientation': [
+            {'orientation': 'Front', 'score': 0.91},
+            {'orientation': 'Rear', 'score': 0.07},
+            {'orientation': 'Unknown', 'score': 0.02},
+        ],
+    }
+
+
+def make_result(vehicles: int) -> dict:
+    """a recognizer result for one snapshot"""
+    return {
+        'processing_time': 112.4,
+        'results': [
+            make_vehicle(random_plate(prefix), region) for region, prefix in random.choices(REGIONS, k=vehicles)
+        ],
+        'filename': '0912_k0Nn7_snapshot.jpg',
+        'version': 1,
+        'camera_id': None,
+        'timestamp': '2025-09-30T09:12:08.261484Z',
+    }
+
+
+def make_record(plate: str, timestamp: datetime, region: str = 'at') -> VehicleObservationRecord:
+    """a parsed observation with its plate hash set"""
+    return VehicleObservationRecord(
+        plate=plate,
+        plate_score=910,
+        country_code=region,
+        vehicle_type='Sedan',
+        make='volkswagen',
+        model='golf',
+        color='white',
+        orientation=VehicleOrientation.FRONT,
+        timestamp=timestamp,
+        plate_hash=sha256(plate.encode('utf-8')).digest(),
+    )
+
+
+def measure(call: Callable, inputs: list, warmup: int) -> Result:
+    """times `call` once per input, the first `warmup` calls are not measured"""
+    for argument in inputs[:warmup]:
+        call(argument)
+    measured = inputs[warmup:]
+    timings = []
+    clock = time.perf_counter_ns
+    start = clock()
+    for argument in measured:
+        call_start = clock()
+        call(argument)
+        timings.append(clock() - call_start)
+    elapsed = (clock() - start) / 1e9
+    timings.sort()
+    count = len(timings)
+    return Result(
+        iterations=count,
+        ops_per_sec=count / elapsed,
+        p50_us=timings[count // 2] / 1000,
+        p99_us=timings[min(count - 1, int(count * 0.99))] / 1000,
+    )
+
+
+def bench_new_observation(iterations: int, warmup: int) -> Result:
+    handler = DatabaseHandler()
+    detection_time = datetime.now(timezone.utc)
+    # one to four vehicles per snapshot, as at a busy entrance
+    results = [make_result(random.randint(1, 4)) for _ in range(256)]
+    inputs = [results[index % len(results)] for index in range(warmup + iterations)]
+    return measure(lambda result: handler.new_observation(result, detection_time), inputs, warmup)
+
+
+def bench_municipality(country_handler: CountryHandler, iterations: int, warmup: int) -> Result:
+    now = datetime.now(timezone.utc)
+    # the lookup updates the records in place, so every call gets a fresh one
+    inputs = []
+    for _ in range(warmup + iterations):
+        region, prefix = random.choice(REGIONS)
+        inputs.append(make_record(random_plate(prefix), now, region))
+    return measure(country_handler.get_municipality_and_fix_country, inputs, warmup)
+
+
+def bench_hash_plate(iterations: int, warmup: int) -> Result:
+    handler = DatabaseHandler()
+    now = datetime.now(timezone.utc)
+    records = [make_record(random_plate(prefix), now, region) for region, prefix in random.choices(REGIONS, k=1024)]
+    inputs = [records[index % len(records)] for index in range(warmup + iterations)]
+    return measure(handler.hash_plate, inputs, warmup)
+
+
+def seed_observations(rows: int) -> list[VehicleObservationRecord]:
+    """inserts `rows` observations spread over `SEED_SPAN` after the epoch"""
+    records = [
+        make_record(f'seed{index}', BENCHMARK_EPOCH + SEED_SPAN * random.random(), random.choice(('at', 'si')))
+        for index in range(rows)
+    ]
+    with get_db() as db:
+        for chunk in range(0, rows, 5000):
+            db.execute(
+                insert(VehicleObservation),
+                [
+                    {name: getattr(record, name) for name in OBSERVATION_COLUMNS}
+                    for record in records[chunk : chunk + 5000]
+                ],
+            )
+        db.commit()
+    return records
+
+
+def bench_insert_unless_recent(seeded: list[VehicleObservationRecord], iterations: int, warmup: int) -> Result:
+    handler = DatabaseHandler()
+    interval = timedelta(seconds=settings.interval_seconds)
+    # half of the calls find the seeded row of the plate and skip it, the others store a plate never seen
+    inputs = []
+    for index in range(warmup + iterations):
+        if index % 2:
+            record = random.choice(seeded)
+            inputs.append(make_record(record.plate, record.timestamp + interval * random.random()))
+        else:
+            inputs.append(make_record(f'unseen{index}', BENCHMARK_EPOCH + SEED_SPAN * random.random()))
+    with get_db() as db:
+        return measure(lambda record: handler.insert_unless_recent(db, [record], interval), inputs, warmup)
+
+
+def bench_create_observation_entry(iterations: int, warmup: int) -> Result:
+    handler = DatabaseHandler()
+    inputs = [
+        make_record(f'insert{index}', BENCHMARK_EPOCH + SEED_SPAN * random.random())
+        for index in range(warmup + iterations)
+    ]
+    with get_db() as db:
+        return measure(lambda record: handler.create_observation_entry(db, record), inputs, warmup)
+
+
+def cleanup() -> None:
+    with get_db() as db:
+        db.execute(
+            delete(VehicleObservation).where(
+                VehicleObservation.timestamp >= BENCHMARK_EPOCH,
+                VehicleObservation.timestamp < BENCHMARK_EPOCH + SEED_SPAN + timedelta(days=1),
+            )
+        )
+        db.commit()
+
+
+def load_baseline(path: str) -> dict | None:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path: str, results: dict[str, Result]) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    baseline = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'results': {name: asdict(result) for name, result in results.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+
+def change(current: float, previous: float) -> float:
+    return current / previous - 1 if previous else 0.0
+
+
+def report(results: dict[str, Result], baseline: dict | None, threshold: float) -> list[str]:
+    """prints the results next to the previous run and returns the regressed cases"""
+    previous = baseline['results'] if baseline else {}
+    regressions = []
+    print(f'{"case":<34} {"calls":>7} {"calls/s":>10} {"p50 µs":>9} {"p99 µs":>9} {"vs last":>8}')
+    for name, result in results.items():
+        line = (
+            f'{name:<34} {result.iterations:>7} {result.ops_per_sec:>10.0f} {result.p50_us:>9.2f} {result.p99_us:>9.2f}'
+        )
+        last = previous.get(name)
+        if last is not None:
+            throughput = change(result.ops_per_sec, last['ops_per_sec'])
+            line += f' {throughput:>+8.1%}'
+            if throughput < -threshold or change(result.p50_us, last['p50_us']) > threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20_000, help='measured calls of the in-memory cases')
+    parser.add_argument('--db-iterations', type=int, default=2_000, help='measured calls of the database cases')
+    parser.add_argument('--warmup', type=int, default=200, help='unmeasured calls before each case')
+    parser.add_argument('--seed-rows', type=int, default=100_000, help='observations seeded for the duplicate check')
+    parser.add_argument('--skip-db', action='store_true', help='only run the cases that need no database')
+    parser.add_argument(
+        '--municipalities', default='/app/shared-data/municipalities.json', help='municipality code file'
+    )
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results of the last run, replaced by this run')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown flagged as a regression, 0.1 is 10%%')
+    parser.add_argument('--no-save', action='store_true', help='compare without replacing the baseline')
+    parser.add_argument('--update-baseline', action='store_true', help='replace the baseline even if cases regressed')
+    parser.add_argument('--random-seed', type=int, default=0, help='seed of the generated inputs')
+    args = parser.parse_args()
+
+    random.seed(args.random_seed)
+    with open(args.municipalities, encoding='utf-8') as f:
+        country_handler = CountryHandler(data=json.load(f))
+
+    results = {
+        'new_observation': bench_new_observation(args.iterations, args.warmup),
+        'get_municipality_and_fix_country': bench_municipality(country_handler, args.iterations, args.warmup),
+        'hash_plate': bench_hash_plate(args.iterations, args.warmup),
+    }
+    if not args.skip_db:
+        cleanup()
+        try:
+            seeded = seed_observations(args.seed_rows)
+            results['insert_unless_recent'] = bench_insert_unless_recent(seeded, args.db_iterations, args.warmup)
+            results['create_observation_entry'] = bench_create_observation_entry(args.db_iterations, args.warmup)
+        finally:
+            cleanup()
+
+    baseline = load_baseline(args.baseline)
+    if baseline is not None:
+        print(f'compared with the run of {baseline["created"]} (python {baseline["python"]}, {baseline["machine"]})')
+    regressions = report(results, baseline, args.threshold)
+
+    # a regressed run must not become the reference the next run is compared with
+    if args.update_baseline or not (args.no_save or regressions):
+        # cases left out of this run keep their previous results
+        kept = {name: Result(**result) for name, result in (baseline or {}).get('results', {}).items()}
+        save_baseline(args.baseline, kept | results)
+    if regressions:
+        print(f'{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {", ".join(regressions)}')
+        if not args.update_baseline:
+            print('the baseline was kept, pass --update-baseline to accept these results')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Measures what logging a saved observation costs the calling thread
+
+Compares the former synchronous StreamHandler with an eagerly built f-string against
+the queue handler with `extra` fields, with and without sampling. Output goes to
+/dev/null, `--write-latency-us` delays every write to mimic a slow log sink such as a
+full container log pipe. Run from the service directory:
+
+    python -m benchmarks.logging_overhead --records 100000 --write-latency-us 50
+"""
+
+import argparse
+import logging
+import os
+import queue
+import time
+from datetime import datetime
+from hashlib import sha256
+from logging.handlers import QueueListener
+
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.logger import NonBlockingQueueHandler, SamplingFilter, TextFormatter, make_formatter
+
+PLATE_HASH = sha256(b'w123ab').digest()
+
+
+class SlowStream:
+    """file wrapper sleeping before every write, sleeping releases the GIL like blocking I/O does"""
+
+    def __init__(self, stream, latency: float):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def run_sync(records: int, stream) -> float:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(TextFormatter())
+    log = make_logger('bench.sync', handler)
+    start = time.perf_counter()
+    for index in range(records):
+        timestamp = datetime.now()
+        log.info(
+            f'Observation saved. ID: {index}, '
+            f'Timestamp: {timestamp}, '
+            f'Plate Hash: {PLATE_HASH.hex()} Conf.: 910, '
+            f'Country: at, '
+            f'Municipality: W, '
+            f'Vehicle Type: car, '
+            f'Make: VW, '
+            f'Model: Golf, '
+            f'Color: white, '
+            f'Orientation: {VehicleOrientation.FRONT.value}'
+        )
+    return time.perf_counter() - start
+
+
+def run_queued(records: int, stream, rate: float) -> tuple[float, float]:
+    """returns the time spent in the log calls and until the writer thread caught up"""
+    log_queue = queue.Queue(maxsize=records + 1)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter({'observation_saved': rate}))
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(make_formatter('json'))
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    log = make_logger(f'bench.queued.{rate}', handler)
+
+    start = time.perf_counter()
+    for index in range(records):
+        log.info(
+            'Observation saved',
+            extra={
+                'event': 'observation_saved',
+                'observation_id': index,
+                'timestamp': datetime.now(),
+                'plate_hash': PLATE_HASH,
+                'plate_score': 910,
+                'country_code': 'at',
+                'municipality': 'W',
+                'vehicle_type': 'car',
+                'make': 'VW',
+                'model': 'Golf',
+                'color': 'white',
+                'orientation': VehicleOrientation.FRONT,
+            },
+        )
+    caller = time.perf_counter() - start
+    listener.stop()
+    return caller, time.perf_counter() - start
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.handlers = [handler]
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    return log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100_000, help='log calls per run')
+    parser.add_argument('--write-latency-us', type=float, default=0, help='delay of every write to the log sink')
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull:
+        stream = SlowStream(devnull, args.write_latency_us / 1e6)
+        elapsed = run_sync(args.records, stream)
+        print(f'{"sync f-string":<20} {elapsed / args.records * 1e6:8.2f} us per call')
+        for rate in (1.0, 0.1):
+            caller, drained = run_queued(args.records, stream, rate)
+            print(
+                f'{f"queued json @ {rate}":<20} {caller / args.records * 1e6:8.2f} us per call  '
+                f'{drained:.3f}s until written'
+            )
+
+
+if __name__ == '__main__':
+    main()
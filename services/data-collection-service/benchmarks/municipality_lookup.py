@@ -0,0 +1,97 @@
+"""Measures municipality lookups per second over synthetic plates
+
+Plates are built from the codes in the municipality file followed by a random
+registration, plus a share of plates without a known code. The compiled municipality
+table of the CountryHandler, mapped from an artifact built the way the service builds
+it, is compared with the former probing of 2 and then 1 letter codes in one dict per
+country. No database is needed. Run from the service directory:
+
+    python -m benchmarks.municipality_lookup --plates 1000000 --municipalities ../../shared-data/municipalities.json
+"""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from src.handlers.country_handler import CountryHandler
+from src.handlers.municipality_table import MunicipalityTables
+
+
+def make_plates(handler: CountryHandler, count: int, unknown_share: float) -> list[tuple[str, str]]:
+    """builds `count` (country, plate) pairs, `unknown_share` of them without a known code"""
+    table = handler.municipalities.table
+    codes = {country: [code for code, _ in table.codes(country)] for country in table.countries}
+    countries = [country for country in codes if codes[country]]
+    plates = []
+    for _ in range(count):
+        country = random.choice(countries)
+        registration = ''.join(random.choices(string.digits, k=random.randint(2, 5)))
+        prefix = 'Q' if random.random() < unknown_share else random.choice(codes[country])
+        plates.append((country, prefix + registration))
+    return plates
+
+
+def build_dicts(handler: CountryHandler) -> dict[str, dict[str, str]]:
+    """flat code dicts per country as the former lookup used them"""
+    table = handler.municipalities.table
+    return {
+        country: {code: municipality.name for code, municipality in table.codes(country)} for country in table.countries
+    }
+
+
+def run_table(handler: CountryHandler, plates: list[tuple[str, str]]) -> tuple[float, int]:
+    matches = 0
+    start = time.perf_counter()
+    for country, plate in plates:
+        if handler.lookup(country, plate) is not None:
+            matches += 1
+    return time.perf_counter() - start, matches
+
+
+def run_dict_probe(dicts: dict[str, dict[str, str]], plates: list[tuple[str, str]]) -> tuple[float, int]:
+    matches = 0
+    start = time.perf_counter()
+    for country, plate in plates:
+        lookup = dicts[country]
+        if plate[:2] in lookup or plate[:1] in lookup:
+            matches += 1
+    return time.perf_counter() - start, matches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plates', type=int, default=1_000_000, help='number of synthetic plates')
+    parser.add_argument('--unknown-share', type=float, default=0.1, help='share of plates without a known code')
+    parser.add_argument(
+        '--municipalities', default='/app/shared-data/municipalities.json', help='municipality code file'
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # built the same way the service does when the shipped artifact is stale
+        tables = MunicipalityTables(
+            source=args.municipalities, artifact=os.path.join(directory, 'municipalities.bin'), watch_interval=0
+        )
+        handler = CountryHandler(municipalities=tables)
+        table = tables.table
+        for country in sorted(table.countries):
+            print(f'{country}: {len(table.codes(country))} codes, up to {table.max_length(country)} characters')
+
+        plates = make_plates(handler, args.plates, args.unknown_share)
+        runs = (
+            ('compiled table', lambda: run_table(handler, plates)),
+            ('2/1 dict probe', lambda: run_dict_probe(build_dicts(handler), plates)),
+        )
+        for name, runner in runs:
+            elapsed, matches = runner()
+            print(
+                f'{name:<16} {len(plates)} plates in {elapsed:.3f}s  '
+                f'{len(plates) / elapsed:10.0f} lookups/s  {matches} matched'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Compares per-row commits with the single-statement frame insert of the ingestion pipeline
+
+Writes real rows into the configured database and deletes them afterwards.
+Run from the service directory:
+
+    python -m benchmarks.observation_insert --frames 200 --vehicles 4
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+
+from sqlalchemy import delete
+
+from src.config import settings
+from src.db.session import get_db
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.handlers.database_handler import DatabaseHandler
+from src.models.vehicle_observation import VehicleObservation
+from src.schemas.vehicle_observation import VehicleObservationRecord
+
+# rows are written far in the past so they never collide with real observations
+BENCHMARK_EPOCH = datetime(1971, 1, 1, tzinfo=timezone.utc)
+
+
+def make_frames(frames: int, vehicles: int) -> list[list[VehicleObservationRecord]]:
+    """builds `frames` batches of `vehicles` distinct observations, no plate repeats so nothing is skipped"""
+    return [
+        [
+            VehicleObservationRecord(
+                plate='',
+                plate_hash=sha256(os.urandom(16)).digest(),
+                plate_score=900,
+                country_code='at',
+                municipality='W',
+                vehicle_type='car',
+                make='VW',
+                model='Golf',
+                color='white',
+                orientation=VehicleOrientation.FRONT,
+                timestamp=BENCHMARK_EPOCH + timedelta(seconds=frame),
+            )
+            for _ in range(vehicles)
+        ]
+        for frame in range(frames)
+    ]
+
+
+def run_per_row(handler: DatabaseHandler, frames: list[list[VehicleObservationRecord]]) -> float:
+    start = time.perf_counter()
+    with get_db() as db:
+        for frame in frames:
+            for observation in frame:
+                handler.create_observation_entry(db=db, observation=observation)
+    return time.perf_counter() - start
+
+
+def run_frame_insert(handler: DatabaseHandler, frames: list[list[VehicleObservationRecord]]) -> float:
+    interval = timedelta(seconds=settings.interval_seconds)
+    start = time.perf_counter()
+    with get_db() as db:
+        for frame in frames:
+            handler.insert_unless_recent(db=db, observations=frame, interval=interval)
+    return time.perf_counter() - start
+
+
+def cleanup() -> None:
+    with get_db() as db:
+        db.execute(delete(VehicleObservation).where(VehicleObservation.timestamp < BENCHMARK_EPOCH + timedelta(days=1)))
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=200, help='number of recognizer results to store')
+    parser.add_argument('--vehicles', type=int, default=4, help='observations per recognizer result')
+    args = parser.parse_args()
+
+    handler = DatabaseHandler()
+    rows = args.frames * args.vehicles
+
+    try:
+        for name, runner in (('per-row commits', run_per_row), ('frame insert', run_frame_insert)):
+            elapsed = runner(handler, make_frames(args.frames, args.vehicles))
+            print(
+                f'{name:<16} {rows} rows in {elapsed:.3f}s  '
+                f'{rows / elapsed:8.0f} rows/s  {elapsed / args.frames * 1000:.2f} ms/frame'
+            )
+            cleanup()
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Compares the observation record pipeline with the former pydantic model copies
+
+Both paths parse the same recognizer results, look up the municipality, hash the plate
+and build what the insert needs. The former path validated a raw model, copied it into
+a hashed model and copied that into the ORM object. The record path validates once and
+updates a slotted dataclass in place. No database is needed. Run from the service directory:
+
+    python -m benchmarks.observation_records --observations 100000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime
+from hashlib import sha256
+
+from pydantic import BaseModel, Field
+
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.handlers.country_handler import CountryHandler
+from src.handlers.database_handler import OBSERVATION_COLUMNS, DatabaseHandler
+from src.models.vehicle_observation import VehicleObservation
+
+PLATES = ('W123AB', 'KL456CD', 'LJ789EF', 'M12345', 'GU5XYZ')
+
+
+class LegacyObservationBase(BaseModel):
+    plate_score: int | None = None
+    country_code: str | None = Field(None, max_length=10)
+    municipality: str | None = Field(None, max_length=10)
+    vehicle_type: str | None = Field(None, max_length=30)
+    make: str | None = Field(None, max_length=30)
+    model: str | None = Field(None, max_length=50)
+    color: str | None = Field(None, max_length=30)
+    orientation: VehicleOrientation | None = None
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+
+class LegacyObservationRaw(LegacyObservationBase):
+    plate: str = Field(..., max_length=30)
+
+
+class LegacyObservationCreate(LegacyObservationBase):
+    plate_hash: bytes = Field(..., min_length=32, max_length=32)
+
+
+def make_result(vehicles: int) -> dict:
+    """builds a recognizer result with `vehicles` plates"""
+    return {
+        'results': [
+            {
+                'plate': PLATES[index % len(PLATES)],
+                'candidates': [{'score': 0.91}],
+                'region': {'code': 'at'},
+                'vehicle': {'type': 'car'},
+                'model_make': [{'make': 'VW', 'model': 'Golf'}],
+                'color': [{'color': 'white'}],
+                'orientation': [{'orientation': 'Front'}],
+            }
+            for index in range(vehicles)
+        ]
+    }
+
+
+def run_legacy(country_handler: CountryHandler, result: dict, frames: int) -> float:
+    start = time.perf_counter()
+    for _ in range(frames):
+        detection_time = datetime.now()
+        for observation in result['results']:
+            raw = LegacyObservationRaw(
+                plate=observation.get('plate', ''),
+                plate_score=int(observation['candidates'][0]['score'] * 1000),
+                country_code=observation.get('region', {}).get('code', ''),
+                municipality=None,
+                vehicle_type=observation.get('vehicle', {}).get('type', ''),
+                make=observation['model_make'][0]['make'],
+                model=observation['model_make'][0]['model'],
+                color=observation['color'][0]['color'],
+                orientation=VehicleOrientation(observation['orientation'][0]['orientation'].lower()),
+                timestamp=detection_time,
+            )
+            raw = country_handler.get_municipality_and_fix_country(observation=raw)
+            hashed = LegacyObservationCreate(
+                plate_hash=sha256(raw.plate.strip().lower().encode('utf-8')).digest(),
+                plate_score=raw.plate_score,
+                country_code=raw.country_code,
+                municipality=raw.municipality,
+                vehicle_type=raw.vehicle_type,
+                make=raw.make,
+                model=raw.model,
+                color=raw.color,
+                orientation=raw.orientation,
+                timestamp=raw.timestamp,
+            )
+            VehicleObservation(
+                plate_hash=hashed.plate_hash,
+                plate_score=hashed.plate_score,
+                country_code=hashed.country_code,
+                municipality=hashed.municipality,
+                vehicle_type=hashed.vehicle_type,
+                make=hashed.make,
+                model=hashed.model,
+                color=hashed.color,
+                orientation=hashed.orientation,
+                timestamp=hashed.timestamp,
+            )
+    return time.perf_counter() - start
+
+
+def run_records(country_handler: CountryHandler, result: dict, frames: int) -> float:
+    db_handler = DatabaseHandler()
+    start = time.perf_counter()
+    for _ in range(frames):
+        for observation in db_handler.new_observation(reader_result=result, detection_timestamp=datetime.now()):
+            observation = country_handler.get_municipality_and_fix_country(observation=observation)
+            observation = db_handler.hash_plate(observation=observation)
+            # the row insert_unless_recent sends to the database
+            tuple(getattr(observation, name) for name in OBSERVATION_COLUMNS)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--observations', type=int, default=100_000, help='number of observations per path')
+    parser.add_argument('--vehicles', type=int, default=4, help='observations per recognizer result')
+    parser.add_argument(
+        '--municipalities', default='/app/shared-data/municipalities.json', help='municipality code file'
+    )
+    args = parser.parse_args()
+
+    with open(args.municipalities, encoding='utf-8') as f:
+        country_handler = CountryHandler(data=json.load(f))
+    result = make_result(args.vehicles)
+    frames = args.observations // args.vehicles
+    rows = frames * args.vehicles
+
+    timings = {}
+    for name, runner in (('pydantic copies', run_legacy), ('records', run_records)):
+        # a short warm-up so the first path doesn't pay for lazy imports and caches
+        runner(country_handler, result, 10)
+        timings[name] = runner(country_handler, result, frames)
+        print(f'{name:<16} {rows} records in {timings[name]:.3f}s  {rows / timings[name]:10.0f} records/s')
+
+    print(f'speedup          {timings["pydantic copies"] / timings["records"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Compares recognizer latency and results of full frames with cropped and downscaled ones
+
+Every jpeg in the image directory is sent to the Plate Recognizer service twice, once
+as taken and once prepared by the SnapshotProcessor. Plates found in the full frame
+are the reference for the accuracy of the prepared one. Run from the service directory:
+
+    python -m benchmarks.snapshot_roi --images ./frames --region 0,0.4,1,1 --max-size 1280
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from src.config import settings
+from src.handlers.plate_recognizer_handler import PlateRecognizerHandler
+from src.handlers.recognizer_pool import RecognizerPool
+from src.pipeline.snapshot_processor import SnapshotProcessor
+
+CAMERA_NAME = 'benchmark'
+
+
+def plates(result: dict) -> set[str]:
+    return {entry['plate'].lower() for entry in result.get('results', [])}
+
+
+def recognize(handler: PlateRecognizerHandler, image_data: bytes) -> tuple[set[str], float]:
+    start = time.perf_counter()
+    result = handler.send_to_api(
+        api_key=settings.api_key,
+        image_data=image_data,
+        camera_name=CAMERA_NAME,
+    )
+    return plates(result), time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=Path, required=True, help='directory with jpeg snapshots')
+    parser.add_argument('--region', default='0,0,1,1', help='left,top,right,bottom as fractions of the frame')
+    parser.add_argument('--max-size', type=int, default=1280, help='maximum length of the longer edge')
+    parser.add_argument('--offline', action='store_true', help='only measure the local image processing')
+    args = parser.parse_args()
+
+    region = tuple(float(value) for value in args.region.split(','))
+    processor = SnapshotProcessor(regions={CAMERA_NAME: region}, max_size=args.max_size)
+    handler = PlateRecognizerHandler(recognizers=RecognizerPool(urls=settings.plate_recognizer_service_urls))
+
+    images = sorted(path for path in args.images.iterdir() if path.suffix.lower() in ('.jpg', '.jpeg'))
+    if not images:
+        parser.error(f'no jpeg images in {args.images}')
+
+    prepare_seconds, full_seconds, prepared_seconds = [], [], []
+    expected = found = extra = 0
+
+    for path in images:
+        image_data = path.read_bytes()
+
+        start = time.perf_counter()
+        prepared = processor.prepare(CAMERA_NAME, image_data)
+        prepare_seconds.append(time.perf_counter() - start)
+
+        if args.offline:
+            continue
+
+        full_plates, full_time = recognize(handler, image_data)
+        prepared_plates, prepared_time = recognize(handler, prepared)
+        full_seconds.append(full_time)
+        prepared_seconds.append(prepared_time)
+
+        expected += len(full_plates)
+        found += len(full_plates & prepared_plates)
+        extra += len(prepared_plates - full_plates)
+
+    processor.shutdown()
+    stats = processor.stats
+
+    print(f'images           {len(images)}')
+    kib_in, kib_out = stats['bytes_in'] / len(images) / 1024, stats['bytes_out'] / len(images) / 1024
+    print(f'upload size      {kib_in:.0f} KiB -> {kib_out:.0f} KiB')
+    print(f'prepare          {statistics.mean(prepare_seconds) * 1000:.1f} ms/image')
+    if not args.offline:
+        print(f'recognizer full  {statistics.mean(full_seconds) * 1000:.0f} ms/image')
+        print(f'recognizer roi   {statistics.mean(prepared_seconds) * 1000:.0f} ms/image')
+        recall = found / expected if expected else 1.0
+        print(f'accuracy         {found}/{expected} plates kept ({recall:.1%}), {extra} only found in the roi')
+
+
+if __name__ == '__main__':
+    main()
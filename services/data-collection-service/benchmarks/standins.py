@@ -0,0 +1,288 @@
+"""Local stand-ins for Surveillance Station and Plate Recognizer with configurable latency and errors
+
+The Surveillance Station stand-in answers the `auth.cgi` login and the `entry.cgi` camera
+list and snapshot calls for `--cameras` cameras named `load-cam-<n>`. Snapshots are
+coarse random block images, so consecutive snapshots of a camera always pass the change
+gate. The Plate Recognizer stand-in answers `/v1/plate-reader/` with results shaped like
+real ones, with fresh plates unless `--repeat-rate` reuses a recent one.
+
+Latencies are given in milliseconds as `50`, `uniform:20,80`, `exp:50` (mean) or
+`lognormal:120,0.5` (median and sigma). Errors are given as `code:share` pairs, HTTP
+status codes for Plate Recognizer and Synology api error codes for snapshots, where
+119 expires the session. Both serve their counters at `/stats`. Point the service at
+them with `SYNOLOGY_HOST=http://localhost:5001` and
+`PLATE_RECOGNIZER_SERVICE_URL=http://localhost:8081`. Run from the service directory:
+
+    python -m benchmarks.standins --recognizer-latency lognormal:120,0.4 --recognizer-errors 503:0.02
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import secrets
+import string
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from io import BytesIO
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Query, Request, Response
+from PIL import Image
+
+CAMERA_PREFIX = 'load-cam-'
+REGIONS = (('at', 'w'), ('at', 'gu'), ('at', 'kl'), ('si', 'lj'), ('si', 'mb'))
+# number of parameters of each latency distribution
+LATENCY_PARAMETERS = {'const': 1, 'exp': 1, 'uniform': 2, 'lognormal': 2}
+
+
+@dataclass(frozen=True)
+class Latency:
+    """A latency distribution, parsed from `50`, `uniform:20,80`, `exp:50` or `lognormal:120,0.5`"""
+
+    kind: str
+    first: float
+    second: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Latency':
+        kind, _, values = spec.partition(':') if ':' in spec else ('const', '', spec)
+        numbers = [float(value) for value in values.split(',')]
+        if len(numbers) != LATENCY_PARAMETERS.get(kind):
+            raise argparse.ArgumentTypeError(f'invalid latency: {spec}')
+        return cls(kind, *numbers)
+
+    def sample(self) -> float:
+        """draws a latency in seconds"""
+        if self.kind == 'uniform':
+            milliseconds = random.uniform(self.first, self.second)
+        elif self.kind == 'exp':
+            milliseconds = random.expovariate(1 / self.first) if self.first else 0.0
+        elif self.kind == 'lognormal':
+            milliseconds = random.lognormvariate(math.log(self.first), self.second)
+        else:
+            milliseconds = self.first
+        return milliseconds / 1000
+
+
+def parse_shares(spec: str) -> dict[int, float]:
+    """parses `code:share` pairs such as `503:0.02,429:0.01`"""
+    try:
+        shares = {int(code): float(share) for code, share in (pair.split(':') for pair in spec.split(',') if pair)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid error shares: {spec}')
+    if sum(shares.values()) > 1:
+        raise argparse.ArgumentTypeError(f'error shares add up to more than 1: {spec}')
+    return shares
+
+
+def draw_error(shares: dict[int, float]) -> int | None:
+    """picks an error code with the configured shares, None for a successful answer"""
+    roll = random.random()
+    for code, share in shares.items():
+        if roll < share:
+            return code
+        roll -= share
+    return None
+
+
+@dataclass
+class StandinConfig:
+    cameras: int = 16
+    host: str = '127.0.0.1'
+    synology_port: int = 5001
+    recognizer_port: int = 8081
+    login_latency: Latency = field(default_factory=lambda: Latency('const', 30))
+    list_latency: Latency = field(default_factory=lambda: Latency('const', 20))
+    snapshot_latency: Latency = field(default_factory=lambda: Latency('lognormal', 60, 0.3))
+    snapshot_errors: dict[int, float] = field(default_factory=dict)
+    recognizer_latency: Latency = field(default_factory=lambda: Latency('lognormal', 150, 0.4))
+    recognizer_errors: dict[int, float] = field(default_factory=dict)
+    plates_per_frame: int = 1
+    no_plate_rate: float = 0.1
+    repeat_rate: float = 0.05
+
+
+def make_snapshots(count: int, width: int = 640, height: int = 360) -> list[bytes]:
+    """jpegs of random 8x8 gray blocks, any two differ far beyond the change gate threshold"""
+    snapshots = []
+    for _ in range(count):
+        blocks = Image.fromarray(np.random.randint(0, 256, (8, 8), dtype=np.uint8))
+        buffer = BytesIO()
+        blocks.resize((width, height), Image.Resampling.NEAREST).convert('RGB').save(buffer, 'JPEG', quality=85)
+        snapshots.append(buffer.getvalue())
+    return snapshots
+
+
+def synology_app(config: StandinConfig) -> FastAPI:
+    """the login, camera list and snapshot calls of the Surveillance Station web api"""
+    app = FastAPI()
+    sessions: set[str] = set()
+    counts: Counter = Counter()
+    snapshots = make_snapshots(16)
+    cameras = [
+        {'id': index + 1, 'newName': f'{CAMERA_PREFIX}{index}', 'enabled': True, 'status': 1, 'model': 'Stand-in'}
+        for index in range(config.cameras)
+    ]
+
+    def api_error(code: int) -> dict:
+        counts[f'error_{code}'] += 1
+        return {'success': False, 'error': {'code': code}}
+
+    @app.get('/webapi/auth.cgi')
+    async def login():
+        await asyncio.sleep(config.login_latency.sample())
+        sid = secrets.token_hex(16)
+        sessions.add(sid)
+        counts['logins'] += 1
+        return {'success': True, 'data': {'sid': sid}}
+
+    @app.get('/webapi/entry.cgi')
+    async def entry(method: str, _sid: str = '', camera_id: int = Query(0, alias='id')):
+        if _sid not in sessions:
+            return api_error(119)
+        if method == 'List':
+            await asyncio.sleep(config.list_latency.sample())
+            counts['camera_lists'] += 1
+            return {'success': True, 'data': {'cameras': cameras}}
+
+        await asyncio.sleep(config.snapshot_latency.sample())
+        code = draw_error(config.snapshot_errors)
+        if code is not None:
+            if code == 119:
+                sessions.discard(_sid)
+            return api_error(code)
+        counts['snapshots'] += 1
+        counts[f'camera_{camera_id}'] += 1
+        # every camera walks through the images, so it never sends the same one twice in a row
+        return Response(snapshots[counts[f'camera_{camera_id}'] % len(snapshots)], media_type='image/jpeg')
+
+    @app.get('/stats')
+    async def stats():
+        return {key: value for key, value in counts.items() if not key.startswith('camera_')}
+
+    return app
+
+
+def make_plate() -> tuple[str, str]:
+    region, prefix = random.choice(REGIONS)
+    digits = ''.join(random.choices(string.digits, k=random.randint(3, 5)))
+    return region, prefix + digits + ''.join(random.choices(string.ascii_lowercase, k=2))
+
+
+def recognizer_app(config: StandinConfig) -> FastAPI:
+    """the plate reader endpoint of the Plate Recognizer SDK container"""
+    app = FastAPI()
+    counts: Counter = Counter()
+    recent: deque[tuple[str, str]] = deque(maxlen=200)
+
+    def vehicle() -> dict:
+        if recent and random.random() < config.repeat_rate:
+            region, plate = random.choice(recent)
+            counts['repeated_plates'] += 1
+        else:
+            region, plate = make_plate()
+            recent.append((region, plate))
+        counts['plates'] += 1
+        return {
+            'box': {'xmin': 512, 'ymin': 734, 'xmax': 638, 'ymax': 768},
+            'plate': plate,
+            'region': {'code': region, 'score': 0.82},
+            'score': 0.9,
+            'candidates': [{'score': 0.9, 'plate': plate}],
+            'dscore': 0.84,
+            'vehicle': {'score': 0.8, 'type': 'Sedan', 'box': {'xmin': 300, 'ymin': 420, 'xmax': 910, 'ymax': 880}},
+            'model_make': [{'make': 'volkswagen', 'model': 'golf', 'score': 0.42}],
+            'color': [{'color': 'white', 'score': 0.61}],
+            'orientation': [{'orientation': 'Front', 'score': 0.91}],
+        }
+
+    @app.get('/')
+    async def health():
+        return {'status': 'ok'}
+
+    @app.post('/v1/plate-reader/')
+    async def read_plates(request: Request):
+        await request.body()
+        await asyncio.sleep(config.recognizer_latency.sample())
+        code = draw_error(config.recognizer_errors)
+        if code is not None:
+            counts[f'error_{code}'] += 1
+            return Response(status_code=code)
+        counts['requests'] += 1
+        vehicles = 0 if random.random() < config.no_plate_rate else config.plates_per_frame
+        return {'processing_time': 112.4, 'results': [vehicle() for _ in range(vehicles)], 'version': 1}
+
+    @app.get('/stats')
+    async def stats():
+        return dict(counts)
+
+    return app
+
+
+def serve(config: StandinConfig) -> None:
+    """runs both stand-ins until interrupted"""
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=config.host, port=port, log_level='warning', access_log=False))
+        for app, port in (
+            (synology_app(config), config.synology_port),
+            (recognizer_app(config), config.recognizer_port),
+        )
+    ]
+
+    async def run() -> None:
+        await asyncio.gather(*(server.serve() for server in servers))
+
+    asyncio.run(run())
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """adds the stand-in options, shared with the load generator"""
+    defaults = StandinConfig()
+    group = parser.add_argument_group('stand-ins')
+    group.add_argument('--cameras', type=int, default=defaults.cameras, help='cameras in the camera list')
+    group.add_argument('--standin-host', default=defaults.host, help='address the stand-ins listen on')
+    group.add_argument('--synology-port', type=int, default=defaults.synology_port)
+    group.add_argument('--recognizer-port', type=int, default=defaults.recognizer_port)
+    group.add_argument('--login-latency', type=Latency.parse, default=defaults.login_latency)
+    group.add_argument('--list-latency', type=Latency.parse, default=defaults.list_latency)
+    group.add_argument('--snapshot-latency', type=Latency.parse, default=defaults.snapshot_latency)
+    group.add_argument(
+        '--snapshot-errors', type=parse_shares, default={}, help='Synology api error codes, e.g. 119:0.01,400:0.01'
+    )
+    group.add_argument('--recognizer-latency', type=Latency.parse, default=defaults.recognizer_latency)
+    group.add_argument('--recognizer-errors', type=parse_shares, default={}, help='HTTP status codes, e.g. 503:0.02')
+    group.add_argument('--plates-per-frame', type=int, default=defaults.plates_per_frame)
+    group.add_argument('--no-plate-rate', type=float, default=defaults.no_plate_rate, help='share of empty results')
+    group.add_argument(
+        '--repeat-rate', type=float, default=defaults.repeat_rate, help='share of plates repeating a recent one'
+    )
+
+
+def config_from_args(args: argparse.Namespace) -> StandinConfig:
+    return StandinConfig(
+        cameras=args.cameras,
+        host=args.standin_host,
+        synology_port=args.synology_port,
+        recognizer_port=args.recognizer_port,
+        login_latency=args.login_latency,
+        list_latency=args.list_latency,
+        snapshot_latency=args.snapshot_latency,
+        snapshot_errors=args.snapshot_errors,
+        recognizer_latency=args.recognizer_latency,
+        recognizer_errors=args.recognizer_errors,
+        plates_per_frame=args.plates_per_frame,
+        no_plate_rate=args.no_plate_rate,
+        repeat_rate=args.repeat_rate,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    serve(config_from_args(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Drives the vehicle detection webhook at a fixed open-loop rate and reports what the service sustained
+
+Webhook calls are sent on schedule whether or not earlier ones were answered, spread
+round-robin over the cameras of the stand-ins in `benchmarks.standins`, which are started
+in a child process unless `--no-standins` is given. The service under test must already
+run against them, e.g. with `SYNOLOGY_HOST=http://localhost:5001` and
+`PLATE_RECOGNIZER_SERVICE_URL=http://localhost:8081`.
+
+Accepted, coalesced and rejected calls and the webhook latency are measured by the
+generator. After the last call it waits for the ingestion queue to drain, then takes
+detections, inserts, the queue wait and the end-to-end latency from the difference of
+the service's `/metrics` before and after the run. Run from the service directory:
+
+    python -m benchmarks.webhook_load --url http://localhost:5000 --rate 20 --duration 60 --cameras 32
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from collections.abc import Iterable
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.standins import CAMERA_PREFIX, add_arguments, config_from_args, serve
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+Samples = dict[tuple[str, tuple[tuple[str, str], ...]], float]
+
+
+def scrape(client: httpx.Client, url: str) -> Samples:
+    """reads all samples of the service's /metrics, keyed by name and sorted labels"""
+    response = client.get(f'{url}/metrics')
+    response.raise_for_status()
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def total(samples: Samples, name: str, **labels: str) -> float:
+    """sums the samples of a metric whose labels include the given ones"""
+    return sum(
+        value
+        for (sample_name, sample_labels), value in samples.items()
+        if sample_name == name and labels.items() <= dict(sample_labels).items()
+    )
+
+
+def buckets(samples: Samples, name: str, **labels: str) -> list[tuple[float, float]]:
+    """cumulative histogram buckets as (upper bound, count), summed over the other labels"""
+    bounds: Counter = Counter()
+    for (sample_name, sample_labels), value in samples.items():
+        sample_labels = dict(sample_labels)
+        if sample_name == f'{name}_bucket' and labels.items() <= sample_labels.items():
+            bounds[float(sample_labels['le'])] += value
+    return sorted(bounds.items())
+
+
+def histogram_quantile(before: list[tuple[float, float]], after: list[tuple[float, float]], q: float) -> float:
+    """estimates a quantile of the observations between two scrapes like PromQL's histogram_quantile"""
+    previous = dict(before)
+    counts = [(bound, count - previous.get(bound, 0.0)) for bound, count in after]
+    if not counts or counts[-1][1] <= 0:
+        return math.nan
+    rank = q * counts[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in counts:
+        if count >= rank:
+            if math.isinf(bound):
+                # beyond the largest bucket, the largest finite bound is all that is known
+                return lower_bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def format_percentiles(values: Iterable[float]) -> str:
+    return '  '.join(f'p{round(q * 100)} {value * 1000:8.1f} ms' for q, value in zip(PERCENTILES, values))
+
+
+async def send(
+    client: httpx.AsyncClient, camera: str, statuses: Counter, latencies: list[float], timeout: float
+) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.post('/api/vehicle_detected', json={'camera': camera}, timeout=timeout)
+    except httpx.HTTPError as e:
+        statuses[type(e).__name__] += 1
+        return
+    latencies.append(time.perf_counter() - start)
+    if response.status_code == 200:
+        statuses[response.json().get('status', 'accepted')] += 1
+    else:
+        statuses[str(response.status_code)] += 1
+
+
+async def generate(args: argparse.Namespace) -> tuple[Counter, list[float], list[float]]:
+    """sends the webhook calls on schedule and waits for their answers
+
+    Returns:
+        tuple[Counter, list[float], list[float]]: answers by status, webhook latencies and how late each
+            call was sent
+    """
+    statuses: Counter = Counter()
+    latencies: list[float] = []
+    lags: list[float] = []
+    count = int(args.rate * args.duration)
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, auth=(args.username, args.password), limits=limits) as client:
+        tasks = set()
+        start = time.perf_counter()
+        due = 0.0
+        for index in range(count):
+            delay = start + due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, -delay))
+            camera = f'{CAMERA_PREFIX}{index % args.cameras}'
+            task = asyncio.create_task(send(client, camera, statuses, latencies, args.timeout))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            due += random.expovariate(args.rate) if args.arrivals == 'poisson' else 1 / args.rate
+        await asyncio.gather(*tasks)
+    return statuses, latencies, lags
+
+
+def wait_for_drain(client: httpx.Client, url: str, timeout: float) -> float:
+    """waits until the ingestion queue is empty and idle, returns the seconds waited"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        queue = client.get(f'{url}/stats').json()['ingestion_queue']
+        if queue['depth'] == 0 and queue['busy_workers'] == 0:
+            break
+        time.sleep(0.2)
+    else:
+        print(f'ingestion queue not drained after {timeout:.0f}s, the results below are incomplete')
+    return time.perf_counter() - start
+
+
+def start_standins(args: argparse.Namespace) -> multiprocessing.Process:
+    """starts the stand-ins in a child process and waits until both answer"""
+    config = config_from_args(args)
+    process = multiprocessing.get_context('spawn').Process(target=serve, args=(config,), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 30
+    for port in (config.synology_port, config.recognizer_port):
+        while True:
+            try:
+                httpx.get(f'http://{config.host}:{port}/stats', timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or not process.is_alive():
+                    process.terminate()
+                    raise RuntimeError(f'stand-in on port {port} did not start')
+                time.sleep(0.1)
+    return process
+
+
+def standin_stats(args: argparse.Namespace) -> dict[str, dict]:
+    stats = {}
+    for name, port in (('synology', args.synology_port), ('recognizer', args.recognizer_port)):
+        try:
+            stats[name] = httpx.get(f'http://{args.standin_host}:{port}/stats', timeout=5).json()
+        except httpx.HTTPError:
+            stats[name] = {}
+    return stats
+
+
+def report(
+    args: argparse.Namespace,
+    statuses: Counter,
+    latencies: list[float],
+    lags: list[float],
+    elapsed: float,
+    before: Samples,
+    after: Samples,
+    standins: dict[str, dict],
+) -> None:
+    sent = sum(statuses.values())
+    taken = statuses['accepted'] + statuses['coalesced']
+    failed = {status: count for status, count in statuses.items() if status not in ('accepted', 'coalesced')}
+    print(f'offered      {sent} calls in {args.duration:.0f}s ({sent / args.duration:.1f}/s, {args.arrivals} arrivals)')
+    print(
+        f'accepted     {statuses["accepted"]} queued + {statuses["coalesced"]} coalesced '
+        f'({taken / args.duration:.1f}/s), failed {failed or 0}'
+    )
+    print(f'webhook      {format_percentiles(percentile(latencies, q) for q in PERCENTILES)}')
+    print(f'send lag     p99 {percentile(lags, 0.99) * 1000:.1f} ms (calls sent later than scheduled)')
+
+    def delta(name: str, **labels: str) -> int:
+        return round(total(after, name, **labels) - total(before, name, **labels))
+
+    outcomes = {
+        outcome: delta('detections_total', outcome=outcome)
+        for outcome in ('recognized', 'no_plate', 'unchanged', 'error')
+    }
+    inserted = delta('observations_total', outcome='inserted')
+    print(
+        f'detections   {sum(outcomes.values())} processed ({sum(outcomes.values()) / elapsed:.1f}/s): '
+        + ', '.join(f'{outcome} {count}' for outcome, count in outcomes.items())
+    )
+    print(
+        f'inserted     {inserted} observations ({inserted / elapsed:.1f}/s), '
+        f'{delta("observations_total", outcome="duplicate")} duplicates'
+    )
+    for label, name, labels in (
+        ('queue wait', 'detection_stage_seconds', {'stage': 'queue_wait'}),
+        ('recognizer', 'detection_stage_seconds', {'stage': 'alpr'}),
+        ('end-to-end', 'detection_end_to_end_seconds', {}),
+    ):
+        quantiles = (
+            histogram_quantile(buckets(before, name, **labels), buckets(after, name, **labels), q) for q in PERCENTILES
+        )
+        print(f'{label:<12} {format_percentiles(quantiles)}')
+    print(
+        f'detection and insert rates are over {elapsed:.1f}s from the first call until the queue drained, '
+        'the last three percentiles are estimated from histogram buckets'
+    )
+    for name, counts in standins.items():
+        if counts:
+            print(f'{name:<12} ' + ', '.join(f'{key} {value}' for key, value in sorted(counts.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000', help='base url of the data-collection service')
+    parser.add_argument('--rate', type=float, default=10, help='webhook calls per second')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to send calls for')
+    parser.add_argument('--arrivals', choices=('uniform', 'poisson'), default='poisson', help='spacing of the calls')
+    parser.add_argument('--username', default=os.environ.get('SYNOLOGY_USERNAME', 'admin'), help='webhook user')
+    parser.add_argument('--password', default=os.environ.get('SYNOLOGY_PASSWORD', 'admin'), help='webhook password')
+    parser.add_argument('--timeout', type=float, default=10, help='seconds to wait for a webhook answer')
+    parser.add_argument('--max-connections', type=int, default=100, help='connections to the service')
+    parser.add_argument('--drain-timeout', type=float, default=120, help='seconds to wait for the queue to drain')
+    parser.add_argument('--no-standins', action='store_true', help='use stand-ins that are already running')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    standins = None if args.no_standins else start_standins(args)
+    try:
+        with httpx.Client(timeout=10) as client:
+            before = scrape(client, args.url)
+            start = time.perf_counter()
+            statuses, latencies, lags = asyncio.run(generate(args))
+            wait_for_drain(client, args.url, args.drain_timeout)
+            elapsed = time.perf_counter() - start
+            after = scrape(client, args.url)
+        report(args, statuses, latencies, lags, elapsed, before, after, standin_stats(args))
+    finally:
+        if standins is not None:
+            standins.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import secrets
+
+from fastapi import HTTPException, Security, status
+from fastapi.security import APIKeyHeader
+
+from src.config import settings
+
+profiler_key_header = APIKeyHeader(name='Authorization', auto_error=False)
+
+
+async def verify_profiler_key(api_key: str | None = Security(profiler_key_header)) -> None:
+    """Verify the profiler API key from request header.
+
+    The profiler endpoint doesn't exist unless a profiler API key is configured.
+
+    Args:
+        api_key: API key from header
+
+    Raises:
+        HTTPException: 404 if no profiler API key is configured, 401 if the API key is invalid
+    """
+    if not settings.profiler_api_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Not Found',
+        )
+    if api_key is None or not secrets.compare_digest(api_key, settings.profiler_api_key):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid API key',
+        )
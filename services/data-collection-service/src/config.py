@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field, PostgresDsn
 from pydantic_settings import BaseSettings
 
@@ -15,6 +17,14 @@ class Settings(BaseSettings):
 
     # Service-specific settings
     log_level: str = Field('INFO', alias='LOG_LEVEL')
+    log_format: Literal['json', 'text'] = Field('json', alias='LOG_FORMAT')
+    log_queue_size: int = Field(10_000, alias='LOG_QUEUE_SIZE')
+    log_sample_rates: dict[str, float] = Field({}, alias='LOG_SAMPLE_RATES')
+    trace_path: str = Field('', alias='TRACE_PATH')
+    trace_max_mb: int = Field(50, alias='TRACE_MAX_MB')
+    trace_backups: int = Field(3, alias='TRACE_BACKUPS')
+    profiler_api_key: str = Field('', alias='PROFILER_API_KEY')
+    profiler_max_seconds: float = Field(120, alias='PROFILER_MAX_SECONDS')
     synology_host: str = Field(..., alias='SYNOLOGY_HOST')
     synology_username: str = Field(..., alias='SYNOLOGY_USERNAME')
     synology_password: str = Field(..., alias='SYNOLOGY_PASSWORD')
@@ -22,6 +32,44 @@ class Settings(BaseSettings):
     save_images_for_debug: bool = Field(False, alias='SAVE_IMAGES_FOR_DEBUG')
     interval_seconds: int = Field(60, alias='INTERVAL_SECONDS')
     plate_recognizer_service_url: str = Field(..., alias='PLATE_RECOGNIZER_SERVICE_URL')
+    camera_registry_ttl_seconds: int = Field(300, alias='CAMERA_REGISTRY_TTL_SECONDS')
+    pipeline_mode: Literal['sync', 'async'] = Field('sync', alias='PIPELINE_MODE')
+    ingestion_workers: int = Field(4, alias='INGESTION_WORKERS')
+    ingestion_queue_size: int = Field(100, alias='INGESTION_QUEUE_SIZE')
+    ingestion_retry_after_seconds: int = Field(5, alias='INGESTION_RETRY_AFTER_SECONDS')
+    ingestion_max_attempts: int = Field(3, alias='INGESTION_MAX_ATTEMPTS')
+    ingestion_retry_delay_seconds: float = Field(10, alias='INGESTION_RETRY_DELAY_SECONDS')
+    coalesce_window_seconds: float = Field(1.0, alias='COALESCE_WINDOW_SECONDS')
+    camera_coalesce_windows: dict[str, float] = Field({}, alias='CAMERA_COALESCE_WINDOWS')
+    spool_path: str = Field('/app/spool/detections.journal', alias='SPOOL_PATH')
+    dedup_index_max_entries: int = Field(100_000, alias='DEDUP_INDEX_MAX_ENTRIES')
+    camera_regions: dict[str, tuple[float, float, float, float]] = Field({}, alias='CAMERA_REGIONS')
+    snapshot_max_size: int = Field(0, alias='SNAPSHOT_MAX_SIZE')
+    snapshot_jpeg_quality: int = Field(90, alias='SNAPSHOT_JPEG_QUALITY')
+    snapshot_workers: int = Field(2, alias='SNAPSHOT_WORKERS')
+    change_gate_threshold: float = Field(0, alias='CHANGE_GATE_THRESHOLD')
+    camera_change_thresholds: dict[str, float] = Field({}, alias='CAMERA_CHANGE_THRESHOLDS')
+    snapshot_store_format: Literal['jpeg', 'webp'] = Field('jpeg', alias='SNAPSHOT_STORE_FORMAT')
+    snapshot_store_max_mb: int = Field(1024, alias='SNAPSHOT_STORE_MAX_MB')
+    snapshot_store_max_age_hours: float = Field(168, alias='SNAPSHOT_STORE_MAX_AGE_HOURS')
+    snapshot_store_evict_interval_seconds: float = Field(600, alias='SNAPSHOT_STORE_EVICT_INTERVAL_SECONDS')
+    plate_recognizer_pool_size: int = Field(10, alias='PLATE_RECOGNIZER_POOL_SIZE')
+    plate_recognizer_max_attempts: int = Field(5, alias='PLATE_RECOGNIZER_MAX_ATTEMPTS')
+    plate_recognizer_backoff_max_seconds: float = Field(10, alias='PLATE_RECOGNIZER_BACKOFF_MAX_SECONDS')
+    plate_recognizer_breaker_threshold: int = Field(5, alias='PLATE_RECOGNIZER_BREAKER_THRESHOLD')
+    plate_recognizer_breaker_reset_seconds: float = Field(30, alias='PLATE_RECOGNIZER_BREAKER_RESET_SECONDS')
+    plate_recognizer_probe_interval_seconds: float = Field(5, alias='PLATE_RECOGNIZER_PROBE_INTERVAL_SECONDS')
+    plate_recognizer_max_concurrency: int = Field(4, alias='PLATE_RECOGNIZER_MAX_CONCURRENCY')
+    municipalities_path: str = Field('/app/shared-data/municipalities.json', alias='MUNICIPALITIES_PATH')
+    municipalities_artifact_path: str = Field(
+        '/app/shared-data/municipalities.bin', alias='MUNICIPALITIES_ARTIFACT_PATH'
+    )
+    municipalities_watch_seconds: float = Field(30, alias='MUNICIPALITIES_WATCH_SECONDS')
+
+    @property
+    def plate_recognizer_service_urls(self) -> list[str]:
+        """Splits the comma separated Plate Recognizer instance urls."""
+        return [url.strip() for url in self.plate_recognizer_service_url.split(',') if url.strip()]
 
     @property
     def db_uri(self) -> PostgresDsn:
@@ -35,5 +83,17 @@ class Settings(BaseSettings):
             path=self.db_name,
         )
 
+    @property
+    def async_db_uri(self) -> PostgresDsn:
+        """Constructs the PostgreSQL connection URI for the asyncio driver."""
+        return PostgresDsn.build(
+            scheme='postgresql+asyncpg',
+            username=self.db_user,
+            password=self.db_password,
+            host=self.db_host,
+            port=self.db_port,
+            path=self.db_name,
+        )
+
 
 settings = Settings()
@@ -1,14 +1,16 @@
-from collections.abc import Generator
-from contextlib import contextmanager
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
 from typing import Annotated
 
 from fastapi import Depends
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session
 
 from src.config import settings
 
 engine = create_engine(str(settings.db_uri))
+async_engine = create_async_engine(str(settings.async_db_uri))
 
 
 @contextmanager
@@ -26,4 +28,16 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+@asynccontextmanager
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provides an asyncio SQLAlchemy session for the async ingestion pipeline.
+
+    Yields:
+        AsyncSession: A SQLAlchemy asyncio session object.
+    """
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
@@ -10,6 +10,12 @@ class AuthenticationError(CameraException):
     pass
 
 
+class SessionExpiredError(AuthenticationError):
+    """Raised when Surveillance Station rejects a cached session id"""
+
+    pass
+
+
 class CameraDataError(CameraException):
     """Raised when camera data cannot be fetched or is malformed"""
 
@@ -0,0 +1,10 @@
+class IngestionException(Exception):
+    """Base exception for ingestion queue errors"""
+
+    pass
+
+
+class QueueFullError(IngestionException):
+    """Raised when the ingestion queue has reached its maximum depth"""
+
+    pass
@@ -8,3 +8,9 @@ class PlateRecognizerCallError(PlateRecognizerException):
     """Raised when the api call to Plate Recognizer fails"""
 
     pass
+
+
+class PlateRecognizerUnavailableError(PlateRecognizerException):
+    """Raised when calls are rejected because the circuit breaker is open"""
+
+    pass
@@ -0,0 +1,10 @@
+class ProfilerException(Exception):
+    """Base exception for profiler errors"""
+
+    pass
+
+
+class ProfilerBusyError(ProfilerException):
+    """Raised when a profile is requested while another one is being recorded"""
+
+    pass
@@ -0,0 +1,212 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+import httpx
+
+from src.exceptions.camera_exceptions import (
+    AuthenticationError,
+    CameraDataError,
+    SessionExpiredError,
+    SnapshotError,
+)
+from src.handlers.camera_handler import raise_for_api_error
+from src.logger import logger
+from src.metrics import stage
+from src.schemas.synology_camera import SynologyCamera
+
+T = TypeVar('T')
+
+
+class AsyncCameraHandler:
+    """Non-blocking handler for camera functionality used by the async pipeline"""
+
+    def __init__(self, client: httpx.AsyncClient | None = None):
+        self.client = client or httpx.AsyncClient(verify=False, timeout=15)
+        self._sid: str | None = None
+        self._sid_lock = asyncio.Lock()
+        self.login_count = 0
+
+    async def authenticate_client(self, host: str, username: str, password: str) -> str:
+        """Tries to authenticate client on Surveillance Station.
+        Args:
+            host (str): ip of the nas
+            username (str): Surveillance Station username
+            password (str): Surveillance Station password
+
+        Raises:
+            AuthenticationError: If authentication fails for any reason.
+
+        Returns:
+            str: The session id for the connection.
+        """
+        try:
+            auth_url = f'{host}/webapi/auth.cgi'
+            auth_payload = {
+                'api': 'SYNO.API.Auth',
+                'method': 'Login',
+                'version': '6',
+                'account': username,
+                'passwd': password,
+                'session': 'SurveillanceStation',
+                'format': 'sid',
+            }
+
+            res = await self.client.get(auth_url, params=auth_payload)
+            res.raise_for_status()
+            json_data = res.json()
+
+            sid = json_data.get('data', {}).get('sid')
+            if not sid:
+                raise AuthenticationError(f'Authentication failed: No SID returned. Response: {json_data}')
+
+            return sid
+        except httpx.HTTPError as e:
+            raise AuthenticationError('Network error during authentication') from e
+
+    async def get_sid(self, host: str, username: str, password: str) -> str:
+        """Returns the cached session id, logging in first if there is none.
+
+        Args:
+            host (str): ip of the nas
+            username (str): Surveillance Station username
+            password (str): Surveillance Station password
+
+        Raises:
+            AuthenticationError: If authentication fails for any reason.
+
+        Returns:
+            str: The shared session id.
+        """
+        sid = self._sid
+        if sid is not None:
+            return sid
+
+        async with self._sid_lock:
+            if self._sid is None:
+                with stage('login'):
+                    self._sid = await self.authenticate_client(host=host, username=username, password=password)
+                self.login_count += 1
+                logger.info('Logged in to Surveillance Station')
+            return self._sid
+
+    async def invalidate_sid(self, sid: str) -> None:
+        """Drops the cached session id if it is still the given (rejected) one.
+
+        Args:
+            sid (str): the session id Surveillance Station rejected
+        """
+        async with self._sid_lock:
+            if self._sid == sid:
+                self._sid = None
+
+    async def run_with_session(
+        self, host: str, username: str, password: str, operation: Callable[[str], Awaitable[T]]
+    ) -> T:
+        """Awaits an operation with the shared session id and re-authenticates once if it expired.
+
+        Args:
+            host (str): ip of the nas
+            username (str): Surveillance Station username
+            password (str): Surveillance Station password
+            operation (Callable[[str], Awaitable[T]]): coroutine function receiving the sid
+
+        Raises:
+            AuthenticationError: If the session cannot be (re-)established.
+
+        Returns:
+            T: The result of the operation.
+        """
+        sid = await self.get_sid(host=host, username=username, password=password)
+        try:
+            return await operation(sid)
+        except SessionExpiredError:
+            logger.info('Surveillance Station session expired, re-authenticating')
+            await self.invalidate_sid(sid)
+            sid = await self.get_sid(host=host, username=username, password=password)
+            return await operation(sid)
+
+    async def get_camera_data(self, host: str, sid: str) -> list[SynologyCamera]:
+        """Gets data for all cameras connected in the Surveillance Station network.
+        Args:
+            host (str): ip of the nas
+            sid (str): session id for the connection
+
+        Raises:
+            SessionExpiredError: If the session id was rejected.
+            CameraDataError: If camera data cannot be fetched or is malformed.
+
+        Returns:
+            list[SynologyCamera]: List of camera data.
+        """
+        try:
+            _cameras_list: list[SynologyCamera] = []
+            camera_list_url = f'{host}/webapi/entry.cgi'
+            camera_list_payload = {
+                'api': 'SYNO.SurveillanceStation.Camera',
+                'version': '9',
+                'method': 'List',
+                '_sid': sid,
+            }
+
+            with stage('camera_list'):
+                cameras_response = await self.client.get(camera_list_url, params=camera_list_payload)
+            cameras_response.raise_for_status()
+
+            json_resp = cameras_response.json()
+            raise_for_api_error(json_resp)
+            cameras_data: list[dict] = json_resp.get('data', {}).get('cameras', [])
+
+            if not isinstance(cameras_data, list):
+                raise CameraDataError('Unexpected cameras data format. Expected a list')
+
+            for camera_dict in cameras_data:
+                try:
+                    _cameras_list.append(SynologyCamera(**camera_dict))
+                except Exception as e:
+                    logger.warning(f'Skipping malformed camera data: {e} - Data: {camera_dict}')
+            return _cameras_list
+        except httpx.HTTPError as e:
+            raise CameraDataError('Network error while fetching camera data.') from e
+
+    async def get_camera_snapshot(self, host: str, sid: str, camera: SynologyCamera) -> httpx.Response:
+        """Requests snapshot from a selected camera.
+        Args:
+            host (str): ip of the nas
+            sid (str): session id
+            camera (SynologyCamera): camera object containing the camera id
+
+        Raises:
+            SessionExpiredError: If the session id was rejected.
+            SnapshotError: If the snapshot cannot be retrieved.
+
+        Returns:
+            httpx.Response: The image data of the snapshot.
+        """
+        try:
+            snapshot_url = f'{host}/webapi/entry.cgi'
+            snapshot_payload = {
+                'api': 'SYNO.SurveillanceStation.Camera',
+                'version': '9',
+                'id': camera.id,
+                'profileType': 0,
+                'method': 'GetSnapshot',
+                '_sid': sid,
+            }
+
+            frame = await self.client.get(snapshot_url, params=snapshot_payload)
+            frame.raise_for_status()
+
+            # Surveillance Station answers with a json error body instead of an image on failure
+            if 'application/json' in frame.headers.get('Content-Type', ''):
+                try:
+                    raise_for_api_error(frame.json())
+                except CameraDataError as e:
+                    raise SnapshotError(str(e)) from e
+            return frame
+        except httpx.HTTPError as e:
+            raise SnapshotError('Network error while fetching snapshot') from e
+
+    async def aclose(self) -> None:
+        """Closes the underlying http client"""
+        await self.client.aclose()
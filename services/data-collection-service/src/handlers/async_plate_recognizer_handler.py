@@ -0,0 +1,147 @@
+import time
+from typing import Any
+
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerCallError
+from src.handlers.plate_recognizer_handler import REGIONS
+from src.handlers.recognizer_pool import RecognizerPool
+from src.handlers.resilience import LatencyRecorder
+from src.tracing import tracer
+
+
+def is_transient(error: BaseException) -> bool:
+    """Checks whether a failed request is worth retrying
+
+    Args:
+        error (BaseException): exception raised by the request
+
+    Returns:
+        bool: True for connection problems, timeouts, rate limiting and server errors
+    """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def instance_failed(error: BaseException) -> bool | None:
+    """Tells what a failed request says about the instance it went to, for its circuit breaker
+
+    Args:
+        error (BaseException): exception raised by the request
+
+    Returns:
+        bool | None: True for transient failures, False if the instance answered with a client error,
+            None if the error says nothing about the instance
+    """
+    if is_transient(error):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return False
+    return None
+
+
+class AsyncPlateRecognizerHandler:
+    """Non-blocking handler for plate recognition with the PlateRecognizer Snapshot API"""
+
+    def __init__(
+        self,
+        recognizers: RecognizerPool,
+        client: httpx.AsyncClient | None = None,
+        pool_size: int = 10,
+        max_attempts: int = 5,
+        backoff_max_seconds: float = 10,
+    ):
+        """
+        Args:
+            recognizers (RecognizerPool): recognizer instances requests are balanced across
+            client (httpx.AsyncClient | None): http client, a pooled one is created if omitted
+            pool_size (int): number of keep-alive connections kept to each instance
+            max_attempts (int): attempts per request including the first one
+            backoff_max_seconds (float): upper bound of the jittered wait between attempts
+        """
+        connections = pool_size * len(recognizers.endpoints)
+        self.client = client or httpx.AsyncClient(
+            timeout=15,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+        self.recognizers = recognizers
+        self.latency = LatencyRecorder()
+        self.max_attempts = max_attempts
+        self.backoff_max_seconds = backoff_max_seconds
+
+    @property
+    def stats(self) -> dict:
+        """Per-call latency of the api and load and breaker state per instance"""
+        return {'latency': self.latency.stats, 'instances': self.recognizers.stats}
+
+    async def send_to_api(self, api_key: str, image_data: bytes, camera_name: str) -> Any:
+        """sends a new request to the api
+
+        Args:
+            image_data (bytes): snapshot image data
+
+        Raises:
+            PlateRecognizerCallError: raised if the api returns fails
+            PlateRecognizerUnavailableError: raised if every instance is ejected
+
+        Returns:
+            Any: response json with plate and vehicle data
+        """
+        retrying = AsyncRetrying(
+            wait=wait_random_exponential(multiplier=0.5, max=self.backoff_max_seconds),
+            stop=stop_after_attempt(self.max_attempts),
+            retry=retry_if_exception(is_transient),
+            reraise=True,
+        )
+        try:
+            response = await retrying(self._post, api_key, image_data, camera_name)
+            return response.json()
+        except httpx.HTTPError as e:
+            raise PlateRecognizerCallError(f'Error when calling the Plate Recognizer api: {e}')
+
+    async def _post(self, api_key: str, image_data: bytes, camera_name: str) -> httpx.Response:
+        # one span per attempt, so retries and the instance each went to show up in the trace
+        with tracer.span('alpr_attempt', bytes=len(image_data)) as span:
+            # every attempt picks an instance again, so retries move away from a failing one
+            endpoint = self.recognizers.acquire()
+            span.attributes['instance'] = endpoint.url
+            start = time.perf_counter()
+            # stays None if the attempt is cancelled or fails unexpectedly, which still ends it on the instance
+            failed = None
+            try:
+                response = await self.client.post(
+                    f'{endpoint.url}/v1/plate-reader/',
+                    data={
+                        'camera_id': camera_name,
+                        'regions': REGIONS,
+                        'mmc': 'true',
+                        'direction': 'true',
+                    },
+                    files={'upload': image_data},
+                    headers={'Authorization': f'Token {api_key}'},
+                )
+                span.attributes['status_code'] = response.status_code
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                self.latency.record(time.perf_counter() - start, failed=True)
+                failed = instance_failed(e)
+                raise
+            else:
+                self.latency.record(time.perf_counter() - start)
+                failed = False
+                return response
+            finally:
+                self.recognizers.release(endpoint, failed=failed)
+
+    async def aclose(self) -> None:
+        """Closes the underlying http client"""
+        await self.client.aclose()
@@ -1,20 +1,53 @@
+import threading
+from collections.abc import Callable
+from typing import TypeVar
+
 import requests
 from requests.exceptions import RequestException
 
 from src.exceptions.camera_exceptions import (
     AuthenticationError,
     CameraDataError,
+    SessionExpiredError,
     SnapshotError,
 )
 from src.logger import logger
+from src.metrics import stage
 from src.schemas.synology_camera import SynologyCamera
 
+T = TypeVar('T')
+
+# Synology API error codes that mean the sid is no longer usable
+SESSION_ERROR_CODES = {105, 106, 107, 119}
+
+
+def raise_for_api_error(json_data: dict) -> None:
+    """Raises if a Synology API response reports a failure.
+
+    Args:
+        json_data (dict): decoded api response
+
+    Raises:
+        SessionExpiredError: If the session id was rejected.
+        CameraDataError: For any other api error.
+    """
+    if json_data.get('success', True):
+        return
+
+    code = json_data.get('error', {}).get('code')
+    if code in SESSION_ERROR_CODES:
+        raise SessionExpiredError(f'Session rejected by Surveillance Station (code {code})')
+    raise CameraDataError(f'Surveillance Station api error (code {code})')
+
 
 class CameraHandler:
     """Handler function for camera functionality"""
 
     def __init__(self):
         self.session = requests.Session()
+        self._sid: str | None = None
+        self._sid_lock = threading.Lock()
+        self.login_count = 0
 
     def authenticate_client(self, host: str, username: str, password: str) -> str:
         """Tries to authenticate client on Surveillance Station.
@@ -55,6 +88,72 @@ class CameraHandler:
         except Exception:
             raise
 
+    def get_sid(self, host: str, username: str, password: str) -> str:
+        """Returns the cached session id, logging in first if there is none.
+
+        Concurrent callers without a cached sid wait for a single login instead
+        of each sending their own.
+
+        Args:
+            host (str): ip of the nas
+            username (str): Surveillance Station username
+            password (str): Surveillance Station password
+
+        Raises:
+            AuthenticationError: If authentication fails for any reason.
+
+        Returns:
+            str: The shared session id.
+        """
+        sid = self._sid
+        if sid is not None:
+            return sid
+
+        with self._sid_lock:
+            if self._sid is None:
+                with stage('login'):
+                    self._sid = self.authenticate_client(host=host, username=username, password=password)
+                self.login_count += 1
+                logger.info('Logged in to Surveillance Station')
+            return self._sid
+
+    def invalidate_sid(self, sid: str) -> None:
+        """Drops the cached session id if it is still the given (rejected) one.
+
+        Comparing against the rejected sid keeps callers that failed with an old
+        sid from discarding a session another caller has already renewed.
+
+        Args:
+            sid (str): the session id Surveillance Station rejected
+        """
+        with self._sid_lock:
+            if self._sid == sid:
+                self._sid = None
+
+    def run_with_session(self, host: str, username: str, password: str, operation: Callable[[str], T]) -> T:
+        """Runs an operation with the shared session id and re-authenticates once if it expired.
+
+        Args:
+            host (str): ip of the nas
+            username (str): Surveillance Station username
+            password (str): Surveillance Station password
+            operation (Callable[[str], T]): callable receiving the sid
+
+        Raises:
+            AuthenticationError: If the session cannot be (re-)established.
+
+        Returns:
+            T: The result of the operation.
+        """
+        sid = self.get_sid(host=host, username=username, password=password)
+        try:
+            return operation(sid)
+        except SessionExpiredError:
+            logger.info('Surveillance Station session expired, re-authenticating')
+            self.invalidate_sid(sid)
+            sid = self.get_sid(host=host, username=username, password=password)
+            return operation(sid)
+
     def get_camera_data(self, host: str, sid: str) -> list[SynologyCamera]:
         """Gets data for all cameras connected in the Surveillance Station network.
         Args:
@@ -62,6 +161,7 @@ class CameraHandler:
             sid (str): session id for the connection
 
         Raises:
+            SessionExpiredError: If the session id was rejected.
             CameraDataError: If camera data cannot be fetched or is malformed.
 
         Returns:
@@ -77,10 +177,12 @@ class CameraHandler:
                 '_sid': sid,
             }
 
-            cameras_response = self.session.get(camera_list_url, params=camera_list_payload, verify=False)
+            with stage('camera_list'):
+                cameras_response = self.session.get(camera_list_url, params=camera_list_payload, verify=False)
             cameras_response.raise_for_status()
 
             json_resp = cameras_response.json()
+            raise_for_api_error(json_resp)
             cameras_data: list[dict] = json_resp.get('data', {}).get('cameras', [])
 
             if not isinstance(cameras_data, list):
@@ -123,6 +225,7 @@ class CameraHandler:
             camera (SynologyCamera): camera object containing the camera id
 
         Raises:
+            SessionExpiredError: If the session id was rejected.
             SnapshotError: If the snapshot cannot be retrieved.
 
         Returns:
@@ -141,6 +244,13 @@ class CameraHandler:
 
             frame = self.session.get(snapshot_url, params=snapshot_payload, stream=True, verify=False)
             frame.raise_for_status()
+
+            # Surveillance Station answers with a json error body instead of an image on failure
+            if 'application/json' in frame.headers.get('Content-Type', ''):
+                try:
+                    raise_for_api_error(frame.json())
+                except CameraDataError as e:
+                    raise SnapshotError(str(e)) from e
             return frame
         except RequestException as e:
             raise SnapshotError('Network error while fetching snapshot') from e
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+from src.exceptions.camera_exceptions import CameraDataError
+from src.logger import logger
+from src.schemas.synology_camera import SynologyCamera
+
+
+class CameraIndex:
+    """Cameras indexed by name with hit, miss and refresh counters, shared by the sync and async registries
+
+    Refreshing is left to the subclasses, which load the camera list either blocking or
+    through a coroutine.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        """
+        Args:
+            ttl_seconds (float): age after which the index is refreshed in the background
+        """
+        self.ttl_seconds = ttl_seconds
+
+        self._cameras: dict[str, SynologyCamera] = {}
+        self._refreshed_at: float | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @property
+    def stats(self) -> dict:
+        """Hit, miss and refresh counters of the registry"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'cameras': len(self._cameras),
+        }
+
+    def _cached(self, camera_name: str) -> SynologyCamera | None:
+        camera = self._cameras.get(camera_name)
+        if camera is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return camera
+
+    def _indexed(self, camera_name: str) -> SynologyCamera:
+        camera = self._cameras.get(camera_name)
+        if camera is None:
+            raise CameraDataError(f"Camera '{camera_name}' not found in Synology data")
+        return camera
+
+    def _is_stale(self) -> bool:
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at > self.ttl_seconds
+
+    def _store(self, cameras: list[SynologyCamera]) -> None:
+        # swap in a new dict so lock-free readers never see a partial index
+        self._cameras = {camera.name: camera for camera in cameras if camera.name is not None}
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+        logger.debug(f'Camera registry refreshed with {len(self._cameras)} cameras')
+
+
+class CameraRegistry(CameraIndex):
+    """TTL cache of the Surveillance Station cameras indexed by name"""
+
+    def __init__(self, fetch_cameras: Callable[[], list[SynologyCamera]], ttl_seconds: float):
+        """
+        Args:
+            fetch_cameras (Callable[[], list[SynologyCamera]]): loads the current camera list from the nas
+            ttl_seconds (float): age after which the index is refreshed in the background
+        """
+        super().__init__(ttl_seconds=ttl_seconds)
+        self.fetch_cameras = fetch_cameras
+        self._refresh_lock = threading.Lock()
+        self._background_refresh_pending = False
+
+    def get_camera(self, camera_name: str) -> SynologyCamera:
+        """Looks up a camera by name, refreshing the index on a miss.
+
+        Args:
+            camera_name (str): Name of the camera to find
+
+        Raises:
+            CameraDataError: If the camera is unknown to Surveillance Station
+
+        Returns:
+            SynologyCamera: The camera object matching the name
+        """
+        if self._is_stale():
+            self._start_background_refresh()
+
+        camera = self._cached(camera_name)
+        if camera is not None:
+            return camera
+
+        self._refresh(seen_refresh=self._refreshed_at)
+        return self._indexed(camera_name)
+
+    def refresh(self) -> None:
+        """Reloads the camera index from Surveillance Station
+
+        Raises:
+            CameraDataError: If camera data cannot be fetched
+        """
+        self._refresh(seen_refresh=self._refreshed_at)
+
+    def _refresh(self, seen_refresh: float | None) -> None:
+        """Reloads the index unless another caller already did so since `seen_refresh` was read"""
+        with self._refresh_lock:
+            if self._refreshed_at != seen_refresh:
+                return
+
+            self._store(self.fetch_cameras())
+
+    def _start_background_refresh(self) -> None:
+        with self._refresh_lock:
+            if self._background_refresh_pending:
+                return
+            self._background_refresh_pending = True
+
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self._refresh(seen_refresh=self._refreshed_at)
+        except Exception as e:
+            logger.warning(f'Background camera registry refresh failed: {e}')
+        finally:
+            self._background_refresh_pending = False
+
+
+class AsyncCameraRegistry(CameraIndex):
+    """Camera registry for the async pipeline, refreshing through a coroutine"""
+
+    def __init__(self, fetch_cameras: Callable[[], Awaitable[list[SynologyCamera]]], ttl_seconds: float):
+        """
+        Args:
+            fetch_cameras (Callable[[], Awaitable[list[SynologyCamera]]]): loads the camera list from the nas
+            ttl_seconds (float): age after which the index is refreshed in the background
+        """
+        super().__init__(ttl_seconds=ttl_seconds)
+        self.fetch_cameras = fetch_cameras
+        self._refresh_lock = asyncio.Lock()
+        self._background_task: asyncio.Task | None = None
+
+    async def get_camera(self, camera_name: str) -> SynologyCamera:
+        """Looks up a camera by name, refreshing the index on a miss.
+
+        Args:
+            camera_name (str): Name of the camera to find
+
+        Raises:
+            CameraDataError: If the camera is unknown to Surveillance Station
+
+        Returns:
+            SynologyCamera: The camera object matching the name
+        """
+        if self._is_stale() and (self._background_task is None or self._background_task.done()):
+            self._background_task = asyncio.create_task(self._background_refresh())
+
+        camera = self._cached(camera_name)
+        if camera is not None:
+            return camera
+
+        await self._refresh(seen_refresh=self._refreshed_at)
+        return self._indexed(camera_name)
+
+    async def refresh(self) -> None:
+        """Reloads the camera index from Surveillance Station
+
+        Raises:
+            CameraDataError: If camera data cannot be fetched
+        """
+        await self._refresh(seen_refresh=self._refreshed_at)
+
+    async def _refresh(self, seen_refresh: float | None) -> None:
+        async with self._refresh_lock:
+            if self._refreshed_at != seen_refresh:
+                return
+
+            self._store(await self.fetch_cameras())
+
+    async def _background_refresh(self) -> None:
+        try:
+            await self._refresh(seen_refresh=self._refreshed_at)
+        except Exception as e:
+            logger.warning(f'Background camera registry refresh failed: {e}')
@@ -1,48 +1,52 @@
-import json
-
+from src.handlers.municipality_table import Municipality, MunicipalityTables
 from src.logger import logger
-from src.schemas.vehicle_observation import VehicleObservationRaw
+from src.schemas.vehicle_observation import VehicleObservationRecord
+
+# countries whose codes are checked when the recognizer could not tell the country
+UNKNOWN_COUNTRY_CANDIDATES = ('si',)
 
 
 class CountryHandler:
     """Handler for fixing countries with license plate patterns"""
 
-    def __init__(self, data: dict | None = None):
-        self.AUSTRIAN_LOOKUP = {}
-        self.SLOVENIAN_LOOKUP = {}
-
-        if data is None:
-            with open('/app/shared-data/municipalities.json', encoding='utf-8') as f:
-                data = json.load(f)
-
-        # Process Austria
-        if 'Austria' in data:
-            for state_name, municipalities in data['Austria'].items():
-                for municipality_dict in municipalities:
-                    for code, name in municipality_dict.items():
-                        self.AUSTRIAN_LOOKUP[code.upper()] = {
-                            'country': 'at',
-                            'state': state_name,
-                            'municipality': name,
-                        }
-
-        # Process Slovenia
-        if 'Slovenia' in data:
-            municipalities = data['Slovenia']['Municipalities']
-            for municipality_dict in municipalities:
-                for code, name in municipality_dict.items():
-                    self.SLOVENIAN_LOOKUP[code.upper()] = {
-                        'country': 'si',
-                        'state': 'Slovenia',
-                        'municipality': name,
-                    }
-
-    def get_municipality_and_fix_country(self, observation: VehicleObservationRaw) -> VehicleObservationRaw:
+    def __init__(self, data: dict | None = None, municipalities: MunicipalityTables | None = None):
+        """
+        Args:
+            data (dict | None): municipality codes per country, see `parse_municipalities`. Every country maps
+                group names to lists of `{code: municipality}` dicts, where the group is either a state or
+                `Municipalities` for countries without states.
+            municipalities (MunicipalityTables | None): compiled tables to use instead of `data`, the shared
+                data file and its artifact are used if both are omitted
+        """
+        if municipalities is None:
+            if data is not None:
+                municipalities = MunicipalityTables.from_data(data)
+            else:
+                municipalities = MunicipalityTables(
+                    source='/app/shared-data/municipalities.json',
+                    artifact='/app/shared-data/municipalities.bin',
+                    watch_interval=0,
+                )
+        self.municipalities = municipalities
+
+    def lookup(self, country_code: str, plate: str) -> tuple[str, Municipality] | None:
+        """Finds the longest municipality code of a country that the plate starts with
+
+        Args:
+            country_code (str): recognizer region code, e.g. 'at'
+            plate (str): normalized upper case plate
+
+        Returns:
+            tuple[str, Municipality] | None: matched code and its municipality, None without a match
+        """
+        return self.municipalities.table.lookup(country_code, plate)
+
+    def get_municipality_and_fix_country(self, observation: VehicleObservationRecord) -> VehicleObservationRecord:
         """
         Get municipality info and fix country code based on current country detection.
 
         Args:
-            observation: Raw vehicle observation data
+            observation: Parsed vehicle observation, updated in place
 
         Returns:
             Updated observation with municipality info and potentially fixed country code
@@ -50,79 +54,37 @@ class CountryHandler:
         plate_str = observation.plate.strip().upper()
 
         if len(plate_str) < 1:
-            logger.debug(f"Plate '{observation.plate}' too short to be valid")
+            logger.debug("Plate '%s' too short to be valid", observation.plate)
             return observation
 
         normalized_country = (observation.country_code or 'unknown').lower()
 
-        # Handle Austrian plates
-        if normalized_country == 'at':
-            return self._check_austrian_municipalities(observation, plate_str)
-
-        # Handle unknown or Slovenian plates
-        elif normalized_country in ['unknown', 'si']:
-            return self._check_slovenian_municipalities(observation, plate_str)
-
-        # For other countries
-        logger.debug(f"No municipality mapping for country '{observation.country_code}'")
-        return observation
+        # Handle plates the recognizer could not assign to a country
+        if normalized_country == 'unknown':
+            for candidate in UNKNOWN_COUNTRY_CANDIDATES:
+                match = self.lookup(candidate, plate_str)
+                if match is not None:
+                    code, municipality = match
+                    observation.municipality = code
+                    observation.country_code = candidate
+                    logger.debug(
+                        "Fixed plate country changed to '%s' (region: %s, code: %s)", candidate, municipality.name, code
+                    )
+                    return observation
 
-    def _check_austrian_municipalities(
-        self, observation: VehicleObservationRaw, plate_str: str
-    ) -> VehicleObservationRaw:
-        """Check Austrian municipality codes"""
-
-        # Try 2-letter codes first
-        if len(plate_str) >= 2:
-            code_2 = plate_str[:2]
-            if code_2 in self.AUSTRIAN_LOOKUP:
-                municipality_info = self.AUSTRIAN_LOOKUP[code_2]
-                observation.municipality = code_2
-                logger.debug(
-                    f'Austrian plate mapped to region: '
-                    f'{municipality_info["municipality"]}, {municipality_info["state"]} (code: {code_2})'
-                )
-                return observation
-
-        # Try 1-letter codes
-        code_1 = plate_str[:1]
-        if code_1 in self.AUSTRIAN_LOOKUP:
-            municipality_info = self.AUSTRIAN_LOOKUP[code_1]
-            observation.municipality = code_1
-            logger.debug(
-                f'Austrian plate mapped to region: '
-                f'{municipality_info["municipality"]}, {municipality_info["state"]} (code: {code_1})'
-            )
+            logger.debug('No region match found for plate of unknown country')
             return observation
 
-        logger.debug(f"No Austrian region match found for plate '{observation.plate}'")
-        return observation
-
-    def _check_slovenian_municipalities(
-        self, observation: VehicleObservationRaw, plate_str: str
-    ) -> VehicleObservationRaw:
-        """Check Slovenian municipality codes and fix country if unknown"""
-
-        # Try 2-letter codes
-        if len(plate_str) >= 2:
-            code_2 = plate_str[:2]
-            if code_2 in self.SLOVENIAN_LOOKUP:
-                municipality_info = self.SLOVENIAN_LOOKUP[code_2]
-                observation.municipality = code_2
-
-                # Fix country code if it was unknown
-                if observation.country_code == 'unknown':
-                    observation.country_code = 'si'
-                    logger.debug(
-                        f"Fixed plate country changed to 'si' "
-                        f'(region: {municipality_info["municipality"]}, code: {code_2})'
-                    )
-                else:
-                    logger.debug(
-                        f'Slovenian plate mapped to region: {municipality_info["municipality"]} (code: {code_2})'
-                    )
+        if not self.municipalities.table.max_length(normalized_country):
+            logger.debug("No municipality mapping for country '%s'", observation.country_code)
+            return observation
 
-                return observation
+        match = self.lookup(normalized_country, plate_str)
+        if match is None:
+            logger.debug("No region match found for plate '%s' in '%s'", observation.plate, normalized_country)
+            return observation
 
-        logger.debug('No Slovenian region match found for plate')
+        code, municipality = match
+        observation.municipality = code
+        logger.debug('Plate mapped to region: %s, %s (code: %s)', municipality.name, municipality.state, code)
         return observation
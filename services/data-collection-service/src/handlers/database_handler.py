@@ -2,35 +2,50 @@ from datetime import datetime, timedelta
 from hashlib import sha256
 from typing import Any
 
-from sqlalchemy import and_, select
+from sqlalchemy import BigInteger, Insert, bindparam, cast, column, exists, insert, select, text, values
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from src.enums.vehicle_orientation import VehicleOrientation
-from src.exceptions.database_exceptions import (
-    DatabaseIntegrityError,
-    DatabaseQueryError,
-)
+from src.exceptions.database_exceptions import DatabaseIntegrityError
 from src.logger import logger
 from src.models.vehicle_observation import VehicleObservation
-from src.schemas.vehicle_observation import (
-    VehicleObservationCreate,
-    VehicleObservationRaw,
+from src.schemas.vehicle_observation import VehicleObservationRecord, validate_observation
+
+
+OBSERVATION_COLUMNS = (
+    'plate_hash',
+    'plate_score',
+    'country_code',
+    'municipality',
+    'vehicle_type',
+    'make',
+    'model',
+    'color',
+    'orientation',
+    'timestamp',
+)
+
+LOCK_PLATES = text('SELECT pg_advisory_xact_lock(key) FROM unnest(:keys) AS key ORDER BY key').bindparams(
+    bindparam('keys', type_=ARRAY(BigInteger))
 )
 
 
 class DatabaseHandler:
     """Handler for the connections to the database and saving new vehicle observations"""
 
-    def new_observation(self, reader_result: Any, detection_timestamp: datetime) -> list[VehicleObservationRaw]:
-        """extracts obervation data from analyzer result json
+    def new_observation(self, reader_result: Any, detection_timestamp: datetime) -> list[VehicleObservationRecord]:
+        """extracts and validates obervation data from analyzer result json
+
+        This is the only place the observation fields are validated, the later
+        pipeline stages update the returned records in place.
 
         Args:
             reader_result (Any): analyzer results in json format
             detection_timestamp (datetime): timestamp when the webhook was called
 
         Returns:
-            list[VehicleObservationRaw]: list of vehicle obervation objects
+            list[VehicleObservationRecord]: list of vehicle obervation records
         """
         _observation_list: list = []
         results_list = reader_result.get('results', [])
@@ -41,97 +56,118 @@ class DatabaseHandler:
 
         for observation in results_list:
             try:
-                data = VehicleObservationRaw(
-                    plate=observation.get('plate', ''),
-                    plate_score=int(observation['candidates'][0]['score'] * 1000),
-                    country_code=observation.get('region', {}).get('code', ''),
-                    municipality=None,
-                    vehicle_type=observation.get('vehicle', {}).get('type', ''),
-                    make=observation['model_make'][0]['make'],
-                    model=observation['model_make'][0]['model'],
-                    color=observation['color'][0]['color'],
-                    orientation=VehicleOrientation(observation['orientation'][0]['orientation'].lower()),
-                    timestamp=detection_timestamp,
+                data = validate_observation(
+                    {
+                        'plate': observation.get('plate', ''),
+                        'plate_score': int(observation['candidates'][0]['score'] * 1000),
+                        'country_code': observation.get('region', {}).get('code', ''),
+                        'vehicle_type': observation.get('vehicle', {}).get('type', ''),
+                        'make': observation['model_make'][0]['make'],
+                        'model': observation['model_make'][0]['model'],
+                        'color': observation['color'][0]['color'],
+                        'orientation': observation['orientation'][0]['orientation'].lower(),
+                        'timestamp': detection_timestamp,
+                    }
                 )
                 _observation_list.append(data)
-            except (KeyError, IndexError, TypeError) as e:
-                logger.exception(f'Malformed observation entry: {e}. Data: {observation}')
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.exception('Malformed observation entry: %s. Data: %s', e, observation)
                 continue
         return _observation_list
 
-    def check_for_duplicates(
-        self,
-        db: Session,
-        observation: VehicleObservationCreate,
-        current_detection_time: datetime,
-        interval: timedelta,
-    ) -> bool:
+    def hash_plate(self, observation: VehicleObservationRecord) -> VehicleObservationRecord:
+        """method for hashing plates for anonymisation in storage
+
+        Args:
+            observation (VehicleObservationRecord): vehicle observation with plain plate
+
+        Returns:
+            VehicleObservationRecord: the same observation with its plate hash set
         """
-        Checks if an observation with the same plate was saved within a given interval.
+        normalized = observation.plate.strip().lower()
+        logger.debug('Plate: %s', normalized)
+
+        observation.plate_hash = sha256(normalized.encode('utf-8')).digest()
+        return observation
+
+    def insert_unless_recent(
+        self, db: Session, observations: list[VehicleObservationRecord], interval: timedelta
+    ) -> list[VehicleObservation]:
+        """inserts every observation whose plate was not stored within the interval before it, in one statement
+
+        The plates are locked for the transaction first so concurrent detections of the same
+        plate are serialized, the insert statement then sees rows committed by the other one.
 
         Args:
             db (Session): db session
-            observation (VehicleObservationCreate): vehicle observation object
-            current_detection_time (datetime): time of the detection
+            observations (list[VehicleObservationRecord]): hashed observations with distinct plate hashes
             interval (timedelta): time window to check for duplicates
+
         Raises:
-            DatabaseQueryError: raised when an error occurs in the db query
+            DatabaseIntegrityError: raised when the database throws an integrity error
 
         Returns:
-            bool: True if a duplicate is found
+            list[VehicleObservation]: the observations that were stored, duplicates are left out
         """
+        if not observations:
+            return []
+
+        stmt = self.unless_recent_insert(observations, interval)
+        keys = sorted({int.from_bytes(observation.plate_hash[:8], 'big', signed=True) for observation in observations})
+
         try:
-            start_time = current_detection_time - interval
-            stmt = select(VehicleObservation).where(
-                and_(
-                    VehicleObservation.plate_hash == observation.plate_hash,
-                    VehicleObservation.timestamp >= start_time,
-                    VehicleObservation.timestamp <= current_detection_time,
-                )
-            )
-            duplicate_observation = db.execute(stmt).scalars().first()
+            db.execute(LOCK_PLATES, {'keys': keys})
+            db_observations = list(db.scalars(stmt))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise DatabaseIntegrityError('Insertion into database failed') from e
 
-            if duplicate_observation:
+        stored = {db_observation.plate_hash for db_observation in db_observations}
+        for observation in observations:
+            if observation.plate_hash not in stored:
                 logger.info(
-                    f'Duplicate observation for plate hash '
-                    f'{observation.plate_hash.hex()} within {interval} of detection. Skipping'
+                    'Duplicate observation within %s of detection. Skipping',
+                    interval,
+                    extra={'event': 'duplicate_skipped', 'plate_hash': observation.plate_hash},
                 )
+        for db_observation in db_observations:
+            self._log_saved(db_observation)
+        return db_observations
 
-            return duplicate_observation is not None
-        except SQLAlchemyError as e:
-            raise DatabaseQueryError('Error while checking for duplicates') from e
-
-    def hash_plate(self, observation: VehicleObservationRaw) -> VehicleObservationCreate:
-        """method for hashing plates for anonymisation in storage
+    def unless_recent_insert(self, observations: list[VehicleObservationRecord], interval: timedelta) -> Insert:
+        """builds the statement inserting the observations whose plate has no observation within the interval before
 
         Args:
-            observation (VehicleObservationRaw): vehicle observation object with plain plate
+            observations (list[VehicleObservationRecord]): hashed observations, at least one
+            interval (timedelta): time window to check for duplicates
 
         Returns:
-            VehicleObservationCreate: vehicle observation object with hashed plate
+            Insert: statement returning the stored observations
         """
-        normalized = observation.plate.strip().lower()
-        logger.debug(f'Plate: {normalized}')
-
-        return VehicleObservationCreate(
-            plate_hash=sha256(normalized.encode('utf-8')).digest(),
-            plate_score=observation.plate_score,
-            country_code=observation.country_code,
-            municipality=observation.municipality,
-            vehicle_type=observation.vehicle_type,
-            make=observation.make,
-            model=observation.model,
-            color=observation.color,
-            orientation=observation.orientation,
-            timestamp=observation.timestamp,
+        table = VehicleObservation.__table__
+        candidates = values(
+            *(column(name, table.c[name].type) for name in OBSERVATION_COLUMNS), name='candidates'
+        ).data([tuple(getattr(observation, name) for name in OBSERVATION_COLUMNS) for observation in observations])
+        # literal values carry no column types, cast them to the ones of the table
+        typed = {name: cast(candidates.c[name], table.c[name].type) for name in OBSERVATION_COLUMNS}
+        recent = exists().where(
+            VehicleObservation.plate_hash == typed['plate_hash'],
+            VehicleObservation.timestamp >= typed['timestamp'] - interval,
+            VehicleObservation.timestamp <= typed['timestamp'],
+        )
+        return (
+            insert(VehicleObservation)
+            .from_select(list(OBSERVATION_COLUMNS), select(*typed.values()).where(~recent))
+            .returning(VehicleObservation)
         )
 
-    def create_observation_entry(self, db: Session, observation: VehicleObservationCreate) -> VehicleObservation | None:
+    def create_observation_entry(self, db: Session, observation: VehicleObservationRecord) -> VehicleObservation | None:
         """creates a new entry in the db
 
         Args:
             db (Session): db session
-            observation (VehicleObservationCreate): observation object for db insertion
+            observation (VehicleObservationRecord): hashed observation for db insertion
 
         Raises:
             DatabaseIntegrityError: raised when the database throws an integrity error
@@ -139,36 +175,34 @@ class DatabaseHandler:
         Returns:
             VehicleObservation | None: returns object or none on failure
         """
-        db_observation = VehicleObservation(
-            plate_hash=observation.plate_hash,
-            plate_score=observation.plate_score,
-            country_code=observation.country_code,
-            municipality=observation.municipality,
-            vehicle_type=observation.vehicle_type,
-            make=observation.make,
-            model=observation.model,
-            color=observation.color,
-            orientation=observation.orientation,
-            timestamp=observation.timestamp,
-        )
+        db_observation = VehicleObservation(**{name: getattr(observation, name) for name in OBSERVATION_COLUMNS})
 
         try:
             db.add(db_observation)
             db.commit()
             db.refresh(db_observation)
 
-            logger.info(
-                f'Observation saved. ID: {db_observation.id}, '
-                f'Timestamp: {db_observation.timestamp}, '
-                f'Plate Hash: {db_observation.plate_hash.hex()} Conf.: {db_observation.plate_score}, '
-                f'Country: {db_observation.country_code}, '
-                f'Municipality: {db_observation.municipality or "-"}, '
-                f'Vehicle Type: {db_observation.vehicle_type}, '
-                f'Make: {db_observation.make}, '
-                f'Model: {db_observation.model}, '
-                f'Color: {db_observation.color}, '
-                f'Orientation: {db_observation.orientation.value}'
-            )
+            self._log_saved(db_observation)
             return db_observation
         except SQLAlchemyError as e:
             raise DatabaseIntegrityError('Insertion into database failed') from e
+
+    def _log_saved(self, db_observation: VehicleObservation) -> None:
+        # fields are only converted and written by the log writer thread, for the records that are sampled
+        logger.info(
+            'Observation saved',
+            extra={
+                'event': 'observation_saved',
+                'observation_id': db_observation.id,
+                'timestamp': db_observation.timestamp,
+                'plate_hash': db_observation.plate_hash,
+                'plate_score': db_observation.plate_score,
+                'country_code': db_observation.country_code,
+                'municipality': db_observation.municipality,
+                'vehicle_type': db_observation.vehicle_type,
+                'make': db_observation.make,
+                'model': db_observation.model,
+                'color': db_observation.color,
+                'orientation': db_observation.orientation,
+            },
+        )
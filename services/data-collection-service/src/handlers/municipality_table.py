@@ -0,0 +1,420 @@
+"""Compiled municipality lookup tables stored in a memory-mappable file
+
+Layout, little endian:
+
+* header: magic, version, country count, sha256 of the source json, offset and length of the strings
+* one directory entry per country: region code, longest code length, offset and length of its table
+* per country a uint16 table with one slot per alphanumeric plate prefix of length 1 to the longest
+  code length, holding the 1-based index of the longest matching municipality code, 0 for none
+* the municipalities as `code, state, name` strings
+
+A lookup converts the leading plate characters to a slot with `int(prefix, 36)`, so it
+costs one read from the mapped table regardless of the number of codes. Answers for
+full-length prefixes are remembered per table, so frequent prefixes skip the conversion.
+
+Build the artifact for a data file with:
+
+    python -m src.handlers.municipality_table /app/shared-data/municipalities.json /app/shared-data/municipalities.bin
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import string
+import struct
+import sys
+import threading
+import time
+from array import array
+from hashlib import sha256
+from itertools import product
+from typing import NamedTuple
+
+from src.handlers.prefix_trie import PrefixTrie
+
+# not src.logger, the artifact is built in the image where the service settings are not available yet
+logger = logging.getLogger(__name__)
+
+# country names used in municipalities.json and the recognizer region codes they belong to
+COUNTRY_CODES = {
+    'Austria': 'at',
+    'Germany': 'de',
+    'Hungary': 'hu',
+    'Slovenia': 'si',
+}
+
+MAGIC = b'LPMT'
+VERSION = 1
+HEADER = struct.Struct('<4sHH32sII')
+DIRECTORY_ENTRY = struct.Struct('<2sBxII')
+# 36 ** 4 slots of two bytes, enough for the longest codes in use
+MAX_CODE_LENGTH = 4
+
+_ALPHABET = string.digits + string.ascii_uppercase
+_FIELD_SEPARATOR = '\x1f'
+_ENTRY_SEPARATOR = '\x1e'
+_MISSING = object()
+
+
+class Municipality(NamedTuple):
+    """Region a plate prefix belongs to"""
+
+    country: str
+    state: str
+    name: str
+
+
+def parse_municipalities(data: dict) -> dict[str, PrefixTrie[Municipality]]:
+    """Builds a prefix trie per recognizer region code from the municipality data
+
+    Args:
+        data (dict): municipality codes per country name, every country maps group names to lists of
+            `{code: municipality}` dicts, where the group is a state or `Municipalities` for countries without states
+
+    Returns:
+        dict[str, PrefixTrie[Municipality]]: trie per region code
+    """
+    tries: dict[str, PrefixTrie[Municipality]] = {}
+    for country_name, groups in data.items():
+        country = COUNTRY_CODES.get(country_name)
+        if country is None:
+            logger.warning(f"Skipping municipalities of unsupported country '{country_name}'")
+            continue
+
+        trie = tries.setdefault(country, PrefixTrie())
+        for group_name, municipalities in groups.items():
+            state = country_name if group_name == 'Municipalities' else group_name
+            for municipality_dict in municipalities:
+                for code, name in municipality_dict.items():
+                    trie.insert(code.upper(), Municipality(country=country, state=state, name=name))
+    return tries
+
+
+def build_artifact(data: dict, source_digest: bytes = bytes(32)) -> bytes:
+    """Compiles municipality data into the binary table format
+
+    Args:
+        data (dict): municipality codes per country name, see `parse_municipalities`
+        source_digest (bytes): sha256 of the source file, used to detect a stale artifact
+
+    Raises:
+        ValueError: If a code is too long or contains characters other than letters and digits
+
+    Returns:
+        bytes: the artifact
+    """
+    tries = parse_municipalities(data)
+
+    entries: list[tuple[str, Municipality]] = []
+    directory = []
+    tables = []
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(tries)
+    for country, trie in sorted(tries.items()):
+        index = {}
+        for code, municipality in sorted(trie.items()):
+            if len(code) > MAX_CODE_LENGTH or not (code.isascii() and code.isalnum()):
+                raise ValueError(f"Unsupported municipality code '{code}' for '{country}'")
+            entries.append((code, municipality))
+            index[code] = len(entries)
+
+        slots = array('H')
+        for length in range(1, trie.max_length + 1):
+            for chars in product(_ALPHABET, repeat=length):
+                match = trie.longest_prefix(''.join(chars))
+                slots.append(index[match[0]] if match else 0)
+        if len(entries) > 0xFFFF:
+            raise ValueError('Too many municipality codes for the table format')
+        if sys.byteorder != 'little':
+            slots.byteswap()
+
+        directory.append(DIRECTORY_ENTRY.pack(country.encode('ascii'), trie.max_length, offset, len(slots)))
+        tables.append(slots.tobytes())
+        offset += len(tables[-1])
+
+    strings = _ENTRY_SEPARATOR.join(
+        _FIELD_SEPARATOR.join((code, municipality.country, municipality.state, municipality.name))
+        for code, municipality in entries
+    ).encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, len(directory), source_digest, offset, len(strings))
+    return b''.join([header, *directory, *tables, strings])
+
+
+class MunicipalityTable:
+    """Read-only view of a municipality artifact, either memory-mapped or held in memory"""
+
+    def __init__(self, buffer: bytes | mmap.mmap):
+        """
+        Args:
+            buffer (bytes | mmap.mmap): artifact content
+
+        Raises:
+            ValueError: If the buffer is not a supported artifact
+        """
+        magic, version, country_count, self.source_digest, strings_offset, strings_length = HEADER.unpack_from(
+            buffer, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a municipality table artifact of a supported version')
+
+        self._buffer = buffer
+        view = memoryview(buffer)
+        strings = bytes(view[strings_offset : strings_offset + strings_length]).decode('utf-8')
+        self._entries: list[tuple[str, Municipality]] = []
+        for entry in strings.split(_ENTRY_SEPARATOR) if strings else []:
+            code, country, state, name = entry.split(_FIELD_SEPARATOR)
+            self._entries.append((code, Municipality(country=country, state=state, name=name)))
+
+        # region code -> (slots, longest code length, first slot per prefix length, answers read so far)
+        self._countries: dict[str, tuple[memoryview | array, int, list[int], dict]] = {}
+        for position in range(country_count):
+            country, max_length, table_offset, slot_count = DIRECTORY_ENTRY.unpack_from(
+                buffer, HEADER.size + position * DIRECTORY_ENTRY.size
+            )
+            raw = view[table_offset : table_offset + slot_count * 2]
+            if sys.byteorder == 'little':
+                slots = raw.cast('H')
+            else:
+                slots = array('H', raw)
+                slots.byteswap()
+            # slots of the prefixes of length n start after those of all shorter lengths
+            starts = [0, 0]
+            for length in range(1, max_length):
+                starts.append(starts[-1] + 36**length)
+            self._countries[country.decode('ascii')] = (slots, max_length, starts, {})
+
+    @classmethod
+    def open(cls, path: str) -> 'MunicipalityTable':
+        """Maps an artifact file into memory
+
+        Args:
+            path (str): location of the artifact
+
+        Returns:
+            MunicipalityTable: table reading from the mapped file
+        """
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @property
+    def countries(self) -> list[str]:
+        """Region codes with municipality data"""
+        return list(self._countries)
+
+    def codes(self, country: str) -> list[tuple[str, Municipality]]:
+        """Lists the municipality codes of a country
+
+        Args:
+            country (str): recognizer region code
+
+        Returns:
+            list[tuple[str, Municipality]]: codes with their municipality
+        """
+        return [entry for entry in self._entries if entry[1].country == country]
+
+    def max_length(self, country: str) -> int:
+        """Length of the longest code of a country, 0 without data"""
+        table = self._countries.get(country)
+        return table[1] if table else 0
+
+    def lookup(self, country: str, plate: str) -> tuple[str, Municipality] | None:
+        """Finds the longest municipality code of a country that the plate starts with
+
+        Args:
+            country (str): recognizer region code, e.g. 'at'
+            plate (str): normalized upper case plate
+
+        Returns:
+            tuple[str, Municipality] | None: matched code and its municipality, None without a match
+        """
+        table = self._countries.get(country)
+        if table is None:
+            return None
+
+        slots, max_length, starts, seen = table
+        prefix = plate[:max_length]
+        match = seen.get(prefix, _MISSING)
+        if match is not _MISSING:
+            return match
+
+        if not (prefix.isascii() and prefix.isalnum()):
+            # codes only contain letters and digits, so matching stops at the first other character
+            for position, char in enumerate(prefix):
+                if char not in _ALPHABET:
+                    prefix = prefix[:position]
+                    break
+            if not prefix:
+                return None
+
+        entry = slots[starts[len(prefix)] + int(prefix, 36)]
+        match = self._entries[entry - 1] if entry else None
+        if len(prefix) == max_length:
+            # bounded by the slots of the longest prefixes, only the pages of prefixes in use get read
+            seen[prefix] = match
+        return match
+
+
+class MunicipalityTables:
+    """Holds the current municipality table, loading it lazily and swapping it when the source file changes
+
+    The artifact is used as long as it was built from the current source file, otherwise
+    it is rebuilt. Lookups keep using the previous table while a new one is built, the
+    swap itself is a single reference assignment.
+    """
+
+    def __init__(self, source: str | None, artifact: str | None, watch_interval: float = 30):
+        """
+        Args:
+            source (str | None): municipalities json the tables are built from
+            artifact (str | None): location of the compiled artifact, rebuilt next to the source if stale
+            watch_interval (float): seconds between checks of the source file, 0 disables watching
+        """
+        self.source = source
+        self.artifact = artifact
+        self.watch_interval = watch_interval
+
+        self._table: MunicipalityTable | None = None
+        self._source_state: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+
+        self.reloads = 0
+
+    @classmethod
+    def from_data(cls, data: dict) -> 'MunicipalityTables':
+        """Creates tables from municipality data held in memory, without a file to watch
+
+        Args:
+            data (dict): municipality codes per country name
+
+        Returns:
+            MunicipalityTables: tables that never reload
+        """
+        tables = cls(source=None, artifact=None, watch_interval=0)
+        tables._table = MunicipalityTable(build_artifact(data))
+        return tables
+
+    @property
+    def table(self) -> MunicipalityTable:
+        """The current table, loaded on first access"""
+        table = self._table
+        if table is not None:
+            return table
+
+        with self._lock:
+            if self._table is None:
+                self._table = self._load()
+            return self._table
+
+    @property
+    def stats(self) -> dict:
+        """Loaded countries and number of reloads"""
+        table = self._table
+        return {
+            'loaded': table is not None,
+            'countries': {country: len(table.codes(country)) for country in table.countries} if table else {},
+            'reloads': self.reloads,
+        }
+
+    def start(self) -> None:
+        """Loads the tables and watches the source file in a background thread"""
+        if self._watcher is not None or self.source is None:
+            return
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def close(self) -> None:
+        """Stops watching the source file"""
+        self._stop.set()
+
+    def check(self) -> bool:
+        """Reloads the tables if the source file changed since they were loaded
+
+        Returns:
+            bool: True if a new table was swapped in
+        """
+        if self._source_state is not None and self._read_source_state() == self._source_state:
+            return False
+
+        table = self._load()
+        with self._lock:
+            reloaded = self._table is not None
+            self._table = table
+        if reloaded:
+            self.reloads += 1
+            logger.info(f'Reloaded municipality tables from {self.source}')
+        return reloaded
+
+    def _watch(self) -> None:
+        try:
+            self.table
+        except Exception as e:
+            logger.warning(f'Loading municipality tables failed: {e}')
+
+        while self.watch_interval and not self._stop.wait(self.watch_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f'Reloading municipality tables failed, keeping the current ones: {e}')
+
+    def _read_source_state(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.source)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> MunicipalityTable:
+        start = time.perf_counter()
+        self._source_state = self._read_source_state()
+        if self._source_state is None:
+            # an image may ship only the artifact
+            table = MunicipalityTable.open(self.artifact)
+            logger.info(f'Loaded municipality tables from {self.artifact} without a source file')
+            return table
+
+        with open(self.source, 'rb') as f:
+            content = f.read()
+        digest = sha256(content).digest()
+
+        try:
+            table = MunicipalityTable.open(self.artifact)
+            if table.source_digest == digest:
+                logger.info(f'Mapped municipality tables from {self.artifact}')
+                return table
+        except (OSError, ValueError):
+            pass
+
+        artifact = build_artifact(json.loads(content), source_digest=digest)
+        try:
+            tmp_path = f'{self.artifact}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(artifact)
+            os.replace(tmp_path, self.artifact)
+            table = MunicipalityTable.open(self.artifact)
+        except OSError as e:
+            logger.warning(f'Could not write municipality artifact {self.artifact}, keeping it in memory: {e}')
+            table = MunicipalityTable(artifact)
+
+        logger.info(f'Built municipality tables from {self.source} in {time.perf_counter() - start:.3f}s')
+        return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compiles municipalities.json into the binary lookup artifact')
+    parser.add_argument('source', help='municipalities json')
+    parser.add_argument('artifact', help='output file')
+    args = parser.parse_args()
+
+    with open(args.source, 'rb') as f:
+        content = f.read()
+    artifact = build_artifact(json.loads(content), source_digest=sha256(content).digest())
+    with open(args.artifact, 'wb') as f:
+        f.write(artifact)
+    print(f'Wrote {len(artifact)} bytes to {args.artifact}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,94 @@
+import time
 from io import BytesIO
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
 from tenacity import (
-    retry,
-    retry_if_exception_type,
+    Retrying,
+    retry_if_exception,
     stop_after_attempt,
-    wait_fixed,
+    wait_random_exponential,
 )
 
 from src.exceptions.plate_recognizer_exceptions import PlateRecognizerCallError
+from src.handlers.recognizer_pool import RecognizerPool
+from src.handlers.resilience import LatencyRecorder
+from src.tracing import tracer
+
+REGIONS = ['at', 'hu', 'si', 'de']
+
+
+def is_transient(error: BaseException) -> bool:
+    """Checks whether a failed request is worth retrying
+
+    Args:
+        error (BaseException): exception raised by the request
+
+    Returns:
+        bool: True for connection problems, timeouts, rate limiting and server errors
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def instance_failed(error: BaseException) -> bool | None:
+    """Tells what a failed request says about the instance it went to, for its circuit breaker
+
+    Args:
+        error (BaseException): exception raised by the request
+
+    Returns:
+        bool | None: True for transient failures, False if the instance answered with a client error,
+            None if the error says nothing about the instance
+    """
+    if is_transient(error):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return False
+    return None
 
 
 class PlateRecognizerHandler:
     """Handler for plate recongition with the PlateRecognizer Snapshot API"""
 
-    @retry(
-        wait=wait_fixed(1),
-        stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(requests.HTTPError),
-        reraise=True,
-    )
-    def send_to_api(self, api_key: str, image_data: bytes, camera_name: str, service_url: str) -> Any:
+    def __init__(
+        self,
+        recognizers: RecognizerPool,
+        pool_size: int = 10,
+        max_attempts: int = 5,
+        backoff_max_seconds: float = 10,
+    ):
+        """
+        Args:
+            recognizers (RecognizerPool): recognizer instances requests are balanced across
+            pool_size (int): number of keep-alive connections kept to each instance
+            max_attempts (int): attempts per request including the first one
+            backoff_max_seconds (float): upper bound of the jittered wait between attempts
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(recognizers.endpoints), pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.recognizers = recognizers
+        self.latency = LatencyRecorder()
+        self._retrying = Retrying(
+            wait=wait_random_exponential(multiplier=0.5, max=backoff_max_seconds),
+            stop=stop_after_attempt(max_attempts),
+            retry=retry_if_exception(is_transient),
+            reraise=True,
+        )
+
+    @property
+    def stats(self) -> dict:
+        """Per-call latency of the api and load and breaker state per instance"""
+        return {'latency': self.latency.stats, 'instances': self.recognizers.stats}
+
+    def send_to_api(self, api_key: str, image_data: bytes, camera_name: str) -> Any:
         """sends a new request to the api
 
         Args:
@@ -29,30 +96,48 @@ class PlateRecognizerHandler:
 
         Raises:
             PlateRecognizerCallError: raised if the api returns fails
-            Exception: thrown on unexpected errors
+            PlateRecognizerUnavailableError: raised if every instance is ejected
 
         Returns:
             Any: response json with plate and vehicle data
         """
         try:
-            image_buffer = BytesIO(image_data)
-
-            response = requests.post(
-                f'{service_url}/v1/plate-reader/',
-                data={
-                    'camera_id': camera_name,
-                    'regions': ['at', 'hu', 'si', 'de'],
-                    'mmc': 'true',
-                    'direction': 'true',
-                },
-                files={'upload': image_buffer},
-                headers={'Authorization': f'Token {api_key}'},
-                timeout=15,
-            )
-            response.raise_for_status()
-
+            response = self._retrying(self._post, api_key, image_data, camera_name)
             return response.json()
         except requests.RequestException as e:
             raise PlateRecognizerCallError(f'Error when calling the Plate Recognizer api: {e}')
-        except Exception:
-            raise
+
+    def _post(self, api_key: str, image_data: bytes, camera_name: str) -> requests.Response:
+        # one span per attempt, so retries and the instance each went to show up in the trace
+        with tracer.span('alpr_attempt', bytes=len(image_data)) as span:
+            # every attempt picks an instance again, so retries move away from a failing one
+            endpoint = self.recognizers.acquire()
+            span.attributes['instance'] = endpoint.url
+            start = time.perf_counter()
+            # stays None if the attempt is cancelled or fails unexpectedly, which still ends it on the instance
+            failed = None
+            try:
+                response = self.session.post(
+                    f'{endpoint.url}/v1/plate-reader/',
+                    data={
+                        'camera_id': camera_name,
+                        'regions': REGIONS,
+                        'mmc': 'true',
+                        'direction': 'true',
+                    },
+                    files={'upload': BytesIO(image_data)},
+                    headers={'Authorization': f'Token {api_key}'},
+                    timeout=15,
+                )
+                span.attributes['status_code'] = response.status_code
+                response.raise_for_status()
+            except requests.RequestException as e:
+                self.latency.record(time.perf_counter() - start, failed=True)
+                failed = instance_failed(e)
+                raise
+            else:
+                self.latency.record(time.perf_counter() - start)
+                failed = False
+                return response
+            finally:
+                self.recognizers.release(endpoint, failed=failed)
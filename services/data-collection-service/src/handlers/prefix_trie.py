@@ -0,0 +1,112 @@
+import string
+from collections.abc import Iterator
+from itertools import product
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+
+# key of the value stored in a node, can never collide with a plate character
+_VALUE = ''
+_MISSING = object()
+
+# characters of normalized plates, every combination of them is precompiled for short keys
+PLATE_ALPHABET = string.ascii_uppercase + string.digits
+# 36 ** 3 entries per trie, longer keys fall back to probing the node table
+MAX_COMPILED_LENGTH = 3
+
+
+class PrefixTrie(Generic[T]):
+    """Character trie answering longest-prefix queries
+
+    Before the first query the trie is compiled into two flat tables. The node table
+    holds, for every node, the longest key on the path to it. When keys are at most
+    `MAX_COMPILED_LENGTH` characters long, the answer for every possible leading
+    `max_length` characters of a plate is precomputed as well, so a query is a single
+    dict lookup. Texts that are shorter or contain other characters probe the node table
+    from the longest possible prefix down, which takes at most `max_length` lookups.
+    """
+
+    def __init__(self):
+        self._root: dict = {}
+        # node path -> longest key on the path with its value, None if there is none
+        self._nodes: dict[str, tuple[str, T] | None] | None = None
+        # leading max_length characters -> longest matching key with its value
+        self._compiled: dict[str, tuple[str, T] | None] = {}
+        self.max_length = 0
+        self.size = 0
+
+    def insert(self, key: str, value: T) -> None:
+        """Stores a value under a key, replacing an earlier value of the same key
+
+        Args:
+            key (str): non-empty prefix to match
+            value (T): value returned for plates starting with the key
+        """
+        if not key:
+            raise ValueError('Prefix trie keys must not be empty')
+
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if _VALUE not in node:
+            self.size += 1
+        node[_VALUE] = value
+        self.max_length = max(self.max_length, len(key))
+        self._nodes = None
+
+    def items(self) -> Iterator[tuple[str, T]]:
+        """Iterates over all stored keys and values
+
+        Returns:
+            Iterator[tuple[str, T]]: stored keys with their values
+        """
+        stack = [('', self._root)]
+        while stack:
+            prefix, node = stack.pop()
+            if _VALUE in node:
+                yield prefix, node[_VALUE]
+            stack.extend((prefix + char, child) for char, child in node.items() if char != _VALUE)
+
+    def longest_prefix(self, text: str) -> tuple[str, T] | None:
+        """Finds the longest stored key that the text starts with
+
+        Args:
+            text (str): text to match, e.g. a normalized plate
+
+        Returns:
+            tuple[str, T] | None: matched key and its value, None if no key matches
+        """
+        if self._nodes is None:
+            self.compile()
+
+        match = self._compiled.get(text[: self.max_length], _MISSING)
+        if match is not _MISSING:
+            return match
+        return self._probe(text)
+
+    def _probe(self, text: str) -> tuple[str, T] | None:
+        for length in range(min(len(text), self.max_length), 0, -1):
+            node = self._nodes.get(text[:length], _MISSING)
+            # the deepest node on the path of the text holds the answer, shorter prefixes can't do better
+            if node is not _MISSING:
+                return node
+        return None
+
+    def compile(self) -> None:
+        """Builds the lookup tables, done on the first query if not called after the last insert"""
+        nodes = {}
+        stack = [('', self._root, None)]
+        while stack:
+            prefix, node, best = stack.pop()
+            if _VALUE in node:
+                best = prefix, node[_VALUE]
+            if prefix:
+                nodes[prefix] = best
+            stack.extend((prefix + char, child, best) for char, child in node.items() if char != _VALUE)
+        self._nodes = nodes
+
+        self._compiled = {}
+        if self.max_length <= MAX_COMPILED_LENGTH:
+            for chars in product(PLATE_ALPHABET, repeat=self.max_length):
+                leading = ''.join(chars)
+                self._compiled[leading] = self._probe(leading)
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class RecentPlateIndex:
+    """In-memory index of the plates stored within the duplicate interval
+
+    Maps a plate hash to the timestamp of its last stored observation. The index
+    only answers for detections whose whole interval lies after the process
+    started and after the newest entry it ever had to evict, otherwise the caller
+    has to fall back to the database.
+    """
+
+    def __init__(self, interval: timedelta, max_entries: int, started_at: datetime | None = None):
+        """
+        Args:
+            interval (timedelta): time window in which a plate counts as duplicate
+            max_entries (int): maximum number of plates kept in memory
+            started_at (datetime | None): time from which every stored observation is recorded, defaults to now
+        """
+        self.interval = interval
+        self.max_entries = max_entries
+
+        # timestamps are kept as epoch seconds so naive and aware datetimes compare alike
+        self._window = interval.total_seconds()
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+        self._covered_since = started_at.timestamp() if started_at else time.time()
+        self._evicted_until: float | None = None
+        self._newest: float | None = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict:
+        """Size and hit ratio of the index"""
+        lookups = self.hits + self.fallbacks
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'fallbacks': self.fallbacks,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+    def is_duplicate(self, plate_hash: bytes, detection_time: datetime) -> bool | None:
+        """Checks whether the plate was stored within the interval before the detection
+
+        Args:
+            plate_hash (bytes): hashed plate of the observation
+            detection_time (datetime): time of the detection
+
+        Returns:
+            bool | None: the answer, or None if the index cannot tell and the database has to be asked
+        """
+        detected_at = detection_time.timestamp()
+        window_start = detected_at - self._window
+
+        with self._lock:
+            last_seen = self._entries.get(plate_hash)
+            covered = window_start >= self._covered_since and (
+                self._evicted_until is None or window_start > self._evicted_until
+            )
+
+            # a newer entry may hide an older one inside the window
+            if not covered or (last_seen is not None and last_seen > detected_at):
+                self.fallbacks += 1
+                return None
+
+            self.hits += 1
+            return last_seen is not None and last_seen >= window_start
+
+    def record(self, plate_hash: bytes, timestamp: datetime) -> None:
+        """Records a stored observation and evicts entries that left the interval
+
+        Args:
+            plate_hash (bytes): hashed plate of the stored observation
+            timestamp (datetime): timestamp of the stored observation
+        """
+        seen_at = timestamp.timestamp()
+
+        with self._lock:
+            last_seen = self._entries.get(plate_hash)
+            if last_seen is None or seen_at > last_seen:
+                self._entries[plate_hash] = seen_at
+                self._entries.move_to_end(plate_hash)
+
+            if self._newest is None or seen_at > self._newest:
+                self._newest = seen_at
+
+            cutoff = self._newest - self._window
+            while self._entries:
+                oldest_hash, oldest_seen = next(iter(self._entries.items()))
+                if oldest_seen >= cutoff and len(self._entries) <= self.max_entries:
+                    break
+                self._evict(oldest_hash)
+
+    def _evict(self, plate_hash: bytes) -> None:
+        last_seen = self._entries.pop(plate_hash)
+        self.evictions += 1
+        if self._evicted_until is None or last_seen > self._evicted_until:
+            self._evicted_until = last_seen
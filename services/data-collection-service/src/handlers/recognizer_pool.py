@@ -0,0 +1,187 @@
+import itertools
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import requests
+
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerUnavailableError
+from src.handlers.resilience import CircuitBreaker
+from src.logger import logger
+
+
+def probe_endpoint(url: str) -> bool:
+    """Checks whether a recognizer instance answers, like the container health check
+
+    Args:
+        url (str): base url of the instance
+
+    Returns:
+        bool: True if the instance responded successfully
+    """
+    try:
+        return requests.get(f'{url}/', timeout=2).ok
+    except requests.RequestException:
+        return False
+
+
+@dataclass
+class RecognizerEndpoint:
+    """A recognizer instance with its in-flight request count and circuit breaker"""
+
+    url: str
+    breaker: CircuitBreaker
+    outstanding: int = 0
+    requests: int = 0
+
+    @property
+    def stats(self) -> dict:
+        """Load and breaker state of the instance"""
+        return {
+            'url': self.url,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'breaker': self.breaker.stats,
+        }
+
+
+class RecognizerPool:
+    """Routes recognizer requests to the healthy instance with the fewest outstanding requests
+
+    An instance is ejected while its circuit breaker is open. Instances whose breaker is
+    not closed are probed in the background and put back as soon as they answer again,
+    the recovery listeners are called whenever an instance is back.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        probe_interval: float = 5,
+        probe: Callable[[str], bool] = probe_endpoint,
+    ):
+        """
+        Args:
+            urls (list[str]): base urls of the recognizer instances
+            failure_threshold (int): consecutive failures that eject an instance
+            reset_timeout (float): seconds after which an ejected instance gets a trial request
+            probe_interval (float): seconds between health probes of ejected instances
+            probe (Callable[[str], bool]): health check of an instance url
+        """
+        if not urls:
+            raise ValueError('At least one Plate Recognizer url is required')
+
+        self.endpoints = [
+            RecognizerEndpoint(
+                url=url.rstrip('/'),
+                breaker=CircuitBreaker(
+                    name=f'Plate Recognizer {url}',
+                    failure_threshold=failure_threshold,
+                    reset_timeout=reset_timeout,
+                ),
+            )
+            for url in urls
+        ]
+        self.probe_interval = probe_interval
+        self.probe = probe
+
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        self._prober: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._recovery_listeners: list[Callable[[], None]] = []
+
+    @property
+    def healthy(self) -> int:
+        """Number of instances whose circuit breaker is closed"""
+        return sum(endpoint.breaker.state == CircuitBreaker.CLOSED for endpoint in self.endpoints)
+
+    @property
+    def stats(self) -> list[dict]:
+        """Load and breaker state per instance"""
+        return [endpoint.stats for endpoint in self.endpoints]
+
+    def add_recovery_listener(self, listener: Callable[[], None]) -> None:
+        """Registers a callback for instances whose breaker closes again
+
+        Args:
+            listener (Callable[[], None]): called without the pool lock, from the prober thread or the caller of release
+        """
+        self._recovery_listeners.append(listener)
+
+    def acquire(self) -> RecognizerEndpoint:
+        """Picks the instance for the next request and counts it as outstanding
+
+        Raises:
+            PlateRecognizerUnavailableError: If every instance is ejected
+
+        Returns:
+            RecognizerEndpoint: the healthy instance with the fewest outstanding requests
+        """
+        with self._lock:
+            # rotating the start spreads ties across instances instead of always picking the first
+            offset = next(self._rotation) % len(self.endpoints)
+            rotated = self.endpoints[offset:] + self.endpoints[:offset]
+            candidates = sorted(
+                (endpoint for endpoint in rotated if endpoint.breaker.state != CircuitBreaker.OPEN),
+                key=lambda endpoint: (endpoint.outstanding, endpoint.breaker.consecutive_failures),
+            )
+
+            for endpoint in candidates:
+                if endpoint.breaker.allow_call():
+                    endpoint.outstanding += 1
+                    endpoint.requests += 1
+                    return endpoint
+
+        raise PlateRecognizerUnavailableError('No healthy Plate Recognizer instance available')
+
+    def release(self, endpoint: RecognizerEndpoint, failed: bool | None) -> None:
+        """Finishes a request on an instance
+
+        Args:
+            endpoint (RecognizerEndpoint): instance returned by acquire
+            failed (bool | None): True for transient failures, False if the instance answered, None if the
+                outcome says nothing about the instance, e.g. the request was cancelled
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+
+        if failed:
+            endpoint.breaker.record_failure()
+            if endpoint.breaker.state != CircuitBreaker.CLOSED:
+                self._start_prober()
+        elif failed is False:
+            self._record_success(endpoint)
+        else:
+            endpoint.breaker.record_neutral()
+
+    def close(self) -> None:
+        """Stops the background health probes"""
+        self._stop.set()
+
+    def probe_ejected(self) -> None:
+        """Probes every ejected or half-open instance once and puts the healthy ones back"""
+        for endpoint in self.endpoints:
+            if endpoint.breaker.state != CircuitBreaker.CLOSED and self.probe(endpoint.url):
+                logger.info(f'Plate Recognizer instance {endpoint.url} is healthy again')
+                self._record_success(endpoint)
+
+    def _record_success(self, endpoint: RecognizerEndpoint) -> None:
+        if endpoint.breaker.record_success():
+            for listener in self._recovery_listeners:
+                listener()
+
+    def _start_prober(self) -> None:
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self) -> None:
+        while not self._stop.wait(self.probe_interval):
+            self.probe_ejected()
+            # a half-open instance may see no trial call for a long time, so it is probed until closed
+            if all(endpoint.breaker.state == CircuitBreaker.CLOSED for endpoint in self.endpoints):
+                return
@@ -0,0 +1,161 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+from src.logger import logger
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    After `failure_threshold` failures in a row the breaker opens and rejects
+    calls for `reset_timeout` seconds. The first call after that is let through
+    as a trial (half-open), its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """
+        Args:
+            name (str): name of the protected dependency, used in logs
+            failure_threshold (int): consecutive failures that open the breaker
+            reset_timeout (float): seconds the breaker stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current breaker state"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def consecutive_failures(self) -> int:
+        """Failures since the last successful call"""
+        return self._failures
+
+    @property
+    def stats(self) -> dict:
+        """Breaker state and counters"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+    def allow_call(self) -> bool:
+        """Checks whether a call may proceed
+
+        Returns:
+            bool: False if the breaker is open or a trial call is already running
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> bool:
+        """Closes the breaker after a successful call
+
+        Returns:
+            bool: True if the breaker was open or half-open before
+        """
+        with self._lock:
+            closed = self._state != self.CLOSED
+            if closed:
+                logger.info(f'Circuit breaker for {self.name} closed')
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+            return closed
+
+    def record_neutral(self) -> None:
+        """Ends a call whose outcome says nothing about the dependency
+
+        A half-open trial that ends this way is given up, so the next call becomes the trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Counts a failed call and opens the breaker once the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                    logger.warning(f'Circuit breaker for {self.name} opened after {self._failures} failures')
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class LatencyRecorder:
+    """Keeps call counts and a sliding window of latencies for percentile reporting"""
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window (int): number of most recent samples used for percentiles
+        """
+        self._samples: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+
+    @property
+    def stats(self) -> dict:
+        """Call counts and latency percentiles in seconds"""
+        samples = list(self._samples)
+        if len(samples) >= 2:
+            percentiles = statistics.quantiles(samples, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = samples[0] if samples else 0.0
+
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'p50_seconds': round(p50, 4),
+            'p95_seconds': round(p95, 4),
+            'p99_seconds': round(p99, 4),
+        }
+
+    def record(self, seconds: float, failed: bool = False) -> None:
+        """Adds a call sample
+
+        Args:
+            seconds (float): duration of the call
+            failed (bool): whether the call failed
+        """
+        self._samples.append(seconds)
+        self.calls += 1
+        if failed:
+            self.failures += 1
@@ -1,11 +1,181 @@
+import atexit
+import json
 import logging
+import queue
+import sys
+import threading
+from datetime import date, datetime
+from enum import Enum
+from logging.handlers import QueueHandler, QueueListener
 
 from src.config import settings
+from src.tracing import current_span
 
-logging.basicConfig(
-    level=settings.log_level,
-    format='%(asctime)s - data-collection-service - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()],
-)
+SERVICE_NAME = 'data-collection-service'
+
+# attributes every LogRecord has, everything else was passed as `extra` and is logged as a field
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'taskName'}
+
+
+def _field_value(value):
+    """converts a field to something json can hold, only called on the writer thread"""
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    """Collects the fields passed to a log call as `extra`
+
+    Args:
+        record (logging.LogRecord): emitted record
+
+    Returns:
+        dict: fields by name, converted for output
+    """
+    return {key: _field_value(value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one json object per line, with `extra` fields as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'service': SERVICE_NAME,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The plain text format, with `extra` fields appended as `key=value`"""
+
+    def __init__(self):
+        super().__init__(f'%(asctime)s - {SERVICE_NAME} - %(levelname)s - %(message)s')
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = record_fields(record)
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return message
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through a share of the records of each event, warnings and errors always pass
+
+    The event of a record is its `event` field. Sampling counts records instead of drawing
+    random numbers, so a rate of 0.1 logs exactly every tenth record of that event.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        """
+        Args:
+            rates (dict[str, float]): share of records to keep per event, events without a rate are all kept
+        """
+        super().__init__()
+        self.rates = rates
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, 'event', None)
+        rate = self.rates.get(event) if event is not None else None
+        if rate is None or rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            count = self._counts.get(event, 0) + 1
+            self._counts[event] = count
+            # keeps a record whenever the running total of kept records would grow
+            keep = int(count * rate) != int((count - 1) * rate)
+            if not keep:
+                self.sampled_out += 1
+        return keep
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds the trace and span id of the running code to its records"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to a bounded queue drained by a writer thread, dropping them when the queue is full
+
+    Records are queued unformatted so message formatting and serialization happen on the
+    writer thread. Arguments of a log call must therefore not be mutated after the call.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def make_formatter(log_format: str) -> logging.Formatter:
+    """Creates the formatter for the configured log format
+
+    Args:
+        log_format (str): `json` or `text`
+
+    Returns:
+        logging.Formatter: formatter used by the writer thread
+    """
+    return JsonFormatter() if log_format == 'json' else TextFormatter()
+
+
+_stream_handler = logging.StreamHandler(sys.stderr)
+_stream_handler.setFormatter(make_formatter(settings.log_format))
+log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+queue_handler = NonBlockingQueueHandler(log_queue)
+sampling_filter = SamplingFilter(settings.log_sample_rates)
+queue_handler.addFilter(sampling_filter)
+# runs on the calling thread, where the span is current
+queue_handler.addFilter(TraceContextFilter())
+listener = QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+
+logging.basicConfig(level=settings.log_level, handlers=[queue_handler])
+listener.start()
+# writes out what is still queued when the process exits
+atexit.register(listener.stop)
 
 logger = logging.getLogger(__name__)
+
+
+def log_stats() -> dict:
+    """Queue depth and the records that were not written
+
+    Returns:
+        dict: queued, dropped and sampled out records
+    """
+    return {
+        'queued': log_queue.qsize(),
+        'dropped': queue_handler.dropped,
+        'sampled_out': sampling_filter.sampled_out,
+    }
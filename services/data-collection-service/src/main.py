@@ -1,32 +1,79 @@
-import os
-from datetime import datetime, timedelta
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
 
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 
+from src.api.auth import verify_profiler_key
 from src.config import settings
-from src.db.session import get_db
-from src.handlers.camera_handler import CameraHandler
-from src.handlers.country_handler import CountryHandler
-from src.handlers.database_handler import DatabaseHandler
-from src.handlers.plate_recognizer_handler import PlateRecognizerHandler
-from src.logger import logger
+from src.db.session import async_engine
+from src.exceptions.ingestion_exceptions import QueueFullError
+from src.exceptions.profiler_exceptions import ProfilerBusyError
+from src.logger import log_stats, logger
+from src.metrics import render_metrics
+from src.pipeline.detection import (
+    async_camera_registry,
+    async_camera_service,
+    async_plate_service,
+    async_recognition_scheduler,
+    camera_registry,
+    change_gate,
+    municipality_tables,
+    plate_service,
+    process_vehicle_detection,
+    process_vehicle_detection_async,
+    recent_plates,
+    recognition_scheduler,
+    recognizer_pool,
+    snapshot_processor,
+    snapshot_store,
+)
+from src.pipeline.ingestion_queue import IngestionQueue
+from src.pipeline.spool import DetectionSpool
+from src.profiler import StackSampler
 from src.schemas.vehicle_detection_request import VehicleDetectionRequest
-from src.exceptions.camera_exceptions import CameraException
-from src.exceptions.database_exceptions import DatabaseException
-from src.exceptions.plate_recognizer_exceptions import PlateRecognizerException
-
-app = FastAPI()
-camera_service = CameraHandler()
-plate_service = PlateRecognizerHandler()
-db_handler = DatabaseHandler()
-country_handler = CountryHandler()
+from src.tracing import tracer
+
+# async detections run on the event loop, the sync path is offloaded to the threadpool
+ingestion_queue = IngestionQueue(
+    process=process_vehicle_detection_async
+    if settings.pipeline_mode == 'async'
+    else partial(asyncio.to_thread, process_vehicle_detection),
+    workers=settings.ingestion_workers,
+    max_depth=settings.ingestion_queue_size,
+    spool=DetectionSpool(path=settings.spool_path) if settings.spool_path else None,
+    coalesce_seconds=settings.coalesce_window_seconds,
+    camera_coalesce_seconds=settings.camera_coalesce_windows,
+    max_attempts=settings.ingestion_max_attempts,
+    retry_delay_seconds=settings.ingestion_retry_delay_seconds,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    municipality_tables.start()
+    await ingestion_queue.start()
+    yield
+    await ingestion_queue.stop()
+    await async_camera_service.aclose()
+    await async_plate_service.aclose()
+    plate_service.session.close()
+    recognizer_pool.close()
+    municipality_tables.close()
+    tracer.close()
+    snapshot_processor.shutdown()
+    if snapshot_store is not None:
+        snapshot_store.close()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 basic_auth = HTTPBasic()
-
-if settings.save_images_for_debug:
-    os.makedirs('/app/snapshots', exist_ok=True)
+profiler = StackSampler(max_seconds=settings.profiler_max_seconds)
 
 
 @app.get('/health')
@@ -34,6 +81,49 @@ async def health_check():
     return {'status': 'ok'}
 
 
+@app.get('/stats')
+async def get_stats():
+    if settings.pipeline_mode == 'async':
+        registry, recognizer, scheduler = async_camera_registry, async_plate_service, async_recognition_scheduler
+    else:
+        registry, recognizer, scheduler = camera_registry, plate_service, recognition_scheduler
+    stats = {
+        'camera_registry': registry.stats,
+        'plate_recognizer': recognizer.stats,
+        'recognition_scheduler': scheduler.stats,
+        'recent_plates': recent_plates.stats,
+        'snapshots': snapshot_processor.stats,
+        'change_gate': change_gate.stats,
+        'municipalities': municipality_tables.stats,
+        'logging': log_stats(),
+        'tracing': tracer.stats,
+        'ingestion_queue': ingestion_queue.stats,
+    }
+    if ingestion_queue.spool is not None:
+        stats['spool'] = ingestion_queue.spool.stats
+    if snapshot_store is not None:
+        stats['snapshot_store'] = snapshot_store.stats
+    return stats
+
+
+@app.get('/metrics')
+async def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get('/admin/profile', dependencies=[Depends(verify_profiler_key)])
+async def get_profile(
+    seconds: float = Query(10, gt=0, description='duration of the profile'),
+    interval_ms: float = Query(10, ge=1, le=1000, description='time between two samples'),
+):
+    try:
+        stacks = await profiler.profile_async(seconds=seconds, interval=interval_ms / 1000)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Custom exception handler to log all HTTPExceptions before returning the response"""
@@ -42,101 +132,32 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
         content={'detail': exc.detail},
+        headers=exc.headers,
     )
 
 
 @app.post('/api/vehicle_detected')
 async def handle_vehicle_detection(
     request: VehicleDetectionRequest,
-    background_tasks: BackgroundTasks,
     credentials: HTTPBasicCredentials = Depends(basic_auth),
 ):
     if credentials.username != settings.synology_username or credentials.password != settings.synology_password:
         raise HTTPException(status_code=401, detail='Incorrect username or password')
 
-    logger.info(f'Vehicle detected from camera: {request.camera}')
-
     detection_time = datetime.now()
     timestamp_str = detection_time.strftime('%Y%m%d_%H%M%S')
 
-    background_tasks.add_task(
-        process_vehicle_detection,
-        request.camera,
-        detection_time,
-    )
-
-    return {'status': 'accepted', 'timestamp': timestamp_str}
-
-
-def process_vehicle_detection(camera_name: str, detection_time: datetime):
-    """background task for vehicle detection handling
-
-    Args:
-        camera_name (str): name of the camera that called the webhook
-        detection_time (datetime): time the event was triggered
-    """
-    try:
-        with get_db() as db:
-            # Authenticate client
-            sid = camera_service.authenticate_client(
-                host=settings.synology_host,
-                username=settings.synology_username,
-                password=settings.synology_password,
-            )
-
-            # Get camera data
-            cameras = camera_service.get_camera_data(host=settings.synology_host, sid=sid)
-
-            # Find target camera
-            target_camera = camera_service.get_camera_by_name(cameras=cameras, camera_name=camera_name)
-
-            # Get camera snapshot
-            frame = camera_service.get_camera_snapshot(host=settings.synology_host, sid=sid, camera=target_camera)
-
-            image_data = frame.content
-            filename = f'observation_{detection_time}.jpg'
-            filepath = os.path.join('/app/snapshots', filename)
-
-            # Save image is enabled
-            if settings.save_images_for_debug:
-                try:
-                    with open(filepath, 'wb') as f:
-                        f.write(image_data)
-                    logger.info(f'Snapshot saved to {filepath}')
-                except Exception as e:
-                    logger.exception(f'Failed to save image: {e}')
-
-            # Send image to api
-            result = plate_service.send_to_api(
-                api_key=settings.api_key,
-                image_data=image_data,
-                camera_name=camera_name,
-                service_url=settings.plate_recognizer_service_url,
-            )
-            if not result:
-                logger.info('Plate Recognizer returned no actual observations')
-                return
-            logger.debug(f'Plate Recognizer results: {result}')
-
-            # Add result to db
-            observations_to_create = db_handler.new_observation(
-                reader_result=result, detection_timestamp=detection_time
+    # the detection queued here continues the trace of the webhook call
+    with tracer.span('webhook', camera=request.camera) as span:
+        logger.info('Vehicle detected', extra={'event': 'vehicle_detected', 'camera': request.camera})
+        try:
+            queued = await ingestion_queue.submit(camera_name=request.camera, detection_time=detection_time)
+        except QueueFullError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={'Retry-After': str(settings.ingestion_retry_after_seconds)},
             )
+        span.attributes['queued'] = queued
 
-            for observation_data in observations_to_create:
-                observation_data = country_handler.get_municipality_and_fix_country(observation=observation_data)
-                observation_data = db_handler.hash_plate(observation=observation_data)
-
-                if not db_handler.check_for_duplicates(
-                    db=db,
-                    observation=observation_data,
-                    current_detection_time=detection_time,
-                    interval=timedelta(seconds=settings.interval_seconds),
-                ):
-                    db_handler.create_observation_entry(db=db, observation=observation_data)
-
-    except (CameraException, PlateRecognizerException, DatabaseException) as e:
-        logger.exception(f'{type(e).__name__}: {e}')
-    except Exception as e:
-        logger.exception(f'Unexpected error during background processing: {e}')
-    return
+    return {'status': 'accepted' if queued else 'coalesced', 'timestamp': timestamp_str}
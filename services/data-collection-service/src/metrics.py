@@ -0,0 +1,108 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+from src.tracing import Span, tracer
+
+# a registry of its own, so only the metrics below are exported and tests can import this module repeatedly
+registry = CollectorRegistry()
+
+# from cache lookups and dict work up to recognizer calls that retry with backoff
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+END_TO_END_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 7.5, 10, 15, 30, 60, 120)
+
+stage_seconds = Histogram(
+    'detection_stage_seconds',
+    'Duration of one stage of the detection pipeline',
+    ['stage'],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+end_to_end_seconds = Histogram(
+    'detection_end_to_end_seconds',
+    'Time from the webhook call to the stored observations of a detection',
+    buckets=END_TO_END_BUCKETS,
+    registry=registry,
+)
+detections_total = Counter(
+    'detections',
+    'Processed detections by camera and outcome: recognized, no_plate, unchanged or error',
+    ['camera', 'outcome'],
+    registry=registry,
+)
+observations_total = Counter(
+    'observations',
+    'Recognized plates by camera and outcome: inserted or duplicate',
+    ['camera', 'outcome'],
+    registry=registry,
+)
+detection_errors_total = Counter(
+    'detection_errors',
+    'Failed detections by camera and exception type',
+    ['camera', 'error'],
+    registry=registry,
+)
+
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[Span]:
+    """Times a block as a pipeline stage and traces it as a span
+
+    Args:
+        name (str): stage label and span name, e.g. 'snapshot'
+        **attributes: span attributes
+
+    Yields:
+        Span: the span of the stage
+    """
+    with tracer.span(name, **attributes) as span, stage_seconds.labels(stage=name).time():
+        yield span
+
+
+def record_outcome(camera_name: str, outcome: str) -> None:
+    """Counts a processed detection
+
+    Args:
+        camera_name (str): camera that called the webhook
+        outcome (str): recognized, no_plate, unchanged or error
+    """
+    detections_total.labels(camera=camera_name, outcome=outcome).inc()
+
+
+def record_error(camera_name: str, error: Exception) -> None:
+    """Counts a failed detection with the type of its exception
+
+    Args:
+        camera_name (str): camera that called the webhook
+        error (Exception): exception that ended the detection
+    """
+    record_outcome(camera_name, 'error')
+    detection_errors_total.labels(camera=camera_name, error=type(error).__name__).inc()
+
+
+def record_stored(camera_name: str, detection_time: datetime, inserted: int, duplicates: int) -> None:
+    """Counts the observations of a recognized detection and its end-to-end latency
+
+    Args:
+        camera_name (str): camera that called the webhook
+        detection_time (datetime): time the webhook was called
+        inserted (int): observations stored
+        duplicates (int): observations skipped as duplicates
+    """
+    record_outcome(camera_name, 'recognized')
+    if inserted:
+        observations_total.labels(camera=camera_name, outcome='inserted').inc(inserted)
+    if duplicates:
+        observations_total.labels(camera=camera_name, outcome='duplicate').inc(duplicates)
+    end_to_end_seconds.observe((datetime.now(detection_time.tzinfo) - detection_time).total_seconds())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Renders all metrics in the Prometheus text format
+
+    Returns:
+        tuple[bytes, str]: response body and its content type
+    """
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String
 from sqlalchemy.dialects.postgresql import ENUM
 from sqlalchemy.sql import func
 
@@ -16,6 +16,10 @@ class VehicleObservation(IngestionBase):
     """
 
     __tablename__ = 'vehicle_observations'
+    __table_args__ = (
+        # serves the duplicate check, which filters on both columns
+        Index('ix_ingestion_schema_vehicle_observations_plate_hash_timestamp', 'plate_hash', 'timestamp'),
+    )
 
     id = Column(
         Integer,
@@ -31,7 +35,6 @@ class VehicleObservation(IngestionBase):
     plate_hash = Column(
         LargeBinary(32),
         nullable=False,
-        index=True,
     )
     plate_score = Column(
         Integer,
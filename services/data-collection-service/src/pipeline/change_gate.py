@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from src.logger import logger
+
+
+class ChangeGate:
+    """Skips recognition of snapshots that barely differ from the last one sent for the camera
+
+    Snapshots are reduced to a small grayscale thumbnail and compared with the thumbnail
+    of the last snapshot that passed the gate. The change is the mean absolute pixel
+    difference as a fraction of full brightness. It is averaged over the whole image, so
+    a vehicle filling a small part of it barely moves the mean, and the gate is better
+    used on snapshots cropped to the lane.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        camera_thresholds: dict[str, float] | None = None,
+        max_age_seconds: float = 60,
+        size: int = 32,
+    ):
+        """
+        Args:
+            threshold (float): change below which a snapshot is skipped, 0 disables the gate
+            camera_thresholds (dict[str, float] | None): per camera overrides of the threshold
+            max_age_seconds (float): age after which the reference frame no longer gates, so a parked vehicle is
+                recognized again once its duplicate window has passed
+            size (int): edge length of the compared thumbnails in pixels
+        """
+        self.threshold = threshold
+        self.camera_thresholds = camera_thresholds or {}
+        self.max_age_seconds = max_age_seconds
+        self.size = size
+
+        self._lock = threading.Lock()
+        # camera name -> (thumbnail of the last passed snapshot, time it passed)
+        self._references: dict[str, tuple[np.ndarray, float]] = {}
+        # camera name -> [gated, passed]
+        self._counts: dict[str, list[int]] = {}
+
+    @property
+    def stats(self) -> dict:
+        """Gated and passed snapshot counters"""
+        gated = sum(counts[0] for counts in self._counts.values())
+        passed = sum(counts[1] for counts in self._counts.values())
+        return {
+            'gated': gated,
+            'passed': passed,
+            'gated_ratio': round(gated / (gated + passed), 3) if gated + passed else 0.0,
+            'by_camera': {
+                camera_name: {'gated': counts[0], 'passed': counts[1]} for camera_name, counts in self._counts.items()
+            },
+        }
+
+    def changed(self, camera_name: str, image_data: bytes) -> bool:
+        """Checks whether a snapshot differs enough from the last one sent for the camera
+
+        A snapshot that passes becomes the new reference of the camera.
+
+        Args:
+            camera_name (str): name of the camera that took the snapshot
+            image_data (bytes): jpeg snapshot
+
+        Returns:
+            bool: False if the snapshot should be skipped
+        """
+        threshold = self.camera_thresholds.get(camera_name, self.threshold)
+        if not threshold:
+            return True
+
+        try:
+            thumbnail = self._thumbnail(image_data)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            logger.warning(f'Could not compare snapshot of {camera_name}, letting it pass: {e}')
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            counts = self._counts.setdefault(camera_name, [0, 0])
+            reference = self._references.get(camera_name)
+            if reference is not None and now - reference[1] <= self.max_age_seconds:
+                change = np.abs(thumbnail - reference[0]).mean() / 255
+                if change < threshold:
+                    counts[0] += 1
+                    logger.debug('Skipping snapshot of %s, change %.4f below %s', camera_name, change, threshold)
+                    return False
+
+            counts[1] += 1
+            self._references[camera_name] = (thumbnail, now)
+            return True
+
+    async def changed_async(self, camera_name: str, image_data: bytes) -> bool:
+        """Runs changed in a worker thread
+
+        Args:
+            camera_name (str): name of the camera that took the snapshot
+            image_data (bytes): jpeg snapshot
+
+        Returns:
+            bool: False if the snapshot should be skipped
+        """
+        return await asyncio.to_thread(self.changed, camera_name, image_data)
+
+    def forget(self, camera_name: str) -> None:
+        """Drops the reference of a camera, so its next snapshot passes
+
+        Args:
+            camera_name (str): name of the camera whose recognition failed
+        """
+        with self._lock:
+            self._references.pop(camera_name, None)
+
+    def _thumbnail(self, image_data: bytes) -> np.ndarray:
+        with Image.open(BytesIO(image_data)) as image:
+            # lets the jpeg decoder scale down while decoding instead of decoding the full frame
+            image.draft('L', (self.size, self.size))
+            thumbnail = image.convert('L').resize((self.size, self.size), Image.Resampling.BILINEAR)
+        # int16 so the difference of two thumbnails cannot wrap around
+        return np.asarray(thumbnail, dtype=np.int16)
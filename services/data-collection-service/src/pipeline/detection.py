@@ -0,0 +1,315 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.session import get_async_db, get_db
+from src.exceptions.camera_exceptions import CameraException
+from src.exceptions.database_exceptions import DatabaseException
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerException
+from src.handlers.async_camera_handler import AsyncCameraHandler
+from src.handlers.async_plate_recognizer_handler import AsyncPlateRecognizerHandler
+from src.handlers.camera_handler import CameraHandler
+from src.handlers.camera_registry import AsyncCameraRegistry, CameraRegistry
+from src.handlers.country_handler import CountryHandler
+from src.handlers.database_handler import DatabaseHandler
+from src.handlers.municipality_table import MunicipalityTables
+from src.handlers.plate_recognizer_handler import PlateRecognizerHandler
+from src.handlers.recent_plate_index import RecentPlateIndex
+from src.handlers.recognizer_pool import RecognizerPool
+from src.logger import logger
+from src.metrics import record_error, record_outcome, record_stored, stage
+from src.pipeline.change_gate import ChangeGate
+from src.pipeline.recognition_scheduler import AsyncRecognitionScheduler, RecognitionScheduler
+from src.pipeline.snapshot_processor import SnapshotProcessor
+from src.pipeline.snapshot_store import SnapshotStore
+from src.schemas.vehicle_observation import VehicleObservationRecord
+
+SNAPSHOT_DIR = '/app/snapshots'
+
+db_handler = DatabaseHandler()
+municipality_tables = MunicipalityTables(
+    source=settings.municipalities_path,
+    artifact=settings.municipalities_artifact_path,
+    watch_interval=settings.municipalities_watch_seconds,
+)
+country_handler = CountryHandler(municipalities=municipality_tables)
+snapshot_processor = SnapshotProcessor(
+    regions=settings.camera_regions,
+    max_size=settings.snapshot_max_size,
+    quality=settings.snapshot_jpeg_quality,
+    workers=settings.snapshot_workers,
+)
+change_gate = ChangeGate(
+    threshold=settings.change_gate_threshold,
+    camera_thresholds=settings.camera_change_thresholds,
+    max_age_seconds=settings.interval_seconds,
+)
+snapshot_store = (
+    SnapshotStore(
+        directory=SNAPSHOT_DIR,
+        max_bytes=settings.snapshot_store_max_mb * 1024 * 1024,
+        max_age_seconds=settings.snapshot_store_max_age_hours * 3600,
+        image_format=settings.snapshot_store_format,
+        evict_interval_seconds=settings.snapshot_store_evict_interval_seconds,
+    )
+    if settings.save_images_for_debug
+    else None
+)
+recent_plates = RecentPlateIndex(
+    interval=timedelta(seconds=settings.interval_seconds),
+    max_entries=settings.dedup_index_max_entries,
+)
+
+# Plate Recognizer instances shared by both pipelines, only one of them is active
+recognizer_pool = RecognizerPool(
+    urls=settings.plate_recognizer_service_urls,
+    failure_threshold=settings.plate_recognizer_breaker_threshold,
+    reset_timeout=settings.plate_recognizer_breaker_reset_seconds,
+    probe_interval=settings.plate_recognizer_probe_interval_seconds,
+)
+
+# Blocking handlers used by the sync pipeline
+camera_service = CameraHandler()
+plate_service = PlateRecognizerHandler(
+    recognizers=recognizer_pool,
+    pool_size=settings.plate_recognizer_pool_size,
+    max_attempts=settings.plate_recognizer_max_attempts,
+    backoff_max_seconds=settings.plate_recognizer_backoff_max_seconds,
+)
+recognition_scheduler = RecognitionScheduler(
+    slots=settings.plate_recognizer_max_concurrency, instances=lambda: recognizer_pool.healthy
+)
+camera_registry = CameraRegistry(
+    fetch_cameras=lambda: camera_service.run_with_session(
+        host=settings.synology_host,
+        username=settings.synology_username,
+        password=settings.synology_password,
+        operation=lambda sid: camera_service.get_camera_data(host=settings.synology_host, sid=sid),
+    ),
+    ttl_seconds=settings.camera_registry_ttl_seconds,
+)
+
+# Non-blocking handlers used by the async pipeline
+async_camera_service = AsyncCameraHandler()
+async_plate_service = AsyncPlateRecognizerHandler(
+    recognizers=recognizer_pool,
+    pool_size=settings.plate_recognizer_pool_size,
+    max_attempts=settings.plate_recognizer_max_attempts,
+    backoff_max_seconds=settings.plate_recognizer_backoff_max_seconds,
+)
+async_recognition_scheduler = AsyncRecognitionScheduler(
+    slots=settings.plate_recognizer_max_concurrency, instances=lambda: recognizer_pool.healthy
+)
+async_camera_registry = AsyncCameraRegistry(
+    fetch_cameras=lambda: async_camera_service.run_with_session(
+        host=settings.synology_host,
+        username=settings.synology_username,
+        password=settings.synology_password,
+        operation=lambda sid: async_camera_service.get_camera_data(host=settings.synology_host, sid=sid),
+    ),
+    ttl_seconds=settings.camera_registry_ttl_seconds,
+)
+
+# a recovered instance brings its slots back for the calls already waiting
+recognizer_pool.add_recovery_listener(recognition_scheduler.wake)
+recognizer_pool.add_recovery_listener(async_recognition_scheduler.wake)
+
+
+def store_observations(db: Session, result: Any, detection_time: datetime) -> tuple[int, int]:
+    """parses, enriches and saves all non-duplicate observations of a recognizer result
+
+    Args:
+        db (Session): db session
+        result (Any): Plate Recognizer response json
+        detection_time (datetime): time the event was triggered
+
+    Returns:
+        tuple[int, int]: number of inserted and of duplicate observations
+    """
+    with stage('enrichment'):
+        observations_to_create = db_handler.new_observation(reader_result=result, detection_timestamp=detection_time)
+        for observation_data in observations_to_create:
+            country_handler.get_municipality_and_fix_country(observation=observation_data)
+            db_handler.hash_plate(observation=observation_data)
+
+    candidates: list[VehicleObservationRecord] = []
+    seen_hashes: set[bytes] = set()
+    with stage('dedup'):
+        for observation_data in observations_to_create:
+            # the same plate twice in one frame is a duplicate even though neither row is stored yet
+            if observation_data.plate_hash in seen_hashes:
+                continue
+            seen_hashes.add(observation_data.plate_hash)
+
+            # a known recent plate can be skipped, everything else is checked by the insert itself
+            if recent_plates.is_duplicate(plate_hash=observation_data.plate_hash, detection_time=detection_time):
+                logger.info(
+                    'Duplicate observation in index. Skipping',
+                    extra={'event': 'duplicate_skipped', 'plate_hash': observation_data.plate_hash},
+                )
+                continue
+            candidates.append(observation_data)
+
+    with stage('insert'):
+        stored = db_handler.insert_unless_recent(
+            db=db, observations=candidates, interval=timedelta(seconds=settings.interval_seconds)
+        )
+    stored_hashes = {db_observation.plate_hash for db_observation in stored}
+    for observation_data in candidates:
+        if observation_data.plate_hash in stored_hashes:
+            recent_plates.record(plate_hash=observation_data.plate_hash, timestamp=observation_data.timestamp)
+    return len(stored), len(observations_to_create) - len(stored)
+
+
+def process_vehicle_detection(camera_name: str, detection_time: datetime) -> bool:
+    """background task for vehicle detection handling
+
+    Args:
+        camera_name (str): name of the camera that called the webhook
+        detection_time (datetime): time the event was triggered
+
+    Returns:
+        bool: False if the camera, Plate Recognizer or the database failed and the detection should be retried
+    """
+    try:
+        # Find target camera
+        target_camera = camera_registry.get_camera(camera_name=camera_name)
+
+        # Get camera snapshot with the shared Surveillance Station session
+        with stage('snapshot'):
+            frame = camera_service.run_with_session(
+                host=settings.synology_host,
+                username=settings.synology_username,
+                password=settings.synology_password,
+                operation=lambda sid: camera_service.get_camera_snapshot(
+                    host=settings.synology_host, sid=sid, camera=target_camera
+                ),
+            )
+            # the snapshot is streamed, reading it is part of the download
+            snapshot = frame.content
+        # Crop to the lane region and scale down before uploading
+        with stage('prepare'):
+            image_data = snapshot_processor.prepare(camera_name=camera_name, image_data=snapshot)
+
+        # Skip the recognizer if nothing changed since the last snapshot sent for the camera
+        with stage('change_gate'):
+            changed = change_gate.changed(camera_name=camera_name, image_data=image_data)
+        if not changed:
+            record_outcome(camera_name, 'unchanged')
+            return True
+
+        # Save image is enabled
+        if snapshot_store is not None:
+            snapshot_store.save(image_data=image_data, camera_name=camera_name, detection_time=detection_time)
+
+        # Send image to api once the camera's turn for a recognizer slot comes
+        try:
+            with recognition_scheduler.slot(camera_name), stage('alpr'):
+                result = plate_service.send_to_api(
+                    api_key=settings.api_key,
+                    image_data=image_data,
+                    camera_name=camera_name,
+                )
+        except PlateRecognizerException:
+            # the snapshot was never recognized, so a similar next one must not be skipped
+            change_gate.forget(camera_name)
+            raise
+        if not result:
+            logger.info('Plate Recognizer returned no actual observations')
+            record_outcome(camera_name, 'no_plate')
+            return True
+        logger.debug('Plate Recognizer results: %s', result)
+
+        # Add result to db
+        with get_db() as db:
+            inserted, duplicates = store_observations(db=db, result=result, detection_time=detection_time)
+        record_stored(camera_name, detection_time, inserted=inserted, duplicates=duplicates)
+
+    except (CameraException, PlateRecognizerException, DatabaseException) as e:
+        record_error(camera_name, e)
+        logger.exception(f'{type(e).__name__}: {e}')
+        return False
+    except Exception as e:
+        # retrying a bug would fail the same way, so the detection counts as finished
+        record_error(camera_name, e)
+        logger.exception(f'Unexpected error during background processing: {e}')
+    return True
+
+
+async def process_vehicle_detection_async(camera_name: str, detection_time: datetime) -> bool:
+    """non-blocking background task for vehicle detection handling
+
+    Every network and database step is awaited on the event loop, so concurrent
+    detections don't occupy a threadpool thread each.
+
+    Args:
+        camera_name (str): name of the camera that called the webhook
+        detection_time (datetime): time the event was triggered
+
+    Returns:
+        bool: False if the camera, Plate Recognizer or the database failed and the detection should be retried
+    """
+    try:
+        # Find target camera
+        target_camera = await async_camera_registry.get_camera(camera_name=camera_name)
+
+        # Get camera snapshot with the shared Surveillance Station session
+        with stage('snapshot'):
+            frame = await async_camera_service.run_with_session(
+                host=settings.synology_host,
+                username=settings.synology_username,
+                password=settings.synology_password,
+                operation=lambda sid: async_camera_service.get_camera_snapshot(
+                    host=settings.synology_host, sid=sid, camera=target_camera
+                ),
+            )
+        # Crop to the lane region and scale down in the worker pool before uploading
+        with stage('prepare'):
+            image_data = await snapshot_processor.prepare_async(camera_name=camera_name, image_data=frame.content)
+
+        # Skip the recognizer if nothing changed since the last snapshot sent for the camera
+        with stage('change_gate'):
+            changed = await change_gate.changed_async(camera_name=camera_name, image_data=image_data)
+        if not changed:
+            record_outcome(camera_name, 'unchanged')
+            return True
+
+        # Save image is enabled
+        if snapshot_store is not None:
+            snapshot_store.save(image_data=image_data, camera_name=camera_name, detection_time=detection_time)
+
+        # Send image to api once the camera's turn for a recognizer slot comes
+        try:
+            async with async_recognition_scheduler.slot(camera_name):
+                with stage('alpr'):
+                    result = await async_plate_service.send_to_api(
+                        api_key=settings.api_key,
+                        image_data=image_data,
+                        camera_name=camera_name,
+                    )
+        except PlateRecognizerException:
+            # the snapshot was never recognized, so a similar next one must not be skipped
+            change_gate.forget(camera_name)
+            raise
+        if not result:
+            logger.info('Plate Recognizer returned no actual observations')
+            record_outcome(camera_name, 'no_plate')
+            return True
+        logger.debug('Plate Recognizer results: %s', result)
+
+        # Add result to db, run_sync drives the ORM code through the asyncio driver
+        async with get_async_db() as db:
+            inserted, duplicates = await db.run_sync(store_observations, result=result, detection_time=detection_time)
+        record_stored(camera_name, detection_time, inserted=inserted, duplicates=duplicates)
+
+    except (CameraException, PlateRecognizerException, DatabaseException) as e:
+        record_error(camera_name, e)
+        logger.exception(f'{type(e).__name__}: {e}')
+        return False
+    except Exception as e:
+        # retrying a bug would fail the same way, so the detection counts as finished
+        record_error(camera_name, e)
+        logger.exception(f'Unexpected error during background processing: {e}')
+    return True
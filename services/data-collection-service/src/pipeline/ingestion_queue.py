@@ -0,0 +1,282 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from src.exceptions.ingestion_exceptions import QueueFullError
+from src.logger import logger
+from src.metrics import stage_seconds
+from src.pipeline.spool import DetectionSpool, SpoolRecord
+from src.tracing import Span, current_span, tracer
+
+
+@dataclass
+class DetectionEvent:
+    """A webhook call waiting to be processed"""
+
+    camera_name: str
+    detection_time: datetime
+    spool_id: str | None = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    coalesced: int = 0
+    # number of earlier attempts that failed transiently
+    attempts: int = 0
+    # span of the webhook call, the detection is traced as its child
+    trace_parent: Span | None = None
+
+
+class IngestionQueue:
+    """Bounded queue of detection events drained by a fixed pool of workers"""
+
+    def __init__(
+        self,
+        process: Callable[[str, datetime], Awaitable[bool]],
+        workers: int,
+        max_depth: int,
+        spool: DetectionSpool | None = None,
+        coalesce_seconds: float = 0,
+        camera_coalesce_seconds: dict[str, float] | None = None,
+        max_attempts: int = 1,
+        retry_delay_seconds: float = 0,
+    ):
+        """
+        Args:
+            process (Callable[[str, datetime], Awaitable[bool]]): coroutine function processing one detection,
+                returns False if it failed transiently and should be retried
+            workers (int): number of concurrent workers
+            max_depth (int): maximum number of waiting events before new ones are rejected
+            spool (DetectionSpool | None): journal that makes accepted events survive a restart
+            coalesce_seconds (float): window after an accepted event in which further events of the camera are merged
+            camera_coalesce_seconds (dict[str, float] | None): per camera overrides of the coalescing window
+            max_attempts (int): number of times a transiently failing detection is processed before it is given up,
+                a journaled detection then stays in the spool and is replayed on the next start
+            retry_delay_seconds (float): time before a failed detection is queued again
+        """
+        self.process = process
+        self.workers = workers
+        self.max_depth = max_depth
+        self.spool = spool
+        self.coalesce_seconds = coalesce_seconds
+        self.camera_coalesce_seconds = camera_coalesce_seconds or {}
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+
+        self._queue: asyncio.Queue[DetectionEvent] = asyncio.Queue(maxsize=max_depth)
+        self._worker_tasks: list[asyncio.Task] = []
+        self._replay_task: asyncio.Task | None = None
+        self._retry_tasks: set[asyncio.Task] = set()
+        self._started_at: float | None = None
+        # camera name -> event that later events of the camera are merged into, until it is processed
+        self._leaders: dict[str, DetectionEvent] = {}
+        self._coalesced_by_camera: dict[str, int] = {}
+
+        self.busy_workers = 0
+        self.processed = 0
+        self.rejected = 0
+        self.retried = 0
+        self.failed = 0
+        self._busy_seconds = 0.0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Number of events waiting for a worker"""
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> dict:
+        """Queue depth, wait time and worker utilisation"""
+        uptime = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        capacity = uptime * self.workers
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'workers': self.workers,
+            'busy_workers': self.busy_workers,
+            'utilisation': round(self._busy_seconds / capacity, 4) if capacity else 0.0,
+            'processed': self.processed,
+            'rejected': self.rejected,
+            'retried': self.retried,
+            'failed': self.failed,
+            'coalesced': sum(self._coalesced_by_camera.values()),
+            'coalesced_by_camera': dict(self._coalesced_by_camera),
+            'avg_wait_seconds': round(self._total_wait_seconds / self.processed, 4) if self.processed else 0.0,
+            'max_wait_seconds': round(self._max_wait_seconds, 4),
+        }
+
+    async def submit(self, camera_name: str, detection_time: datetime) -> bool:
+        """Adds a detection to the queue, journaling it first if a spool is configured.
+
+        Events arriving within the coalescing window of the previous accepted event of the
+        same camera are merged into it and share its snapshot and recognition, as long as
+        that event has not been processed yet.
+
+        Args:
+            camera_name (str): name of the camera that called the webhook
+            detection_time (datetime): time the event was triggered
+
+        Raises:
+            QueueFullError: If the queue is at its maximum depth
+
+        Returns:
+            bool: False if the event was merged into an earlier one
+        """
+        if self._coalesce(camera_name):
+            return False
+
+        if self._queue.full():
+            self.rejected += 1
+            raise QueueFullError(f'Ingestion queue is full ({self.max_depth} events waiting)')
+
+        spool_id = None
+        if self.spool is not None:
+            spool_id = await self.spool.append(camera_name=camera_name, detection_time=detection_time)
+
+        event = DetectionEvent(
+            camera_name=camera_name,
+            detection_time=detection_time,
+            spool_id=spool_id,
+            trace_parent=current_span.get(),
+        )
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # another request took the last slot while this one was being journaled
+            if spool_id is not None:
+                self.spool.mark_done(spool_id)
+            self.rejected += 1
+            raise QueueFullError(f'Ingestion queue is full ({self.max_depth} events waiting)')
+
+        self._leaders[camera_name] = event
+        return True
+
+    async def start(self) -> None:
+        """Starts the worker pool and replays unfinished detections from the spool"""
+        self._started_at = time.monotonic()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f'Ingestion queue started with {self.workers} workers and a depth of {self.max_depth}')
+
+        if self.spool is not None:
+            unfinished = await self.spool.open()
+            if unfinished:
+                self._replay_task = asyncio.create_task(self._replay(unfinished))
+
+    async def stop(self) -> None:
+        """Cancels the worker pool, events still waiting or due for a retry are replayed from the spool on next start"""
+        tasks = [*self._worker_tasks, *self._retry_tasks]
+        if self._replay_task:
+            tasks.append(self._replay_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._retry_tasks = set()
+        self._replay_task = None
+
+        if self.spool is not None:
+            await self.spool.close()
+
+    async def join(self) -> None:
+        """Waits until every queued event has been processed, including the retries of failed ones"""
+        await self._queue.join()
+        while self._retry_tasks:
+            await asyncio.gather(*self._retry_tasks, return_exceptions=True)
+            await self._queue.join()
+
+    def _coalesce(self, camera_name: str) -> bool:
+        """Merges the event into the last accepted one of the camera if that is still inside the window"""
+        window = self.camera_coalesce_seconds.get(camera_name, self.coalesce_seconds)
+        leader = self._leaders.get(camera_name)
+        if not window or leader is None or time.monotonic() - leader.enqueued_at > window:
+            return False
+
+        leader.coalesced += 1
+        self._coalesced_by_camera[camera_name] = self._coalesced_by_camera.get(camera_name, 0) + 1
+        return True
+
+    async def _replay(self, records: list[SpoolRecord]) -> None:
+        for record in records:
+            # waits for free slots instead of rejecting, new webhooks compete for the same capacity
+            await self._queue.put(
+                DetectionEvent(
+                    camera_name=record.camera_name,
+                    detection_time=record.detection_time,
+                    spool_id=record.record_id,
+                )
+            )
+
+    async def _retry(self, event: DetectionEvent) -> None:
+        await asyncio.sleep(self.retry_delay_seconds)
+        await self._queue.put(
+            DetectionEvent(
+                camera_name=event.camera_name,
+                detection_time=event.detection_time,
+                spool_id=event.spool_id,
+                attempts=event.attempts + 1,
+                trace_parent=event.trace_parent,
+            )
+        )
+
+    def _finish(self, event: DetectionEvent, completed: bool) -> None:
+        """Marks a processed event done or schedules its next attempt"""
+        if completed:
+            if event.spool_id is not None:
+                self.spool.mark_done(event.spool_id)
+            return
+
+        if event.attempts + 1 < self.max_attempts:
+            self.retried += 1
+            task = asyncio.create_task(self._retry(event))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+            return
+
+        self.failed += 1
+        logger.warning(
+            'Giving up on detection after %s attempts',
+            event.attempts + 1,
+            extra={'event': 'detection_failed', 'camera': event.camera_name, 'spooled': event.spool_id is not None},
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self._queue.get()
+            started = time.monotonic()
+            wait_seconds = started - event.enqueued_at
+            self._total_wait_seconds += wait_seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+            stage_seconds.labels(stage='queue_wait').observe(wait_seconds)
+
+            if event.coalesced:
+                logger.info(
+                    'Processing detection with %s coalesced events',
+                    event.coalesced,
+                    extra={'event': 'detection_processing', 'camera': event.camera_name},
+                )
+
+            self.busy_workers += 1
+            completed = True
+            try:
+                with tracer.span(
+                    'detection',
+                    parent=event.trace_parent,
+                    camera=event.camera_name,
+                    coalesced=event.coalesced,
+                    queue_wait_seconds=round(wait_seconds, 6),
+                ):
+                    completed = await self.process(event.camera_name, event.detection_time)
+            except Exception as e:
+                logger.exception(f'Unexpected error in ingestion worker: {e}')
+            finally:
+                self.busy_workers -= 1
+                self._busy_seconds += time.monotonic() - started
+                # a later event of the camera may have become its leader in the meantime
+                if self._leaders.get(event.camera_name) is event:
+                    del self._leaders[event.camera_name]
+
+            # not reached when the worker is cancelled mid-detection, so the event is replayed
+            self.processed += 1
+            self._finish(event, completed)
+            self._queue.task_done()
@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+
+from src.metrics import stage_seconds
+
+
+class RecognitionQueue:
+    """Recognizer slots and the calls waiting for them, shared by the sync and async schedulers
+
+    Waiting calls are queued per camera. Whenever a slot frees up it goes to the
+    oldest waiting call of the next camera in the rotation, so a busy camera can
+    not starve the quieter ones. With `instances` the slots are per healthy instance,
+    so the capacity shrinks while instances are ejected instead of piling their share
+    onto the remaining ones. When an instance is back, `wake` hands its slots to the
+    waiting calls right away instead of on the next release. Blocking for a slot is left to the subclasses, which wait
+    either on a thread event or on a future of the event loop.
+    """
+
+    def __init__(self, slots: int, instances: Callable[[], int] | None = None):
+        """
+        Args:
+            slots (int): number of recognizer calls allowed to run at the same time, per instance with `instances`
+            instances (Callable[[], int] | None): current number of healthy instances, at least one is assumed
+                so calls still reach the recognizers and fail fast while all are ejected
+        """
+        if slots < 1:
+            raise ValueError('The recognition scheduler needs at least one slot')
+
+        self.slots_per_instance = slots
+        self.instances = instances
+
+        self._in_flight = 0
+        # camera name -> waiting calls with their enqueue time, in round-robin order
+        self._waiting: OrderedDict[str, deque[tuple[object, float]]] = OrderedDict()
+        # camera name -> [granted, total wait seconds, max wait seconds]
+        self._waits: dict[str, list] = {}
+
+    @property
+    def slots(self) -> int:
+        """Number of recognizer calls currently allowed to run at the same time"""
+        instances = max(1, self.instances()) if self.instances is not None else 1
+        return self.slots_per_instance * instances
+
+    @property
+    def stats(self) -> dict:
+        """Slot usage and queue wait time per camera"""
+        return {
+            'slots': self.slots,
+            'in_flight': self._in_flight,
+            'waiting': sum(len(waiters) for waiters in self._waiting.values()),
+            'wait_by_camera': {
+                camera_name: {
+                    'granted': granted,
+                    'avg_wait_seconds': round(total / granted, 4),
+                    'max_wait_seconds': round(longest, 4),
+                }
+                for camera_name, (granted, total, longest) in self._waits.items()
+            },
+        }
+
+    def _try_take(self, camera_name: str) -> bool:
+        # queued calls go first, otherwise a steady stream of new calls could overtake them
+        if self._in_flight >= self.slots or self._waiting:
+            return False
+        self._in_flight += 1
+        self._record_wait(camera_name, 0.0)
+        return True
+
+    def _hand_over(self) -> list[object]:
+        """Frees a slot and takes the waiters the current capacity has room for, more than one if it grew"""
+        self._in_flight -= 1
+        return self._take_waiters()
+
+    def _take_waiters(self) -> list[object]:
+        """Takes the waiters the current capacity has room for"""
+        waiters = []
+        while self._in_flight < self.slots:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._in_flight += 1
+            waiters.append(waiter)
+        return waiters
+
+    def _enqueue(self, camera_name: str, waiter: object) -> None:
+        self._waiting.setdefault(camera_name, deque()).append((waiter, time.monotonic()))
+
+    def _next_waiter(self) -> object | None:
+        while self._waiting:
+            camera_name, waiters = self._waiting.popitem(last=False)
+            waiter, enqueued_at = waiters.popleft()
+            if waiters:
+                # the camera moves to the back of the rotation with its remaining calls
+                self._waiting[camera_name] = waiters
+            if self._is_abandoned(waiter):
+                continue
+            self._record_wait(camera_name, time.monotonic() - enqueued_at)
+            return waiter
+        return None
+
+    def _is_abandoned(self, waiter: object) -> bool:
+        return False
+
+    def _record_wait(self, camera_name: str, seconds: float) -> None:
+        waits = self._waits.setdefault(camera_name, [0, 0.0, 0.0])
+        waits[0] += 1
+        waits[1] += seconds
+        waits[2] = max(waits[2], seconds)
+        stage_seconds.labels(stage='recognizer_wait').observe(seconds)
+
+
+class RecognitionScheduler(RecognitionQueue):
+    """Caps concurrent recognizer calls of the threadpool pipeline and hands free slots to the cameras in turn"""
+
+    def __init__(self, slots: int, instances: Callable[[], int] | None = None):
+        """
+        Args:
+            slots (int): number of recognizer calls allowed to run at the same time, per instance with `instances`
+            instances (Callable[[], int] | None): current number of healthy instances, at least one is assumed
+        """
+        super().__init__(slots=slots, instances=instances)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, camera_name: str) -> Iterator[None]:
+        """Holds a recognizer slot for the duration of the block
+
+        Args:
+            camera_name (str): camera the call is made for
+        """
+        self.acquire(camera_name)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, camera_name: str) -> None:
+        """Blocks until the camera gets a recognizer slot
+
+        Args:
+            camera_name (str): camera the call is made for
+        """
+        with self._lock:
+            if self._try_take(camera_name):
+                return
+            waiter = threading.Event()
+            self._enqueue(camera_name, waiter)
+        waiter.wait()
+
+    def release(self) -> None:
+        """Frees a slot, passing it straight on to the next waiting camera"""
+        with self._lock:
+            waiters = self._hand_over()
+        for waiter in waiters:
+            waiter.set()
+
+    def wake(self) -> None:
+        """Lets waiting calls through up to the current capacity, called when it grew, from any thread"""
+        with self._lock:
+            waiters = self._take_waiters()
+        for waiter in waiters:
+            waiter.set()
+
+
+class AsyncRecognitionScheduler(RecognitionQueue):
+    """Caps concurrent recognizer calls of the async pipeline and hands free slots to the cameras in turn
+
+    Only used from the event loop, so the queue needs no lock, `wake` is passed to the loop.
+    """
+
+    def __init__(self, slots: int, instances: Callable[[], int] | None = None):
+        """
+        Args:
+            slots (int): number of recognizer calls allowed to run at the same time, per instance with `instances`
+            instances (Callable[[], int] | None): current number of healthy instances, at least one is assumed
+        """
+        super().__init__(slots=slots, instances=instances)
+        # loop of the calls waiting for a slot
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @asynccontextmanager
+    async def slot(self, camera_name: str) -> AsyncIterator[None]:
+        """Holds a recognizer slot for the duration of the block
+
+        Args:
+            camera_name (str): camera the call is made for
+        """
+        await self.acquire(camera_name)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, camera_name: str) -> None:
+        """Waits until the camera gets a recognizer slot
+
+        Args:
+            camera_name (str): camera the call is made for
+        """
+        if self._try_take(camera_name):
+            return
+
+        self._loop = asyncio.get_running_loop()
+        waiter = self._loop.create_future()
+        self._enqueue(camera_name, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # a slot handed over right before the cancellation must not be lost
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Frees a slot, passing it straight on to the next waiting camera"""
+        for waiter in self._hand_over():
+            waiter.set_result(None)
+
+    def wake(self) -> None:
+        """Lets waiting calls through up to the current capacity, called when it grew, from any thread"""
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake_waiters)
+        except RuntimeError:
+            # the loop is closed, so nothing waits on it any more
+            pass
+
+    def _wake_waiters(self) -> None:
+        for waiter in self._take_waiters():
+            waiter.set_result(None)
+
+    def _is_abandoned(self, waiter: asyncio.Future) -> bool:
+        return waiter.done()
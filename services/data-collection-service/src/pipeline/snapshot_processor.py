@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, UnidentifiedImageError
+
+from src.logger import logger
+
+# (left, top, right, bottom) as fractions of the frame so regions survive resolution changes
+Region = tuple[float, float, float, float]
+
+
+class SnapshotProcessor:
+    """Crops snapshots to the configured lane region of a camera and scales them down before recognition"""
+
+    def __init__(self, regions: dict[str, Region], max_size: int, quality: int = 90, workers: int = 2):
+        """
+        Args:
+            regions (dict[str, Region]): region of interest per camera name, cameras without one keep the full frame
+            max_size (int): maximum length of the longer image edge in pixels, 0 keeps the resolution
+            quality (int): jpeg quality of re-encoded images
+            workers (int): threads decoding and encoding images for the async pipeline
+        """
+        self.regions = regions
+        self.max_size = max_size
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='snapshot')
+        self._lock = threading.Lock()
+
+        self.processed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    @property
+    def stats(self) -> dict:
+        """Processed image counters"""
+        return {
+            'processed': self.processed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'size_ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+            'avg_seconds': round(self.seconds / self.processed, 4) if self.processed else 0.0,
+        }
+
+    def prepare(self, camera_name: str, image_data: bytes) -> bytes:
+        """Crops and scales a snapshot, returning it unchanged if there is nothing to do or it cannot be decoded
+
+        Args:
+            camera_name (str): name of the camera that took the snapshot
+            image_data (bytes): jpeg snapshot
+
+        Returns:
+            bytes: jpeg image to send to the recognizer
+        """
+        region = self.regions.get(camera_name)
+        if region is None and not self.max_size:
+            return image_data
+
+        start = time.perf_counter()
+        try:
+            prepared = self._transform(image_data, region)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            logger.warning(f'Could not prepare snapshot of {camera_name}, sending it unchanged: {e}')
+            return image_data
+
+        with self._lock:
+            self.processed += 1
+            self.bytes_in += len(image_data)
+            self.bytes_out += len(prepared)
+            self.seconds += time.perf_counter() - start
+        return prepared
+
+    async def prepare_async(self, camera_name: str, image_data: bytes) -> bytes:
+        """Runs prepare in the worker pool
+
+        Args:
+            camera_name (str): name of the camera that took the snapshot
+            image_data (bytes): jpeg snapshot
+
+        Returns:
+            bytes: jpeg image to send to the recognizer
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.prepare, camera_name, image_data)
+
+    def shutdown(self) -> None:
+        """Stops the worker pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _transform(self, image_data: bytes, region: Region | None) -> bytes:
+        with Image.open(BytesIO(image_data)) as image:
+            changed = False
+
+            if region is not None:
+                left, top, right, bottom = region
+                width, height = image.size
+                image = image.crop(
+                    (round(left * width), round(top * height), round(right * width), round(bottom * height))
+                )
+                changed = True
+
+            if self.max_size and max(image.size) > self.max_size:
+                image.thumbnail((self.max_size, self.max_size), Image.Resampling.LANCZOS)
+                changed = True
+
+            if not changed:
+                return image_data
+
+            buffer = BytesIO()
+            image.convert('RGB').save(buffer, format='JPEG', quality=self.quality)
+            return buffer.getvalue()
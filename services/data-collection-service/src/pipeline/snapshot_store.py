@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from hashlib import sha256
+from io import BytesIO
+from typing import Literal
+
+from PIL import Image
+
+from src.logger import logger
+
+SnapshotFormat = Literal['jpeg', 'webp']
+
+SIGHTINGS_SUFFIX = '.jsonl'
+
+
+class SnapshotStore:
+    """Debug snapshot directory written by a background thread and kept within a size and age quota
+
+    Files are named by their content hash alone, so identical frames are only stored once,
+    however often and by whichever camera they were sent. Every time a frame is saved, its
+    detection time and camera are appended to a `<content hash>.jsonl` sidecar, which points
+    to the observations of those detections and is deleted together with the image. A frame
+    saved again counts as new for the quota, sidecars are not counted towards its size.
+    The quota is enforced by the writer thread on startup, after every saved snapshot and,
+    so expired snapshots are also deleted while nothing is saved, every eviction interval.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_age_seconds: float,
+        image_format: SnapshotFormat = 'jpeg',
+        quality: int = 80,
+        max_pending: int = 32,
+        evict_interval_seconds: float = 600,
+    ):
+        """
+        Args:
+            directory (str): directory the snapshots are written to
+            max_bytes (int): total size after which the oldest snapshots are deleted, 0 disables the limit
+            max_age_seconds (float): age after which snapshots are deleted, 0 disables the limit
+            image_format (SnapshotFormat): `jpeg` stores frames as received, `webp` transcodes them
+            quality (int): quality of transcoded images
+            max_pending (int): snapshots waiting for the writer after which new ones are dropped
+            evict_interval_seconds (float): time between evictions of expired snapshots, 0 disables them
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.image_format = image_format
+        self.quality = quality
+        self.max_pending = max_pending
+        self.evict_interval_seconds = evict_interval_seconds
+
+        # name -> (size, mtime) ordered from oldest to newest, only touched by the writer thread
+        self._files: dict[str, tuple[int, float]] = {}
+        self._total_bytes = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._closed = False
+        self.saved = 0
+        self.dropped = 0
+        self.evicted = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-store')
+        self._executor.submit(self._load)
+        self._schedule_eviction()
+
+    @property
+    def stats(self) -> dict:
+        """Store counters and disk usage"""
+        return {
+            'files': len(self._files),
+            'bytes': self._total_bytes,
+            'pending': self._pending,
+            'saved': self.saved,
+            'dropped': self.dropped,
+            'evicted': self.evicted,
+        }
+
+    def save(self, image_data: bytes, camera_name: str, detection_time: datetime) -> None:
+        """Queues a snapshot for writing without blocking the caller
+
+        Args:
+            image_data (bytes): snapshot image data
+            camera_name (str): name of the camera that took the snapshot
+            detection_time (datetime): time the event was triggered
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                logger.warning('Snapshot writer is behind, dropping snapshot')
+                return
+            self._pending += 1
+
+        self._executor.submit(self._write, image_data, camera_name, detection_time)
+
+    def close(self) -> None:
+        """Writes the queued snapshots and stops the writer"""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+        self._executor.shutdown(wait=True)
+
+    def filename(self, image_data: bytes) -> str:
+        """Builds the file name of a snapshot
+
+        Args:
+            image_data (bytes): snapshot image data as received from the camera
+
+        Returns:
+            str: file name without directory
+        """
+        digest = sha256(image_data).hexdigest()[:16]
+        extension = 'webp' if self.image_format == 'webp' else 'jpg'
+        return f'{digest}.{extension}'
+
+    def sightings(self, name: str) -> list[dict]:
+        """Reads the detections a snapshot was saved for
+
+        Args:
+            name (str): file name of the snapshot
+
+        Returns:
+            list[dict]: `time` and `camera` of every detection, oldest first
+        """
+        try:
+            with open(self._sightings_path(name), encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _sightings_path(self, name: str) -> str:
+        return os.path.join(self.directory, os.path.splitext(name)[0] + SIGHTINGS_SUFFIX)
+
+    def _load(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        files = [
+            (entry.name, entry.stat())
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and not entry.name.endswith(('.tmp', SIGHTINGS_SUFFIX))
+        ]
+        # oldest first, new snapshots are appended so the dict stays ordered by age
+        for name, stat in sorted(files, key=lambda file: file[1].st_mtime):
+            self._files[name] = (stat.st_size, stat.st_mtime)
+            self._total_bytes += stat.st_size
+        self._evict()
+
+    def _write(self, image_data: bytes, camera_name: str, detection_time: datetime) -> None:
+        try:
+            name = self.filename(image_data)
+            path = os.path.join(self.directory, name)
+            if name in self._files:
+                # the frame was seen again, so it is evicted after the ones saved since
+                size, _ = self._files.pop(name)
+                now = time.time()
+                os.utime(path, (now, now))
+                self._files[name] = (size, now)
+                self._record_sighting(name, camera_name, detection_time)
+                return
+
+            if self.image_format == 'webp':
+                with Image.open(BytesIO(image_data)) as image:
+                    buffer = BytesIO()
+                    image.save(buffer, format='WEBP', quality=self.quality)
+                    image_data = buffer.getvalue()
+
+            with open(f'{path}.tmp', 'wb') as f:
+                f.write(image_data)
+            os.replace(f'{path}.tmp', path)
+
+            self._files[name] = (len(image_data), time.time())
+            self._total_bytes += len(image_data)
+            self._record_sighting(name, camera_name, detection_time)
+            self.saved += 1
+            logger.info(f'Snapshot saved to {path}')
+
+            self._evict()
+        except Exception as e:
+            logger.exception(f'Failed to save image: {e}')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _schedule_eviction(self) -> None:
+        # only the age limit is reached without new snapshots being saved
+        if not self.evict_interval_seconds or not self.max_age_seconds:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._timer = threading.Timer(self.evict_interval_seconds, self._submit_eviction)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _submit_eviction(self) -> None:
+        # the eviction runs on the writer thread, which owns the file index
+        with self._lock:
+            if self._closed:
+                return
+            self._executor.submit(self._evict_expired)
+
+    def _evict_expired(self) -> None:
+        try:
+            self._evict()
+        except Exception as e:
+            logger.exception(f'Failed to evict snapshots: {e}')
+        finally:
+            self._schedule_eviction()
+
+    def _record_sighting(self, name: str, camera_name: str, detection_time: datetime) -> None:
+        with open(self._sightings_path(name), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'time': detection_time.isoformat(), 'camera': camera_name}) + '\n')
+
+    def _evict(self) -> None:
+        """Deletes the oldest snapshots until the store is within its quota"""
+        expires = time.time() - self.max_age_seconds if self.max_age_seconds else None
+
+        for name, (size, mtime) in list(self._files.items()):
+            over_size = self.max_bytes and self._total_bytes > self.max_bytes
+            expired = expires is not None and mtime < expires
+            if not over_size and not expired:
+                break
+
+            for path in (os.path.join(self.directory, name), self._sightings_path(name)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            del self._files[name]
+            self._total_bytes -= size
+            self.evicted += 1
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from src.logger import logger
+
+
+@dataclass
+class SpoolRecord:
+    """An accepted detection that has not been processed yet"""
+
+    record_id: str
+    camera_name: str
+    detection_time: datetime
+
+
+class DetectionSpool:
+    """Append-only journal of accepted detections with group-committed fsyncs
+
+    Every accepted webhook is appended as an `accept` line and a `done` line is
+    added once the detection was processed. Appends issued while a flush is in
+    progress are written and fsynced together in the next batch, so the cost of
+    an fsync is shared by every event of a burst. On startup all accepted
+    records without a matching `done` line are returned for replay and the
+    journal is compacted to just those records.
+    """
+
+    def __init__(self, path: str, compact_after: int = 10_000):
+        """
+        Args:
+            path (str): location of the journal file
+            compact_after (int): number of written lines after which a fully processed journal is truncated
+        """
+        self.path = path
+        self.compact_after = compact_after
+
+        self._file = None
+        self._buffer: list[str] = []
+        self._waiters: list[asyncio.Future] = []
+        self._pending: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._writing: asyncio.Future | None = None
+        self._lines_written = 0
+
+        self.batches = 0
+        self.appended = 0
+
+    @property
+    def stats(self) -> dict:
+        """Journal counters"""
+        return {
+            'pending': len(self._pending),
+            'appended': self.appended,
+            'batches': self.batches,
+            'avg_batch_size': round(self.appended / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def open(self) -> list[SpoolRecord]:
+        """Opens the journal and returns the records that still need processing
+
+        Returns:
+            list[SpoolRecord]: accepted but unfinished detections in acceptance order
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        unfinished = await asyncio.to_thread(self._compact)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._pending = {record.record_id for record in unfinished}
+        self._lines_written = len(unfinished)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+        if unfinished:
+            logger.info(f'Replaying {len(unfinished)} unfinished detections from {self.path}')
+        return unfinished
+
+    async def close(self) -> None:
+        """Flushes outstanding lines and closes the journal"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._writing is not None:
+            # the batch in flight keeps writing in its thread, the file must not be closed under it
+            await asyncio.gather(self._writing, return_exceptions=True)
+            self._writing = None
+
+        if self._file is not None:
+            if self._buffer:
+                await asyncio.to_thread(self._write, self._buffer)
+                self._buffer = []
+            self._resolve_waiters()
+            self._file.close()
+            self._file = None
+
+    async def append(self, camera_name: str, detection_time: datetime) -> str:
+        """Durably records an accepted detection
+
+        Args:
+            camera_name (str): name of the camera that called the webhook
+            detection_time (datetime): time the event was triggered
+
+        Returns:
+            str: id used to mark the record as done
+        """
+        record_id = uuid.uuid4().hex
+        line = json.dumps({'op': 'accept', 'id': record_id, 'camera': camera_name, 'time': detection_time.isoformat()})
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._buffer.append(line)
+        self._waiters.append(waiter)
+        self._pending.add(record_id)
+        self.appended += 1
+        self._wakeup.set()
+
+        await waiter
+        return record_id
+
+    def mark_done(self, record_id: str) -> None:
+        """Records that a detection was processed, written with the next batch
+
+        Args:
+            record_id (str): id returned by append
+        """
+        self._pending.discard(record_id)
+        self._buffer.append(json.dumps({'op': 'done', 'id': record_id}))
+        self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # everything appended while the previous batch was syncing goes out together
+            lines, self._buffer = self._buffer, []
+            waiters, self._waiters = self._waiters, []
+            if not lines:
+                continue
+
+            try:
+                self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, lines))
+                await asyncio.shield(self._writing)
+            except Exception as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                continue
+
+            self.batches += 1
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+            if not self._pending and self._lines_written >= self.compact_after:
+                await asyncio.to_thread(self._truncate)
+
+    def _write(self, lines: list[str]) -> None:
+        self._file.write('\n'.join(lines) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines_written += len(lines)
+
+    def _truncate(self) -> None:
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._lines_written = 0
+
+    def _resolve_waiters(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _compact(self) -> list[SpoolRecord]:
+        """Reads the journal and rewrites it with only the unfinished records"""
+        records: dict[str, SpoolRecord] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a torn write from a crash can only affect the last line
+                        logger.warning(f'Skipping corrupt spool line: {line!r}')
+                        continue
+
+                    if entry['op'] == 'accept':
+                        records[entry['id']] = SpoolRecord(
+                            record_id=entry['id'],
+                            camera_name=entry['camera'],
+                            detection_time=datetime.fromisoformat(entry['time']),
+                        )
+                    elif entry['op'] == 'done':
+                        records.pop(entry['id'], None)
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records.values():
+                f.write(
+                    json.dumps(
+                        {
+                            'op': 'accept',
+                            'id': record.record_id,
+                            'camera': record.camera_name,
+                            'time': record.detection_time.isoformat(),
+                        }
+                    )
+                    + '\n'
+                )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        return list(records.values())
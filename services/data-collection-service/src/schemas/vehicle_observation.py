@@ -1,39 +1,33 @@
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Annotated
 
-from pydantic import BaseModel, Field
+from pydantic import Field, TypeAdapter
 
 from src.enums.vehicle_orientation import VehicleOrientation
 
 
-class VehicleObservationBase(BaseModel):
-    """vehicle observation base model"""
+@dataclass(slots=True)
+class VehicleObservationRecord:
+    """vehicle observation passed through parsing, enrichment, hashing and insertion
 
-    plate_score: int | None = None
-    country_code: str | None = Field(None, max_length=10)
-    municipality: str | None = Field(None, max_length=10)
-    vehicle_type: str | None = Field(None, max_length=30)
-    make: str | None = Field(None, max_length=30)
-    model: str | None = Field(None, max_length=50)
-    color: str | None = Field(None, max_length=30)
-    orientation: VehicleOrientation | None = None
-    timestamp: datetime = Field(default_factory=datetime.now)
-
-
-class VehicleObservationRaw(VehicleObservationBase):
-    """vehicle obervation schema with plain text plate
-
-    Args:
-        VehicleObservationBase (pydantic): base schema
+    Plain dataclass so the pipeline stages can update it in place. The field constraints
+    are only checked when the recognizer result is parsed, see `validate_observation`.
     """
 
-    plate: str = Field(..., max_length=30)
-
-
-class VehicleObservationCreate(VehicleObservationBase):
-    """vehicle obervation schema with hashed plate
+    plate: Annotated[str, Field(max_length=30)]
+    plate_score: int | None = None
+    country_code: Annotated[str | None, Field(max_length=10)] = None
+    municipality: Annotated[str | None, Field(max_length=10)] = None
+    vehicle_type: Annotated[str | None, Field(max_length=30)] = None
+    make: Annotated[str | None, Field(max_length=30)] = None
+    model: Annotated[str | None, Field(max_length=50)] = None
+    color: Annotated[str | None, Field(max_length=30)] = None
+    orientation: VehicleOrientation | None = None
+    timestamp: datetime = field(default_factory=datetime.now)
+    # set by hashing, the plain plate is never written to the database
+    plate_hash: Annotated[bytes | None, Field(min_length=32, max_length=32)] = None
 
-    Args:
-        VehicleObservationBase (pydantic): base schema
-    """
 
-    plate_hash: bytes = Field(..., min_length=32, max_length=32)
+# validates a dict of recognizer values and builds the record in one step
+validate_observation = TypeAdapter(VehicleObservationRecord).validate_python
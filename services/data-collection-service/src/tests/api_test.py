@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from src.config import settings
+from src.exceptions.ingestion_exceptions import QueueFullError
+
+AUTH = (settings.synology_username, settings.synology_password)
+
+
+def test_vehicle_detected_accepted(client: TestClient):
+    """
+    Test that a detection is queued and accepted.
+    """
+    with patch('src.main.ingestion_queue.submit') as mock_submit:
+        response = client.post('/api/vehicle_detected', json={'camera': 'Camera 1'}, auth=AUTH)
+
+    assert response.status_code == 200
+    assert response.json()['status'] == 'accepted'
+    assert mock_submit.call_args.kwargs['camera_name'] == 'Camera 1'
+
+
+def test_vehicle_detected_coalesced(client: TestClient):
+    """
+    Test that a detection merged into an earlier one is reported as coalesced.
+    """
+    with patch('src.main.ingestion_queue.submit', return_value=False):
+        response = client.post('/api/vehicle_detected', json={'camera': 'Camera 1'}, auth=AUTH)
+
+    assert response.status_code == 200
+    assert response.json()['status'] == 'coalesced'
+
+
+def test_vehicle_detected_wrong_credentials(client: TestClient):
+    """
+    Test that the webhook rejects invalid credentials.
+    """
+    response = client.post('/api/vehicle_detected', json={'camera': 'Camera 1'}, auth=('wrong', 'wrong'))
+    assert response.status_code == 401
+
+
+def test_vehicle_detected_queue_full(client: TestClient):
+    """
+    Test that a saturated ingestion queue returns 503 with a Retry-After header.
+    """
+    with patch('src.main.ingestion_queue.submit', side_effect=QueueFullError('full')):
+        response = client.post('/api/vehicle_detected', json={'camera': 'Camera 1'}, auth=AUTH)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(settings.ingestion_retry_after_seconds)
+
+
+def test_stats(client: TestClient):
+    """
+    Test that the stats endpoint reports the ingestion queue.
+    """
+    response = client.get('/stats')
+    assert response.status_code == 200
+    data = response.json()
+    assert data['ingestion_queue']['max_depth'] == settings.ingestion_queue_size
+    assert 'hits' in data['camera_registry']
+    assert data['plate_recognizer']['instances'][0]['breaker']['state'] == 'closed'
+    assert 'hit_ratio' in data['recent_plates']
+    assert data['recognition_scheduler']['in_flight'] == 0
+    assert data['change_gate']['gated'] == 0
+
+
+def test_metrics(client: TestClient):
+    """
+    Test that the metrics endpoint serves the pipeline metrics in the Prometheus format.
+    """
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert '# TYPE detection_stage_seconds histogram' in response.text
+    assert '# TYPE detection_end_to_end_seconds histogram' in response.text
+
+
+def test_profile_disabled_without_key(client: TestClient):
+    """
+    Test that the profiler endpoint does not exist unless a profiler api key is configured.
+    """
+    with patch.object(settings, 'profiler_api_key', ''):
+        response = client.get('/admin/profile', headers={'Authorization': ''})
+    assert response.status_code == 404
+
+
+def test_profile_requires_key(client: TestClient):
+    """
+    Test that the profiler endpoint rejects requests without the profiler api key.
+    """
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        response = client.get('/admin/profile', headers={'Authorization': 'wrong'})
+    assert response.status_code == 401
+
+
+def test_profile_returns_collapsed_stacks(client: TestClient):
+    """
+    Test that the profiler endpoint returns collapsed stacks of the running threads.
+    """
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        response = client.get(
+            '/admin/profile', params={'seconds': 0.05, 'interval_ms': 5}, headers={'Authorization': 'secret'}
+        )
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in response.text.splitlines())
+
+
+def test_profile_rejects_concurrent_requests(client: TestClient):
+    """
+    Test that a profile requested while another one is being recorded is refused instead of queued.
+    """
+
+    async def request_twice():
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            return await asyncio.gather(
+                *(
+                    http.get('/admin/profile', params={'seconds': 0.2}, headers={'Authorization': 'secret'})
+                    for _ in range(2)
+                )
+            )
+
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        responses = asyncio.run(request_twice())
+    assert sorted(response.status_code for response in responses) == [200, 409]
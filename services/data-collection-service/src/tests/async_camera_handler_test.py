@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.exceptions.camera_exceptions import (
+    AuthenticationError,
+    CameraDataError,
+    SessionExpiredError,
+    SnapshotError,
+)
+from src.handlers.async_camera_handler import AsyncCameraHandler
+from src.schemas.synology_camera import SynologyCamera
+
+CAMERA = SynologyCamera(id=1, name='Camera 1', model='Model 1', vendor='Vendor 1', ip='1.1.1.1', status=1)
+
+
+class FakeSurveillanceStation:
+    """Minimal stand-in for the Synology auth.cgi and entry.cgi endpoints."""
+
+    def __init__(self):
+        self.logins = 0
+        self.valid_sids: set[str] = set()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if request.url.path == '/webapi/auth.cgi':
+            await asyncio.sleep(0.01)
+            self.logins += 1
+            sid = f'sid{self.logins}'
+            self.valid_sids.add(sid)
+            return httpx.Response(200, json={'success': True, 'data': {'sid': sid}})
+
+        if params['_sid'] not in self.valid_sids:
+            return httpx.Response(200, json={'success': False, 'error': {'code': 119}})
+        if params['method'] == 'List':
+            return httpx.Response(
+                200,
+                json={'success': True, 'data': {'cameras': [{'id': 1, 'newName': 'Camera 1', 'status': 1}]}},
+            )
+        return httpx.Response(200, content=b'jpeg', headers={'Content-Type': 'image/jpeg'})
+
+
+@pytest.fixture
+def station():
+    """Fake Surveillance Station instance."""
+    return FakeSurveillanceStation()
+
+
+@pytest.fixture
+def camera_handler(station):
+    """Fixture for AsyncCameraHandler talking to the fake Surveillance Station."""
+    return AsyncCameraHandler(client=httpx.AsyncClient(transport=httpx.MockTransport(station)))
+
+
+class TestAsyncCameraHandler:
+    def test_authenticate_client_success(self, camera_handler):
+        sid = asyncio.run(camera_handler.authenticate_client('http://nas', 'user', 'pass'))
+        assert sid == 'sid1'
+
+    def test_authenticate_client_network_error(self):
+        def fail(request):
+            raise httpx.ConnectError('unreachable')
+
+        handler = AsyncCameraHandler(client=httpx.AsyncClient(transport=httpx.MockTransport(fail)))
+        with pytest.raises(AuthenticationError, match='Network error during authentication'):
+            asyncio.run(handler.authenticate_client('http://nas', 'user', 'pass'))
+
+    def test_get_sid_single_flight(self, camera_handler, station):
+        async def run():
+            return await asyncio.gather(*(camera_handler.get_sid('http://nas', 'user', 'pass') for _ in range(20)))
+
+        assert asyncio.run(run()) == ['sid1'] * 20
+        assert station.logins == 1
+
+    def test_get_camera_data_success(self, camera_handler):
+        async def run():
+            sid = await camera_handler.get_sid('http://nas', 'user', 'pass')
+            return await camera_handler.get_camera_data('http://nas', sid)
+
+        cameras = asyncio.run(run())
+        assert [camera.name for camera in cameras] == ['Camera 1']
+
+    def test_get_camera_data_malformed_response(self):
+        def malformed(request):
+            return httpx.Response(200, json={'data': {'cameras': {'not': 'a list'}}})
+
+        handler = AsyncCameraHandler(client=httpx.AsyncClient(transport=httpx.MockTransport(malformed)))
+        with pytest.raises(CameraDataError, match='Unexpected cameras data format'):
+            asyncio.run(handler.get_camera_data('http://nas', 'sid'))
+
+    def test_get_camera_snapshot_session_expired(self, camera_handler):
+        with pytest.raises(SessionExpiredError):
+            asyncio.run(camera_handler.get_camera_snapshot('http://nas', 'stale', CAMERA))
+
+    def test_get_camera_snapshot_http_error(self):
+        def server_error(request):
+            return httpx.Response(500)
+
+        handler = AsyncCameraHandler(client=httpx.AsyncClient(transport=httpx.MockTransport(server_error)))
+        with pytest.raises(SnapshotError, match='Network error while fetching snapshot'):
+            asyncio.run(handler.get_camera_snapshot('http://nas', 'sid', CAMERA))
+
+    def test_run_with_session_reauthenticates(self, camera_handler, station):
+        async def run():
+            await camera_handler.get_sid('http://nas', 'user', 'pass')
+            station.valid_sids.clear()
+
+            return await camera_handler.run_with_session(
+                'http://nas',
+                'user',
+                'pass',
+                lambda sid: camera_handler.get_camera_snapshot('http://nas', sid, CAMERA),
+            )
+
+        frame = asyncio.run(run())
+        assert frame.content == b'jpeg'
+        assert station.logins == 2
@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerCallError, PlateRecognizerUnavailableError
+from src.handlers.async_plate_recognizer_handler import AsyncPlateRecognizerHandler
+from src.handlers.recognizer_pool import RecognizerPool
+
+
+def make_handler(handler_fn) -> AsyncPlateRecognizerHandler:
+    """Helper to create an AsyncPlateRecognizerHandler backed by a mock transport."""
+    return AsyncPlateRecognizerHandler(
+        recognizers=RecognizerPool(urls=['http://service'], failure_threshold=3, reset_timeout=60),
+        client=httpx.AsyncClient(transport=httpx.MockTransport(handler_fn)),
+        backoff_max_seconds=0,
+    )
+
+
+class TestAsyncPlateRecognizerHandler:
+    def test_send_to_api_success(self):
+        requests_seen = []
+
+        def recognizer(request):
+            requests_seen.append(request)
+            return httpx.Response(200, json={'results': [{'plate': 'ABC-123'}]})
+
+        handler = make_handler(recognizer)
+        response = asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+
+        assert response == {'results': [{'plate': 'ABC-123'}]}
+        assert requests_seen[0].url == 'http://service/v1/plate-reader/'
+        assert requests_seen[0].headers['Authorization'] == 'Token api_key'
+
+    def test_send_to_api_failure(self):
+        def bad_request(request):
+            return httpx.Response(400, json={'error': 'invalid image'})
+
+        handler = make_handler(bad_request)
+        with pytest.raises(PlateRecognizerCallError):
+            asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+
+    def test_send_to_api_retries_server_errors(self):
+        statuses = iter([502, 200])
+
+        def flaky(request):
+            return httpx.Response(next(statuses), json={'results': []})
+
+        handler = make_handler(flaky)
+        response = asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+
+        assert response == {'results': []}
+        assert handler.stats['latency']['calls'] == 2
+        assert handler.stats['instances'][0]['breaker']['state'] == 'closed'
+
+    def test_open_breaker_fails_fast(self):
+        calls = []
+
+        def unreachable(request):
+            calls.append(request)
+            raise httpx.ConnectError('unreachable')
+
+        handler = make_handler(unreachable)
+        for _ in range(2):
+            with pytest.raises(PlateRecognizerUnavailableError):
+                asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+
+        assert len(calls) == 3
+        assert handler.stats['instances'][0]['breaker']['state'] == 'open'
+
+    def test_client_error_on_trial_closes_breaker(self):
+        statuses = iter([503, 403, 200])
+
+        def recovering(request):
+            return httpx.Response(next(statuses), json={'results': []})
+
+        handler = AsyncPlateRecognizerHandler(
+            recognizers=RecognizerPool(
+                urls=['http://service'], failure_threshold=1, reset_timeout=0, probe=lambda url: False
+            ),
+            client=httpx.AsyncClient(transport=httpx.MockTransport(recovering)),
+            max_attempts=1,
+        )
+        for _ in range(2):
+            with pytest.raises(PlateRecognizerCallError):
+                asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+
+        assert handler.stats['instances'][0]['breaker']['state'] == 'closed'
+        assert asyncio.run(handler.send_to_api('api_key', b'image_data', 'camera_name')) == {'results': []}
+        handler.recognizers.close()
+
+    def test_cancelled_trial_releases_instance(self):
+        async def scenario():
+            started = asyncio.Event()
+
+            async def hanging(request):
+                started.set()
+                await asyncio.sleep(60)
+
+            handler = AsyncPlateRecognizerHandler(
+                recognizers=RecognizerPool(urls=['http://service'], failure_threshold=1, reset_timeout=0),
+                client=httpx.AsyncClient(transport=httpx.MockTransport(hanging)),
+                max_attempts=1,
+            )
+            handler.recognizers.endpoints[0].breaker.record_failure()
+            task = asyncio.create_task(handler.send_to_api('api_key', b'image_data', 'camera_name'))
+            await started.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return handler
+
+        handler = asyncio.run(scenario())
+        assert handler.stats['instances'][0]['outstanding'] == 0
+        assert handler.recognizers.acquire().url == 'http://service'
@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 import requests
 from unittest.mock import MagicMock, patch
@@ -6,6 +9,7 @@ from src.handlers.camera_handler import CameraHandler
 from src.exceptions.camera_exceptions import (
     AuthenticationError,
     CameraDataError,
+    SessionExpiredError,
     SnapshotError,
 )
 from src.schemas.synology_camera import SynologyCamera
@@ -188,3 +192,69 @@ class TestCameraHandler:
             camera = SynologyCamera(id=1, name='Camera 1', model='Model 1', vendor='Vendor 1', ip='1.1.1.1', status=1)
             with pytest.raises(SnapshotError, match='Network error while fetching snapshot'):
                 camera_handler.get_camera_snapshot('host', 'sid', camera)
+
+    def test_get_sid_is_cached(self, camera_handler):
+        with patch.object(camera_handler, 'authenticate_client', return_value='sid1') as mock_auth:
+            assert camera_handler.get_sid('host', 'user', 'pass') == 'sid1'
+            assert camera_handler.get_sid('host', 'user', 'pass') == 'sid1'
+            mock_auth.assert_called_once()
+
+    def test_get_sid_single_flight(self, camera_handler):
+        def slow_login(**kwargs):
+            time.sleep(0.05)
+            return 'sid1'
+
+        with patch.object(camera_handler, 'authenticate_client', side_effect=slow_login) as mock_auth:
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(camera_handler.get_sid('host', 'user', 'pass')))
+                for _ in range(20)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert results == ['sid1'] * 20
+            mock_auth.assert_called_once()
+
+    def test_invalidate_sid_ignores_stale_sid(self, camera_handler):
+        with patch.object(camera_handler, 'authenticate_client', side_effect=['sid1', 'sid2']):
+            camera_handler.get_sid('host', 'user', 'pass')
+            camera_handler.invalidate_sid('sid1')
+            assert camera_handler.get_sid('host', 'user', 'pass') == 'sid2'
+
+            # a late failure with the old sid must not drop the renewed session
+            camera_handler.invalidate_sid('sid1')
+            assert camera_handler.get_sid('host', 'user', 'pass') == 'sid2'
+            assert camera_handler.login_count == 2
+
+    def test_run_with_session_reauthenticates_once(self, camera_handler):
+        operation = MagicMock(side_effect=[SessionExpiredError('expired'), 'result'])
+        with patch.object(camera_handler, 'authenticate_client', side_effect=['sid1', 'sid2']):
+            result = camera_handler.run_with_session('host', 'user', 'pass', operation)
+
+        assert result == 'result'
+        assert [call.args[0] for call in operation.call_args_list] == ['sid1', 'sid2']
+
+    def test_get_camera_data_session_expired(self, camera_handler):
+        with patch.object(camera_handler.session, 'get') as mock_get:
+            mock_response = MagicMock()
+            mock_response.json.return_value = {'success': False, 'error': {'code': 119}}
+            mock_response.raise_for_status.return_value = None
+            mock_get.return_value = mock_response
+
+            with pytest.raises(SessionExpiredError):
+                camera_handler.get_camera_data('host', 'sid')
+
+    def test_get_camera_snapshot_session_expired(self, camera_handler):
+        with patch.object(camera_handler.session, 'get') as mock_get:
+            mock_response = MagicMock()
+            mock_response.headers = {'Content-Type': 'application/json; charset=utf-8'}
+            mock_response.json.return_value = {'success': False, 'error': {'code': 106}}
+            mock_response.raise_for_status.return_value = None
+            mock_get.return_value = mock_response
+            camera = SynologyCamera(id=1, name='Camera 1', model='Model 1', vendor='Vendor 1', ip='1.1.1.1', status=1)
+
+            with pytest.raises(SessionExpiredError):
+                camera_handler.get_camera_snapshot('host', 'sid', camera)
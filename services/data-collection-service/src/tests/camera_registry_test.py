@@ -0,0 +1,105 @@
+import asyncio
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.exceptions.camera_exceptions import CameraDataError
+from src.handlers.camera_registry import AsyncCameraRegistry, CameraRegistry
+from src.schemas.synology_camera import SynologyCamera
+
+
+def make_camera(camera_id: int, name: str) -> SynologyCamera:
+    """Helper to create a SynologyCamera for tests."""
+    return SynologyCamera(id=camera_id, name=name, model='Model', vendor='Vendor', ip='1.1.1.1', status=1)
+
+
+@pytest.fixture
+def fetch_cameras():
+    """Camera list loader returning two cameras."""
+    return MagicMock(return_value=[make_camera(1, 'Camera 1'), make_camera(2, 'Camera 2')])
+
+
+class TestCameraRegistry:
+    def test_first_lookup_refreshes_then_hits(self, fetch_cameras):
+        registry = CameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+
+        assert registry.get_camera('Camera 1').id == 1
+        assert registry.get_camera('Camera 2').id == 2
+        assert registry.get_camera('Camera 1').id == 1
+
+        fetch_cameras.assert_called_once()
+        assert registry.stats == {'hits': 2, 'misses': 1, 'refreshes': 1, 'cameras': 2}
+
+    def test_miss_refreshes_index(self, fetch_cameras):
+        registry = CameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+        registry.refresh()
+
+        fetch_cameras.return_value = [make_camera(1, 'Camera 1'), make_camera(3, 'Camera 3')]
+        assert registry.get_camera('Camera 3').id == 3
+        assert fetch_cameras.call_count == 2
+
+    def test_unknown_camera_raises(self, fetch_cameras):
+        registry = CameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+
+        with pytest.raises(CameraDataError):
+            registry.get_camera('Camera 9')
+        assert registry.stats['misses'] == 1
+
+    def test_stale_index_refreshes_in_background(self, fetch_cameras):
+        registry = CameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=0)
+        registry.refresh()
+        time.sleep(0.01)
+
+        # stale entries are still served while the refresh runs
+        assert registry.get_camera('Camera 1').id == 1
+
+        deadline = time.monotonic() + 1
+        while registry.stats['refreshes'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert registry.stats['refreshes'] >= 2
+
+    def test_background_refresh_failure_keeps_index(self, fetch_cameras):
+        registry = CameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=0)
+        registry.refresh()
+        fetch_cameras.side_effect = CameraDataError('nas unavailable')
+        time.sleep(0.01)
+
+        assert registry.get_camera('Camera 2').id == 2
+
+
+class TestAsyncCameraRegistry:
+    def test_lookup_refreshes_once_for_concurrent_misses(self):
+        calls = []
+
+        async def fetch_cameras():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [make_camera(1, 'Camera 1')]
+
+        registry = AsyncCameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+
+        async def run():
+            return await asyncio.gather(*(registry.get_camera('Camera 1') for _ in range(10)))
+
+        cameras = asyncio.run(run())
+        assert [camera.id for camera in cameras] == [1] * 10
+        assert len(calls) == 1
+
+    def test_unknown_camera_raises(self):
+        async def fetch_cameras():
+            return [make_camera(1, 'Camera 1')]
+
+        registry = AsyncCameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+        with pytest.raises(CameraDataError):
+            asyncio.run(registry.get_camera('Camera 9'))
+
+    def test_is_not_a_sync_registry(self):
+        async def fetch_cameras():
+            return []
+
+        registry = AsyncCameraRegistry(fetch_cameras=fetch_cameras, ttl_seconds=300)
+
+        # callers holding a CameraRegistry must never get a coroutine from get_camera
+        assert not isinstance(registry, CameraRegistry)
+        assert registry.stats == {'hits': 0, 'misses': 0, 'refreshes': 0, 'cameras': 0}
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.pipeline.change_gate import ChangeGate
+from src.tests.snapshot_processor_test import make_jpeg
+
+
+def make_frame(vehicle: bool) -> bytes:
+    """Helper to create a jpeg of an empty lane, optionally with a grey vehicle in it."""
+    image = Image.new('RGB', (640, 360), 'black')
+    if vehicle:
+        image.paste((128, 128, 128), (160, 90, 480, 300))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def gate():
+    """Fixture for a ChangeGate with a 2% threshold."""
+    return ChangeGate(threshold=0.02)
+
+
+class TestChangeGate:
+    def test_first_frame_passes(self, gate):
+        assert gate.changed('Camera 1', make_frame(vehicle=False))
+        assert gate.stats['passed'] == 1
+
+    def test_unchanged_frame_is_gated(self, gate):
+        gate.changed('Camera 1', make_frame(vehicle=True))
+
+        assert not gate.changed('Camera 1', make_frame(vehicle=True))
+        assert gate.stats['by_camera'] == {'Camera 1': {'gated': 1, 'passed': 1}}
+
+    def test_changed_frame_passes(self, gate):
+        gate.changed('Camera 1', make_frame(vehicle=False))
+
+        assert gate.changed('Camera 1', make_frame(vehicle=True))
+        assert gate.stats['gated'] == 0
+
+    def test_cameras_have_own_reference(self, gate):
+        gate.changed('Camera 1', make_frame(vehicle=True))
+
+        assert gate.changed('Camera 2', make_frame(vehicle=True))
+
+    def test_camera_threshold_override(self):
+        gate = ChangeGate(threshold=0.02, camera_thresholds={'Camera 1': 0})
+        gate.changed('Camera 1', make_jpeg())
+
+        assert gate.changed('Camera 1', make_jpeg())
+
+    def test_reference_expires(self):
+        gate = ChangeGate(threshold=0.02, max_age_seconds=0)
+        gate.changed('Camera 1', make_jpeg())
+        time.sleep(0.01)
+
+        assert gate.changed('Camera 1', make_jpeg())
+
+    def test_forget_lets_next_frame_pass(self, gate):
+        gate.changed('Camera 1', make_jpeg())
+        gate.forget('Camera 1')
+
+        assert gate.changed('Camera 1', make_jpeg())
+
+    def test_undecodable_frame_passes(self, gate):
+        assert gate.changed('Camera 1', b'not a jpeg')
+        assert gate.changed('Camera 1', b'not a jpeg')
+
+    def test_changed_async(self, gate):
+        gate.changed('Camera 1', make_jpeg())
+
+        assert not asyncio.run(gate.changed_async('Camera 1', make_jpeg()))
@@ -3,8 +3,8 @@ from datetime import datetime
 import pytest
 
 from src.enums.vehicle_orientation import VehicleOrientation
-from src.handlers.country_handler import CountryHandler
-from src.schemas.vehicle_observation import VehicleObservationRaw
+from src.handlers.country_handler import CountryHandler, Municipality
+from src.schemas.vehicle_observation import VehicleObservationRecord
 
 
 @pytest.fixture
@@ -27,13 +27,20 @@ def handler():
                 {'LJ': 'Ljubljana'},
             ]
         },
+        'Germany': {
+            'Bayern': [
+                {'M': 'München'},
+                {'MM': 'Memmingen'},
+                {'MSP': 'Main-Spessart'},
+            ],
+        },
     }
     return CountryHandler(data=data)
 
 
 def make_observation(plate: str, country_code: str | None):
-    """Helper to create a VehicleObservationRaw for tests."""
-    return VehicleObservationRaw(
+    """Helper to create a VehicleObservationRecord for tests."""
+    return VehicleObservationRecord(
         plate=plate,
         plate_score=90,
         country_code=country_code,
@@ -91,3 +98,29 @@ class TestCountryHandler:
         fixed = handler.get_municipality_and_fix_country(obs)
         assert fixed.country_code == expected_country
         assert fixed.municipality == expected_municipality
+
+    @pytest.mark.parametrize(
+        'plate, expected_municipality',
+        [
+            ('MSP1234', 'MSP'),
+            ('MM123', 'MM'),
+            ('MS12', 'M'),
+            ('X123', None),
+        ],
+    )
+    def test_german_longest_prefix(self, handler, plate, expected_municipality):
+        obs = make_observation(plate, 'de')
+        fixed = handler.get_municipality_and_fix_country(obs)
+        assert fixed.country_code == 'de'
+        assert fixed.municipality == expected_municipality
+
+    def test_country_without_data_keeps_observation(self, handler):
+        obs = make_observation('ABC123', 'hu')
+        fixed = handler.get_municipality_and_fix_country(obs)
+        assert fixed.country_code == 'hu'
+        assert fixed.municipality is None
+
+    def test_lookup_returns_municipality(self, handler):
+        code, municipality = handler.lookup('at', 'KL123')
+        assert code == 'KL'
+        assert municipality == Municipality(country='at', state='Kärnten', name='Klagenfurt/Land')
@@ -1,15 +1,17 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from hashlib import sha256
 
 import pytest
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
 
 from src.enums.vehicle_orientation import VehicleOrientation
 from src.handlers.database_handler import DatabaseHandler
 from src.models.vehicle_observation import VehicleObservation
-from src.schemas.vehicle_observation import (
-    VehicleObservationCreate,
-    VehicleObservationRaw,
-)
+from src.schemas.vehicle_observation import VehicleObservationRecord
+from src.tests.conftest import test_engine
 
 
 @pytest.fixture
@@ -108,12 +110,38 @@ def test_new_observation_multiple_observations(db_handler):
     assert obs2.orientation == VehicleOrientation.REAR
 
 
+def test_new_observation_skips_invalid_entries(db_handler):
+    """
+    Test that entries violating the field constraints are skipped at parse time.
+    """
+    entry = {
+        'plate': 'ABC1234',
+        'candidates': [{'score': 0.95}],
+        'region': {'code': 'at'},
+        'vehicle': {'type': 'car'},
+        'model_make': [{'make': 'Toyota', 'model': 'Corolla'}],
+        'color': [{'color': 'red'}],
+        'orientation': [{'orientation': 'Front'}],
+    }
+    reader_result = {
+        'results': [
+            {**entry, 'plate': 'X' * 31},
+            {**entry, 'orientation': [{'orientation': 'Sideways'}]},
+            entry,
+        ]
+    }
+
+    observations = db_handler.new_observation(reader_result, datetime.now())
+
+    assert [obs.plate for obs in observations] == ['ABC1234']
+
+
 # --- Tests for hash_plate ---
 def test_hash_plate_standard(db_handler):
     """
     Test hashing a standard plate.
     """
-    raw_obs = VehicleObservationRaw(
+    raw_obs = VehicleObservationRecord(
         plate='TEST123',
         plate_score=900,
         country_code='US',
@@ -127,6 +155,7 @@ def test_hash_plate_standard(db_handler):
     hashed_obs = db_handler.hash_plate(raw_obs)
     expected_hash = sha256(b'test123').digest()
 
+    assert hashed_obs is raw_obs
     assert hashed_obs.plate_hash == expected_hash
     assert hashed_obs.plate_score == raw_obs.plate_score
     assert hashed_obs.country_code == raw_obs.country_code
@@ -142,7 +171,7 @@ def test_hash_plate_with_spaces_and_case(db_handler):
     """
     Test hashing a plate with leading/trailing spaces and different casing.
     """
-    raw_obs = VehicleObservationRaw(
+    raw_obs = VehicleObservationRecord(
         plate='  AbC 456  ',
         plate_score=900,
         country_code='US',
@@ -163,7 +192,7 @@ def test_hash_plate_empty_string(db_handler):
     """
     Test hashing an empty plate string.
     """
-    raw_obs = VehicleObservationRaw(
+    raw_obs = VehicleObservationRecord(
         plate='',
         plate_score=900,
         country_code='US',
@@ -180,10 +209,10 @@ def test_hash_plate_empty_string(db_handler):
     assert hashed_obs.plate_hash == expected_hash
 
 
-# --- Tests for check_for_duplicates ---
-def create_hashed_observation(plate: str, timestamp: datetime) -> VehicleObservationCreate:
-    """Helper to create a VehicleObservationCreate object for testing."""
-    return VehicleObservationCreate(
+def create_hashed_observation(plate: str, timestamp: datetime) -> VehicleObservationRecord:
+    """Helper to create a hashed VehicleObservationRecord for testing."""
+    return VehicleObservationRecord(
+        plate=plate,
         plate_hash=sha256(plate.strip().lower().encode('utf-8')).digest(),
         plate_score=800,
         country_code='DE',
@@ -196,9 +225,48 @@ def create_hashed_observation(plate: str, timestamp: datetime) -> VehicleObserva
     )
 
 
-def test_check_for_duplicates_no_duplicate(db_handler, db):
+# --- Tests for create_observation_entry ---
+def test_create_observation_entry_successful(db_handler, db):
+    """
+    Test successful creation of a new observation entry.
+    """
+    hashed_obs = VehicleObservationRecord(
+        plate='TESTPLATE',
+        plate_hash=sha256(b'TESTPLATE').digest(),
+        plate_score=999,
+        country_code='DE',
+        vehicle_type='motorcycle',
+        make='BMW',
+        model='R1250',
+        color='black',
+        orientation=VehicleOrientation.FRONT,
+        timestamp=datetime.now(tz=timezone.utc),
+    )
+
+    created_obs = db_handler.create_observation_entry(db, hashed_obs)
+
+    assert created_obs is not None
+    assert created_obs.id is not None
+    assert created_obs.plate_hash == hashed_obs.plate_hash
+    assert created_obs.plate_score == hashed_obs.plate_score
+    assert created_obs.country_code == hashed_obs.country_code
+    assert created_obs.vehicle_type == hashed_obs.vehicle_type
+    assert created_obs.make == hashed_obs.make
+    assert created_obs.model == hashed_obs.model
+    assert created_obs.color == hashed_obs.color
+    assert created_obs.orientation == hashed_obs.orientation
+    assert created_obs.timestamp == hashed_obs.timestamp
+
+    # Verify that the observation exists in the database
+    retrieved_obs = db.query(VehicleObservation).filter_by(id=created_obs.id).first()
+    assert retrieved_obs is not None
+    assert retrieved_obs.plate_hash == created_obs.plate_hash
+
+
+# --- Tests for insert_unless_recent ---
+def test_insert_unless_recent_no_duplicate(db_handler, db):
     """
-    Test no duplicate found when no matching observation exists.
+    Test that the observation is stored when no matching observation exists.
     """
     current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
     obs_to_check = create_hashed_observation('NEWPLATE', current_time)
@@ -208,13 +276,13 @@ def test_check_for_duplicates_no_duplicate(db_handler, db):
         db, create_hashed_observation('OTHERPLATE', current_time - timedelta(minutes=5))
     )
 
-    is_duplicate = db_handler.check_for_duplicates(db, obs_to_check, current_time, timedelta(seconds=60))
-    assert not is_duplicate
+    stored = db_handler.insert_unless_recent(db, [obs_to_check], timedelta(seconds=60))
+    assert [obs.plate_hash for obs in stored] == [obs_to_check.plate_hash]
 
 
-def test_check_for_duplicates_exact_duplicate_within_window(db_handler, db):
+def test_insert_unless_recent_exact_duplicate_within_window(db_handler, db):
     """
-    Test duplicate found when an exact matching observation exists within 1 minute.
+    Test that the observation is skipped when an exact matching observation exists within 1 minute.
     """
     current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
     plate_to_check = 'DUPLICATE'
@@ -224,13 +292,12 @@ def test_check_for_duplicates_exact_duplicate_within_window(db_handler, db):
     existing_obs_time = current_time - timedelta(seconds=30)
     db_handler.create_observation_entry(db, create_hashed_observation(plate_to_check, existing_obs_time))
 
-    is_duplicate = db_handler.check_for_duplicates(db, obs_to_check, current_time, timedelta(seconds=60))
-    assert is_duplicate
+    assert db_handler.insert_unless_recent(db, [obs_to_check], timedelta(seconds=60)) == []
 
 
-def test_check_for_duplicates_duplicate_outside_window_older(db_handler, db):
+def test_insert_unless_recent_duplicate_outside_window_older(db_handler, db):
     """
-    Test no duplicate found when a matching observation exists but is older than 1 minute.
+    Test that the observation is stored when a matching observation exists but is older than 1 minute.
     """
     current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
     plate_to_check = 'OLDPLATE'
@@ -240,14 +307,14 @@ def test_check_for_duplicates_duplicate_outside_window_older(db_handler, db):
     existing_obs_time = current_time - timedelta(minutes=2)
     db_handler.create_observation_entry(db, create_hashed_observation(plate_to_check, existing_obs_time))
 
-    is_duplicate = db_handler.check_for_duplicates(db, obs_to_check, current_time, timedelta(seconds=60))
-    assert not is_duplicate
+    stored = db_handler.insert_unless_recent(db, [obs_to_check], timedelta(seconds=60))
+    assert [obs.plate_hash for obs in stored] == [obs_to_check.plate_hash]
 
 
-def test_check_for_duplicates_duplicate_outside_window_newer(db_handler, db):
+def test_insert_unless_recent_duplicate_outside_window_newer(db_handler, db):
     """
-    Test no duplicate found when a matching observation exists but is newer (in the "future"
-    relative to current_detection_time), which shouldn't count based on the query.
+    Test that the observation is stored when a matching observation exists but is newer (in the "future"
+    relative to the new observation), which shouldn't count based on the query.
     """
     current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
     plate_to_check = 'FUTUREPLATE'
@@ -257,13 +324,13 @@ def test_check_for_duplicates_duplicate_outside_window_newer(db_handler, db):
     existing_obs_time = current_time + timedelta(seconds=30)
     db_handler.create_observation_entry(db, create_hashed_observation(plate_to_check, existing_obs_time))
 
-    is_duplicate = db_handler.check_for_duplicates(db, obs_to_check, current_time, timedelta(seconds=60))
-    assert not is_duplicate
+    stored = db_handler.insert_unless_recent(db, [obs_to_check], timedelta(seconds=60))
+    assert [obs.plate_hash for obs in stored] == [obs_to_check.plate_hash]
 
 
-def test_check_for_duplicates_different_plate_same_time(db_handler, db):
+def test_insert_unless_recent_different_plate_same_time(db_handler, db):
     """
-    Test no duplicate found when observations have different plate hashes.
+    Test that the observation is stored when observations have different plate hashes.
     """
     current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
     obs_to_check = create_hashed_observation('PLATE1', current_time)
@@ -271,42 +338,50 @@ def test_check_for_duplicates_different_plate_same_time(db_handler, db):
     # Insert a different plate at the same time
     db_handler.create_observation_entry(db, create_hashed_observation('PLATE2', current_time))
 
-    is_duplicate = db_handler.check_for_duplicates(db, obs_to_check, current_time, timedelta(seconds=60))
-    assert not is_duplicate
+    stored = db_handler.insert_unless_recent(db, [obs_to_check], timedelta(seconds=60))
+    assert [obs.plate_hash for obs in stored] == [obs_to_check.plate_hash]
 
 
-# --- Tests for create_observation_entry ---
-def test_create_observation_entry_successful(db_handler, db):
+def test_insert_unless_recent_skips_recent_plates(db_handler, db):
     """
-    Test successful creation of a new observation entry.
+    Test that only observations without a recent row for their plate are inserted.
     """
-    hashed_obs = VehicleObservationCreate(
-        plate_hash=sha256(b'TESTPLATE').digest(),
-        plate_score=999,
-        country_code='DE',
-        vehicle_type='motorcycle',
-        make='BMW',
-        model='R1250',
-        color='black',
-        orientation=VehicleOrientation.FRONT,
-        timestamp=datetime.now(tz=timezone.utc),
+    current_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+    db_handler.create_observation_entry(db, create_hashed_observation('RECENT', current_time - timedelta(seconds=30)))
+    db_handler.create_observation_entry(db, create_hashed_observation('OLD', current_time - timedelta(minutes=5)))
+
+    stored = db_handler.insert_unless_recent(
+        db,
+        [create_hashed_observation(plate, current_time) for plate in ('RECENT', 'OLD', 'NEW')],
+        timedelta(seconds=60),
     )
 
-    created_obs = db_handler.create_observation_entry(db, hashed_obs)
+    assert {obs.plate_hash for obs in stored} == {
+        create_hashed_observation(plate, current_time).plate_hash for plate in ('OLD', 'NEW')
+    }
+    assert all(obs.id is not None for obs in stored)
+    assert db.query(VehicleObservation).filter(VehicleObservation.timestamp == current_time).count() == 2
 
-    assert created_obs is not None
-    assert created_obs.id is not None
-    assert created_obs.plate_hash == hashed_obs.plate_hash
-    assert created_obs.plate_score == hashed_obs.plate_score
-    assert created_obs.country_code == hashed_obs.country_code
-    assert created_obs.vehicle_type == hashed_obs.vehicle_type
-    assert created_obs.make == hashed_obs.make
-    assert created_obs.model == hashed_obs.model
-    assert created_obs.color == hashed_obs.color
-    assert created_obs.orientation == hashed_obs.orientation
-    assert created_obs.timestamp == hashed_obs.timestamp
 
-    # Verify that the observation exists in the database
-    retrieved_obs = db.query(VehicleObservation).filter_by(id=created_obs.id).first()
-    assert retrieved_obs is not None
-    assert retrieved_obs.plate_hash == created_obs.plate_hash
+def test_insert_unless_recent_concurrent_detections(db_handler):
+    """
+    Test that two transactions inserting the same plate at once store it only once.
+    """
+    current_time = datetime(1971, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+    observation = create_hashed_observation('RACE', current_time)
+    barrier = threading.Barrier(2)
+
+    def insert():
+        with Session(test_engine) as session:
+            barrier.wait()
+            return db_handler.insert_unless_recent(session, [observation], timedelta(seconds=60))
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda _: insert(), range(2)))
+
+        assert sorted(len(result) for result in results) == [0, 1]
+    finally:
+        with Session(test_engine) as session:
+            session.execute(delete(VehicleObservation).where(VehicleObservation.plate_hash == observation.plate_hash))
+            session.commit()
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.exceptions.ingestion_exceptions import QueueFullError
+from src.pipeline.ingestion_queue import IngestionQueue
+
+
+class TestIngestionQueue:
+    def test_workers_process_all_events(self):
+        processed = []
+
+        async def process(camera_name, detection_time):
+            await asyncio.sleep(0.01)
+            processed.append(camera_name)
+            return True
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=3, max_depth=10)
+            await queue.start()
+            for i in range(6):
+                await queue.submit(f'Camera {i}', datetime.now())
+            await queue.join()
+            await queue.stop()
+            return queue.stats
+
+        stats = asyncio.run(run())
+        assert sorted(processed) == [f'Camera {i}' for i in range(6)]
+        assert stats['processed'] == 6
+        assert stats['depth'] == 0
+        assert stats['busy_workers'] == 0
+        assert 0 < stats['utilisation'] <= 1
+        assert stats['max_wait_seconds'] > 0
+
+    def test_submit_rejects_when_full(self):
+        async def process(camera_name, detection_time):
+            return True
+
+        async def run():
+            # workers are not started, so nothing drains the queue
+            queue = IngestionQueue(process=process, workers=1, max_depth=2)
+            await queue.submit('Camera 1', datetime.now())
+            await queue.submit('Camera 1', datetime.now())
+            with pytest.raises(QueueFullError):
+                await queue.submit('Camera 1', datetime.now())
+            return queue.stats
+
+        stats = asyncio.run(run())
+        assert stats['depth'] == 2
+        assert stats['rejected'] == 1
+
+    def test_worker_survives_processing_error(self):
+        processed = []
+
+        async def process(camera_name, detection_time):
+            if camera_name == 'broken':
+                raise RuntimeError('boom')
+            processed.append(camera_name)
+            return True
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=1, max_depth=10)
+            await queue.start()
+            await queue.submit('broken', datetime.now())
+            await queue.submit('Camera 1', datetime.now())
+            await queue.join()
+            await queue.stop()
+
+        asyncio.run(run())
+        assert processed == ['Camera 1']
+
+    def test_retries_transient_failures(self):
+        attempts = []
+
+        async def process(camera_name, detection_time):
+            attempts.append(camera_name)
+            # the first attempt fails, the retry goes through
+            return len(attempts) > 1
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=1, max_depth=10, max_attempts=3)
+            await queue.start()
+            await queue.submit('Camera 1', datetime.now())
+            await queue.join()
+            await queue.stop()
+            return queue.stats
+
+        stats = asyncio.run(run())
+        assert attempts == ['Camera 1', 'Camera 1']
+        assert stats['retried'] == 1
+        assert stats['failed'] == 0
+
+    def test_gives_up_after_max_attempts(self):
+        attempts = []
+
+        async def process(camera_name, detection_time):
+            attempts.append(camera_name)
+            return False
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=1, max_depth=10, max_attempts=3)
+            await queue.start()
+            await queue.submit('Camera 1', datetime.now())
+            await queue.join()
+            await queue.stop()
+            return queue.stats
+
+        stats = asyncio.run(run())
+        assert len(attempts) == 3
+        assert stats['retried'] == 2
+        assert stats['failed'] == 1
+
+    def test_coalesces_bursts_per_camera(self):
+        processed = []
+
+        async def process(camera_name, detection_time):
+            processed.append(camera_name)
+            return True
+
+        async def run():
+            queue = IngestionQueue(
+                process=process,
+                workers=1,
+                max_depth=10,
+                coalesce_seconds=1,
+                camera_coalesce_seconds={'Camera 2': 0},
+            )
+            await queue.start()
+            accepted = [await queue.submit(camera, datetime.now()) for camera in ('Camera 1',) * 3 + ('Camera 2',) * 2]
+            await queue.join()
+            await queue.stop()
+            return accepted, queue.stats
+
+        accepted, stats = asyncio.run(run())
+        assert accepted == [True, False, False, True, True]
+        assert processed == ['Camera 1', 'Camera 2', 'Camera 2']
+        assert stats['coalesced'] == 2
+        assert stats['coalesced_by_camera'] == {'Camera 1': 2}
+
+    def test_events_after_window_are_queued(self):
+        async def process(camera_name, detection_time):
+            return True
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=1, max_depth=10, coalesce_seconds=1)
+            first = await queue.submit('Camera 1', datetime.now())
+            with patch('src.pipeline.ingestion_queue.time.monotonic', return_value=time.monotonic() + 2):
+                second = await queue.submit('Camera 1', datetime.now())
+            return first, second, queue.depth
+
+        assert asyncio.run(run()) == (True, True, 2)
+
+    def test_processed_leaders_are_forgotten(self):
+        async def process(camera_name, detection_time):
+            return True
+
+        async def run():
+            queue = IngestionQueue(process=process, workers=2, max_depth=10, coalesce_seconds=60)
+            await queue.start()
+            for i in range(5):
+                await queue.submit(f'Camera {i}', datetime.now())
+            await queue.join()
+            # the leader was processed, so the next event of the camera is queued within the window
+            accepted = await queue.submit('Camera 0', datetime.now())
+            await queue.join()
+            await queue.stop()
+            return accepted, queue._leaders, queue.stats
+
+        accepted, leaders, stats = asyncio.run(run())
+        assert accepted
+        assert leaders == {}
+        assert stats['processed'] == 6
@@ -0,0 +1,77 @@
+import json
+import logging
+import queue
+
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, TextFormatter
+
+
+def make_record(level: int = logging.INFO, msg: str = 'Observation saved', args: tuple = (), **fields):
+    """Helper to create a LogRecord with `extra` fields."""
+    record = logging.makeLogRecord({'name': 'test', 'levelno': level, 'levelname': logging.getLevelName(level)})
+    record.msg, record.args = msg, args
+    record.__dict__.update(fields)
+    return record
+
+
+class TestFormatters:
+    def test_json_contains_message_and_fields(self):
+        record = make_record(
+            msg='Duplicate within %s',
+            args=('0:01:00',),
+            event='duplicate_skipped',
+            plate_hash=b'\x01\xab',
+            orientation=VehicleOrientation.FRONT,
+        )
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry['message'] == 'Duplicate within 0:01:00'
+        assert entry['level'] == 'INFO'
+        assert entry['event'] == 'duplicate_skipped'
+        assert entry['plate_hash'] == '01ab'
+        assert entry['orientation'] == 'front'
+
+    def test_text_appends_fields(self):
+        record = make_record(event='vehicle_detected', camera='Entrance')
+
+        assert TextFormatter().format(record).endswith('Observation saved event=vehicle_detected camera=Entrance')
+
+
+class TestSamplingFilter:
+    def test_keeps_share_of_sampled_events(self):
+        sampling = SamplingFilter({'observation_saved': 0.25})
+
+        kept = [sampling.filter(make_record(event='observation_saved')) for _ in range(8)]
+
+        assert kept.count(True) == 2
+        assert sampling.sampled_out == 6
+
+    def test_keeps_other_events_and_warnings(self):
+        sampling = SamplingFilter({'observation_saved': 0})
+
+        assert sampling.filter(make_record(event='vehicle_detected'))
+        assert sampling.filter(make_record())
+        assert sampling.filter(make_record(level=logging.WARNING, event='observation_saved'))
+        assert not sampling.filter(make_record(event='observation_saved'))
+
+
+class TestNonBlockingQueueHandler:
+    def test_queues_unformatted_records(self):
+        log_queue = queue.Queue()
+        handler = NonBlockingQueueHandler(log_queue)
+        record = make_record(msg='Plate: %s', args=('w123ab',))
+
+        handler.handle(record)
+
+        queued = log_queue.get_nowait()
+        assert queued.msg == 'Plate: %s'
+        assert queued.args == ('w123ab',)
+
+    def test_drops_records_when_full(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+
+        handler.handle(make_record())
+        handler.handle(make_record())
+
+        assert handler.dropped == 1
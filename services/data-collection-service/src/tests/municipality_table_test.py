@@ -0,0 +1,151 @@
+import json
+import os
+import time
+
+import pytest
+
+from src.handlers.municipality_table import Municipality, MunicipalityTable, MunicipalityTables, build_artifact
+
+DATA = {
+    'Austria': {
+        'Wien': [{'W': 'Wien'}],
+        'Kärnten': [{'K': 'Klagenfurt-Stadt'}, {'KL': 'Klagenfurt/Land'}],
+    },
+    'Germany': {
+        'Bayern': [{'M': 'München'}, {'MM': 'Memmingen'}, {'MSP': 'Main-Spessart'}],
+    },
+}
+
+
+@pytest.fixture
+def table():
+    """Fixture for a MunicipalityTable built in memory."""
+    return MunicipalityTable(build_artifact(DATA))
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Fixture for a municipalities json file."""
+    path = tmp_path / 'municipalities.json'
+    path.write_text(json.dumps(DATA), encoding='utf-8')
+    return path
+
+
+class TestMunicipalityTable:
+    @pytest.mark.parametrize(
+        'country, plate, expected',
+        [
+            ('de', 'MSP123', 'MSP'),
+            ('de', 'MS123', 'M'),
+            ('de', 'MM', 'MM'),
+            ('de', 'M', 'M'),
+            ('de', 'M-1', 'M'),
+            ('de', 'X1', None),
+            ('at', 'KL1AB', 'KL'),
+            ('at', 'K1AB', 'K'),
+            ('at', '-W1', None),
+            ('at', '', None),
+            ('si', 'LJ123', None),
+        ],
+    )
+    def test_lookup(self, table, country, plate, expected):
+        match = table.lookup(country, plate)
+
+        assert (match[0] if match else None) == expected
+
+    def test_lookup_returns_municipality(self, table):
+        assert table.lookup('at', 'KL1AB') == (
+            'KL',
+            Municipality(country='at', state='Kärnten', name='Klagenfurt/Land'),
+        )
+
+    def test_describes_countries(self, table):
+        assert sorted(table.countries) == ['at', 'de']
+        assert table.max_length('de') == 3
+        assert table.max_length('si') == 0
+        assert [code for code, _ in table.codes('at')] == ['K', 'KL', 'W']
+
+    def test_open_maps_file(self, tmp_path, table):
+        path = tmp_path / 'municipalities.bin'
+        path.write_bytes(build_artifact(DATA))
+
+        mapped = MunicipalityTable.open(str(path))
+
+        assert mapped.lookup('de', 'MSP1') == table.lookup('de', 'MSP1')
+
+    def test_rejects_other_files(self):
+        with pytest.raises(ValueError):
+            MunicipalityTable(b'\0' * 64)
+
+    def test_rejects_long_codes(self):
+        with pytest.raises(ValueError):
+            build_artifact({'Germany': {'Bayern': [{'ABCDE': 'too long'}]}})
+
+
+class TestMunicipalityTables:
+    def test_builds_missing_artifact_lazily(self, source, tmp_path):
+        artifact = tmp_path / 'municipalities.bin'
+        tables = MunicipalityTables(source=str(source), artifact=str(artifact), watch_interval=0)
+
+        assert tables.stats['loaded'] is False
+        assert tables.table.lookup('at', 'W1')[0] == 'W'
+        assert artifact.exists()
+        assert tables.stats['countries'] == {'at': 3, 'de': 3}
+
+    def test_rebuilds_stale_artifact(self, source, tmp_path):
+        artifact = tmp_path / 'municipalities.bin'
+        artifact.write_bytes(build_artifact({'Austria': {'Wien': [{'W': 'Wien'}]}}))
+        tables = MunicipalityTables(source=str(source), artifact=str(artifact), watch_interval=0)
+
+        assert tables.table.lookup('de', 'M1')[0] == 'M'
+
+    def test_uses_artifact_without_source(self, source, tmp_path):
+        artifact = tmp_path / 'municipalities.bin'
+        artifact.write_bytes(build_artifact(DATA))
+        tables = MunicipalityTables(source=str(tmp_path / 'missing.json'), artifact=str(artifact), watch_interval=0)
+
+        assert tables.table.lookup('de', 'MM1')[0] == 'MM'
+
+    def test_check_swaps_changed_source(self, source, tmp_path):
+        tables = MunicipalityTables(source=str(source), artifact=str(tmp_path / 'municipalities.bin'), watch_interval=0)
+        old_table = tables.table
+
+        assert tables.check() is False
+
+        source.write_text(json.dumps({'Austria': {'Wien': [{'WU': 'Wien Umgebung'}]}}), encoding='utf-8')
+        os.utime(source, ns=(time.time_ns() + 10**9,) * 2)
+
+        assert tables.check() is True
+        assert tables.table is not old_table
+        assert tables.table.lookup('at', 'WU1')[0] == 'WU'
+        # the previous table stays valid for lookups still holding it
+        assert old_table.lookup('de', 'M1')[0] == 'M'
+        assert tables.stats['reloads'] == 1
+
+    def test_watcher_reloads_in_background(self, source, tmp_path):
+        tables = MunicipalityTables(
+            source=str(source), artifact=str(tmp_path / 'municipalities.bin'), watch_interval=0.01
+        )
+        tables.start()
+        try:
+            source.write_text(json.dumps({'Slovenia': {'Municipalities': [{'LJ': 'Ljubljana'}]}}), encoding='utf-8')
+            os.utime(source, ns=(time.time_ns() + 10**9,) * 2)
+
+            deadline = time.monotonic() + 2
+            while tables.table.lookup('si', 'LJ1') is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            assert tables.table.lookup('si', 'LJ1')[0] == 'LJ'
+        finally:
+            tables.close()
+
+    def test_keeps_table_on_broken_source(self, source, tmp_path):
+        tables = MunicipalityTables(source=str(source), artifact=str(tmp_path / 'municipalities.bin'), watch_interval=0)
+        old_table = tables.table
+        source.write_text('{', encoding='utf-8')
+        os.utime(source, ns=(time.time_ns() + 10**9,) * 2)
+
+        with pytest.raises(ValueError):
+            tables.check()
+
+        assert tables.table is old_table
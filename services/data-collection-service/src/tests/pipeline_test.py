@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.orm import Session
+
+import src.pipeline.detection as detection
+from src.metrics import registry
+from src.exceptions.camera_exceptions import CameraDataError
+from src.exceptions.database_exceptions import DatabaseIntegrityError
+from src.handlers.recent_plate_index import RecentPlateIndex
+from src.pipeline.change_gate import ChangeGate
+from src.models.vehicle_observation import VehicleObservation
+from src.schemas.synology_camera import SynologyCamera
+from src.tests.snapshot_processor_test import make_jpeg
+
+CAMERA = SynologyCamera(id=1, name='Camera 1', model='Model 1', vendor='Vendor 1', ip='1.1.1.1', status=1)
+RESULT = {'results': [{'plate': 'ABC1234'}]}
+
+
+class TestProcessVehicleDetectionAsync:
+    def test_stores_recognizer_result(self):
+        detection_time = datetime(2025, 1, 1, 10, 0, 0)
+        frame = MagicMock(content=b'jpeg')
+
+        with (
+            patch.object(detection.async_camera_registry, 'get_camera', AsyncMock(return_value=CAMERA)),
+            patch.object(detection.async_camera_service, 'get_sid', AsyncMock(return_value='sid')),
+            patch.object(detection.async_camera_service, 'get_camera_snapshot', AsyncMock(return_value=frame)),
+            patch.object(detection.async_plate_service, 'send_to_api', AsyncMock(return_value=RESULT)),
+            patch.object(detection, 'store_observations', return_value=(1, 0)) as mock_store,
+        ):
+            completed = asyncio.run(detection.process_vehicle_detection_async('Camera 1', detection_time))
+
+        assert completed
+        mock_store.assert_called_once()
+        assert isinstance(mock_store.call_args.args[0], Session)
+        assert mock_store.call_args.kwargs == {'result': RESULT, 'detection_time': detection_time}
+
+    def test_records_metrics(self):
+        frame = MagicMock(content=b'jpeg')
+        labels = {'camera': 'Camera 2', 'outcome': 'inserted'}
+
+        with (
+            patch.object(detection.async_camera_registry, 'get_camera', AsyncMock(return_value=CAMERA)),
+            patch.object(detection.async_camera_service, 'get_sid', AsyncMock(return_value='sid')),
+            patch.object(detection.async_camera_service, 'get_camera_snapshot', AsyncMock(return_value=frame)),
+            patch.object(detection.async_plate_service, 'send_to_api', AsyncMock(return_value=RESULT)),
+            patch.object(detection, 'store_observations', return_value=(2, 1)),
+        ):
+            asyncio.run(detection.process_vehicle_detection_async('Camera 2', datetime.now()))
+
+        assert registry.get_sample_value('observations_total', labels) == 2
+        assert registry.get_sample_value('observations_total', {**labels, 'outcome': 'duplicate'}) == 1
+        assert registry.get_sample_value('detections_total', {**labels, 'outcome': 'recognized'}) == 1
+        assert registry.get_sample_value('detection_stage_seconds_count', {'stage': 'alpr'}) >= 1
+        assert registry.get_sample_value('detection_end_to_end_seconds_count') >= 1
+
+    def test_records_errors(self):
+        with patch.object(
+            detection.async_camera_registry, 'get_camera', AsyncMock(side_effect=CameraDataError('not found'))
+        ):
+            completed = asyncio.run(detection.process_vehicle_detection_async('Camera 3', datetime.now()))
+
+        assert not completed
+        assert registry.get_sample_value('detections_total', {'camera': 'Camera 3', 'outcome': 'error'}) == 1
+        assert (
+            registry.get_sample_value('detection_errors_total', {'camera': 'Camera 3', 'error': 'CameraDataError'}) == 1
+        )
+
+    def test_database_failure_is_retried(self):
+        frame = MagicMock(content=b'jpeg')
+
+        with (
+            patch.object(detection.async_camera_registry, 'get_camera', AsyncMock(return_value=CAMERA)),
+            patch.object(detection.async_camera_service, 'get_sid', AsyncMock(return_value='sid')),
+            patch.object(detection.async_camera_service, 'get_camera_snapshot', AsyncMock(return_value=frame)),
+            patch.object(detection.async_plate_service, 'send_to_api', AsyncMock(return_value=RESULT)),
+            patch.object(detection, 'store_observations', side_effect=DatabaseIntegrityError('connection refused')),
+        ):
+            completed = asyncio.run(detection.process_vehicle_detection_async('Camera 4', datetime.now()))
+
+        assert not completed
+
+    def test_skips_storage_without_results(self):
+        frame = MagicMock(content=b'jpeg')
+
+        with (
+            patch.object(detection.async_camera_registry, 'get_camera', AsyncMock(return_value=CAMERA)),
+            patch.object(detection.async_camera_service, 'get_sid', AsyncMock(return_value='sid')),
+            patch.object(detection.async_camera_service, 'get_camera_snapshot', AsyncMock(return_value=frame)),
+            patch.object(detection.async_plate_service, 'send_to_api', AsyncMock(return_value={})),
+            patch.object(detection, 'store_observations', return_value=(1, 0)) as mock_store,
+        ):
+            asyncio.run(detection.process_vehicle_detection_async('Camera 1', datetime.now()))
+
+        mock_store.assert_not_called()
+
+    def test_unchanged_snapshot_skips_recognizer(self):
+        frame = MagicMock(content=make_jpeg())
+        send_to_api = AsyncMock(return_value=RESULT)
+
+        with (
+            patch.object(detection.async_camera_registry, 'get_camera', AsyncMock(return_value=CAMERA)),
+            patch.object(detection.async_camera_service, 'get_sid', AsyncMock(return_value='sid')),
+            patch.object(detection.async_camera_service, 'get_camera_snapshot', AsyncMock(return_value=frame)),
+            patch.object(detection.async_plate_service, 'send_to_api', send_to_api),
+            patch.object(detection, 'change_gate', ChangeGate(threshold=0.02)),
+            patch.object(detection, 'store_observations', return_value=(1, 0)) as mock_store,
+        ):
+            for _ in range(3):
+                asyncio.run(detection.process_vehicle_detection_async('Camera 1', datetime.now()))
+
+        send_to_api.assert_awaited_once()
+        mock_store.assert_called_once()
+
+
+def make_result(*plates: str) -> dict:
+    """Helper to create a recognizer result containing the given plates."""
+    return {
+        'results': [
+            {
+                'plate': plate,
+                'candidates': [{'score': 0.9}],
+                'region': {'code': 'at'},
+                'vehicle': {'type': 'car'},
+                'model_make': [{'make': 'VW', 'model': 'Golf'}],
+                'color': [{'color': 'white'}],
+                'orientation': [{'orientation': 'Front'}],
+            }
+            for plate in plates
+        ]
+    }
+
+
+class TestStoreObservations:
+    def test_stores_frame_in_one_batch(self, db):
+        detection_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+
+        with patch.object(
+            detection.db_handler, 'insert_unless_recent', wraps=detection.db_handler.insert_unless_recent
+        ) as mock_insert:
+            detection.store_observations(db, make_result('W-1234', 'W-5678', 'w-1234'), detection_time)
+
+        mock_insert.assert_called_once()
+        assert len(mock_insert.call_args.kwargs['observations']) == 2
+        assert db.query(VehicleObservation).filter(VehicleObservation.timestamp == detection_time).count() == 2
+
+    def test_skips_recent_duplicates(self, db):
+        detection_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+        detection.store_observations(db, make_result('W-1234'), detection_time - timedelta(seconds=10))
+
+        counts = detection.store_observations(db, make_result('W-1234', 'W-5678'), detection_time)
+
+        assert counts == (1, 1)
+        assert db.query(VehicleObservation).filter(VehicleObservation.timestamp == detection_time).count() == 1
+
+    def test_warm_index_skips_known_duplicates(self, db):
+        detection_time = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+        index = RecentPlateIndex(interval=timedelta(seconds=60), max_entries=100, started_at=detection_time)
+        later = detection_time + timedelta(minutes=5)
+
+        with (
+            patch.object(detection, 'recent_plates', index),
+            patch.object(
+                detection.db_handler, 'insert_unless_recent', wraps=detection.db_handler.insert_unless_recent
+            ) as mock_insert,
+        ):
+            detection.store_observations(db, make_result('W-1234'), later)
+            detection.store_observations(db, make_result('W-1234'), later + timedelta(seconds=10))
+
+        assert mock_insert.call_args.kwargs['observations'] == []
+        assert index.stats['hits'] == 2
+        assert db.query(VehicleObservation).filter(VehicleObservation.timestamp >= later).count() == 1
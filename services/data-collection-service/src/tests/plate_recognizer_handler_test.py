@@ -3,28 +3,134 @@ import requests
 from unittest.mock import patch, MagicMock
 
 from src.handlers.plate_recognizer_handler import PlateRecognizerHandler
-from src.exceptions.plate_recognizer_exceptions import PlateRecognizerCallError
+from src.handlers.recognizer_pool import RecognizerPool
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerCallError, PlateRecognizerUnavailableError
 
 
 @pytest.fixture
 def plate_recognizer_handler():
     """Fixture for PlateRecognizerHandler instance."""
-    return PlateRecognizerHandler()
+    return PlateRecognizerHandler(
+        recognizers=RecognizerPool(urls=['http://service'], failure_threshold=3, reset_timeout=60),
+        backoff_max_seconds=0,
+    )
+
+
+def make_response(status_code: int) -> MagicMock:
+    """Helper to create a response mock that raises for error status codes."""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = {'results': [{'plate': 'ABC-123'}]}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(response=response)
+    else:
+        response.raise_for_status.return_value = None
+    return response
 
 
 class TestPlateRecognizerHandler:
     def test_send_to_api_success(self, plate_recognizer_handler):
-        with patch('requests.post') as mock_post:
+        with patch.object(plate_recognizer_handler.session, 'post') as mock_post:
             mock_response = MagicMock()
             mock_response.json.return_value = {'results': [{'plate': 'ABC-123'}]}
             mock_response.raise_for_status.return_value = None
             mock_post.return_value = mock_response
 
-            response = plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name', 'service_url')
+            response = plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
             assert response == {'results': [{'plate': 'ABC-123'}]}
 
     def test_send_to_api_failure(self, plate_recognizer_handler):
-        with patch('requests.post') as mock_post:
+        with patch.object(plate_recognizer_handler.session, 'post') as mock_post:
             mock_post.side_effect = requests.exceptions.RequestException
             with pytest.raises(PlateRecognizerCallError):
-                plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name', 'service_url')
+                plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
+
+    def test_send_to_api_retries_server_errors(self, plate_recognizer_handler):
+        with patch.object(plate_recognizer_handler.session, 'post') as mock_post:
+            mock_post.side_effect = [make_response(503), make_response(200)]
+
+            response = plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert response == {'results': [{'plate': 'ABC-123'}]}
+            assert mock_post.call_count == 2
+            assert plate_recognizer_handler.stats['latency']['calls'] == 2
+            assert plate_recognizer_handler.stats['latency']['failures'] == 1
+
+    def test_send_to_api_does_not_retry_client_errors(self, plate_recognizer_handler):
+        with patch.object(plate_recognizer_handler.session, 'post') as mock_post:
+            mock_post.return_value = make_response(403)
+            with pytest.raises(PlateRecognizerCallError):
+                plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert mock_post.call_count == 1
+            assert plate_recognizer_handler.recognizers.endpoints[0].breaker.state == 'closed'
+
+    def test_open_breaker_fails_fast(self, plate_recognizer_handler):
+        with patch.object(plate_recognizer_handler.session, 'post') as mock_post:
+            mock_post.side_effect = requests.ConnectionError
+
+            # the third consecutive failure opens the breaker and stops the retries
+            with pytest.raises(PlateRecognizerUnavailableError):
+                plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert mock_post.call_count == 3
+
+            with pytest.raises(PlateRecognizerUnavailableError):
+                plate_recognizer_handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert mock_post.call_count == 3
+            assert plate_recognizer_handler.stats['instances'][0]['breaker']['state'] == 'open'
+
+    def test_retry_moves_to_another_instance(self):
+        handler = PlateRecognizerHandler(
+            recognizers=RecognizerPool(urls=['http://first', 'http://second'], failure_threshold=1, reset_timeout=60),
+            backoff_max_seconds=0,
+        )
+        with patch.object(handler.session, 'post') as mock_post:
+            mock_post.side_effect = lambda url, **kwargs: make_response(503 if 'first' in url else 200)
+
+            for _ in range(3):
+                assert handler.send_to_api('api_key', b'image_data', 'camera_name') == {
+                    'results': [{'plate': 'ABC-123'}]
+                }
+
+            first, second = handler.stats['instances']
+            assert first['breaker']['state'] == 'open'
+            assert first['requests'] <= 1
+            assert second['requests'] == 3
+            assert first['outstanding'] == second['outstanding'] == 0
+
+    def test_client_error_on_trial_closes_breaker(self):
+        handler = PlateRecognizerHandler(
+            recognizers=RecognizerPool(
+                urls=['http://service'], failure_threshold=1, reset_timeout=0, probe=lambda url: False
+            ),
+            max_attempts=1,
+        )
+        with patch.object(handler.session, 'post') as mock_post:
+            mock_post.side_effect = [requests.ConnectionError, make_response(403), make_response(200)]
+            with pytest.raises(PlateRecognizerCallError):
+                handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert handler.stats['instances'][0]['breaker']['state'] == 'half_open'
+
+            # the instance answered the trial, so a client error still puts it back
+            with pytest.raises(PlateRecognizerCallError):
+                handler.send_to_api('api_key', b'image_data', 'camera_name')
+            assert handler.stats['instances'][0]['breaker']['state'] == 'closed'
+            assert handler.send_to_api('api_key', b'image_data', 'camera_name') == {'results': [{'plate': 'ABC-123'}]}
+        handler.recognizers.close()
+
+    def test_unexpected_error_on_trial_releases_instance(self):
+        handler = PlateRecognizerHandler(
+            recognizers=RecognizerPool(
+                urls=['http://service'], failure_threshold=1, reset_timeout=0, probe=lambda url: False
+            ),
+            max_attempts=1,
+        )
+        with patch.object(handler.session, 'post') as mock_post:
+            mock_post.side_effect = [requests.ConnectionError, RuntimeError('unexpected'), make_response(200)]
+            with pytest.raises(PlateRecognizerCallError):
+                handler.send_to_api('api_key', b'image_data', 'camera_name')
+            with pytest.raises(RuntimeError):
+                handler.send_to_api('api_key', b'image_data', 'camera_name')
+
+            assert handler.stats['instances'][0]['outstanding'] == 0
+            assert handler.send_to_api('api_key', b'image_data', 'camera_name') == {'results': [{'plate': 'ABC-123'}]}
+            assert handler.stats['instances'][0]['breaker']['state'] == 'closed'
+        handler.recognizers.close()
@@ -0,0 +1,49 @@
+import pytest
+
+from src.handlers.prefix_trie import PrefixTrie
+
+
+@pytest.fixture
+def trie():
+    """Fixture for a PrefixTrie with nested codes."""
+    trie = PrefixTrie()
+    for code in ('M', 'MM', 'MSP', 'W'):
+        trie.insert(code, code.lower())
+    return trie
+
+
+class TestPrefixTrie:
+    @pytest.mark.parametrize(
+        'text, expected',
+        [
+            ('MSP123', ('MSP', 'msp')),
+            ('MS123', ('M', 'm')),
+            ('MM', ('MM', 'mm')),
+            ('W1', ('W', 'w')),
+            ('X1', None),
+            ('M-1', ('M', 'm')),
+            ('', None),
+        ],
+    )
+    def test_longest_prefix(self, trie, text, expected):
+        assert trie.longest_prefix(text) == expected
+
+    def test_tracks_size_and_length(self, trie):
+        trie.insert('MM', 'memmingen')
+
+        assert trie.size == 4
+        assert trie.max_length == 3
+        assert trie.longest_prefix('MM1') == ('MM', 'memmingen')
+
+    def test_insert_after_query_recompiles(self, trie):
+        assert trie.longest_prefix('MSX1') == ('M', 'm')
+        trie.insert('MS', 'ms')
+
+        assert trie.longest_prefix('MSX1') == ('MS', 'ms')
+
+    def test_items(self, trie):
+        assert sorted(trie.items()) == [('M', 'm'), ('MM', 'mm'), ('MSP', 'msp'), ('W', 'w')]
+
+    def test_empty_key_raises(self, trie):
+        with pytest.raises(ValueError):
+            trie.insert('', 'nothing')
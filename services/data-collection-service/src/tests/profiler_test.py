@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.exceptions.profiler_exceptions import ProfilerBusyError
+from src.profiler import StackSampler, collapse
+
+
+def spin(stop: threading.Event) -> None:
+    """Helper keeping a thread busy in a recognizable frame."""
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def busy_thread():
+    """Fixture for a named thread spinning in `spin` until the test ends."""
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,), name='busy worker')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestStackSampler:
+    def test_profile_collapses_sampled_stacks(self, busy_thread):
+        stacks = StackSampler().profile(seconds=0.2, interval=0.005)
+
+        lines = stacks.splitlines()
+        busy = [line for line in lines if line.startswith('busy_worker;')]
+        assert busy
+        assert all(';spin (' in line for line in busy)
+        assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+        # the sampler does not sample itself
+        assert not any('_sample (' in line for line in lines)
+
+    def test_profile_async_runs_off_the_event_loop(self, busy_thread):
+        sampler = StackSampler()
+
+        stacks = asyncio.run(sampler.profile_async(seconds=0.05, interval=0.005))
+
+        assert 'busy_worker;' in stacks
+        assert sampler.profiles == 1
+
+    def test_caps_duration(self):
+        start = time.monotonic()
+
+        StackSampler(max_seconds=0.05).profile(seconds=60, interval=0.01)
+
+        assert time.monotonic() - start < 1
+
+    def test_rejects_concurrent_profiles(self):
+        sampler = StackSampler()
+        thread = threading.Thread(target=sampler.profile, args=(0.3,))
+        thread.start()
+        while not sampler.running:
+            time.sleep(0.001)
+
+        with pytest.raises(ProfilerBusyError):
+            sampler.profile(seconds=0.01)
+        thread.join()
+
+    def test_profile_async_rejects_while_running(self):
+        sampler = StackSampler()
+
+        async def run():
+            first = asyncio.create_task(sampler.profile_async(seconds=0.2, interval=0.01))
+            await asyncio.sleep(0)
+            with pytest.raises(ProfilerBusyError):
+                await sampler.profile_async(seconds=0.01)
+            await first
+
+        asyncio.run(run())
+        assert sampler.profiles == 1
+        assert not sampler.running
+
+
+def test_collapse_orders_frames_from_the_root():
+    def inner():
+        return collapse('Main;Thread', __import__('sys')._getframe())
+
+    stack = inner()
+
+    assert stack.startswith('Main:Thread;')
+    assert stack.index('test_collapse_orders_frames_from_the_root (') < stack.index('inner (')
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+
+import pytest
+from sqlalchemy import text
+
+from src.enums.vehicle_orientation import VehicleOrientation
+from src.handlers.database_handler import DatabaseHandler
+from src.schemas.vehicle_observation import VehicleObservationRecord
+
+COMPOSITE_INDEX = 'ix_ingestion_schema_vehicle_observations_plate_hash_timestamp'
+DETECTION_TIME = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def seeded_db(db):
+    """Session on a table seeded with a busy day: 2000 plates seen 10 times each, 30 vehicles per minute."""
+    db.execute(
+        text(
+            'INSERT INTO vehicle_observations (plate_hash, timestamp) '
+            "SELECT sha256(convert_to('plate' || mod(n, 2000), 'UTF8')), "
+            "'2025-01-01 10:00:00+00'::timestamptz - n * interval '2 seconds' "
+            'FROM generate_series(1, 20000) AS n'
+        )
+    )
+    db.execute(text('ANALYZE vehicle_observations'))
+    return db
+
+
+def plan_nodes(plan: dict) -> list[dict]:
+    """Helper to flatten an EXPLAIN (FORMAT JSON) plan tree."""
+    nodes = [plan]
+    for child in plan.get('Plans', []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def test_duplicate_query_uses_composite_index(seeded_db):
+    """
+    Test that the duplicate check of the insert is answered by a range scan on the composite index.
+    """
+    observation = VehicleObservationRecord(
+        plate='plate42',
+        plate_hash=sha256(b'plate42').digest(),
+        plate_score=900,
+        country_code='at',
+        vehicle_type='Sedan',
+        make='volkswagen',
+        model='golf',
+        color='white',
+        orientation=VehicleOrientation.FRONT,
+        timestamp=DETECTION_TIME,
+    )
+    stmt = DatabaseHandler().unless_recent_insert([observation], timedelta(seconds=60))
+    compiled = stmt.compile(dialect=seeded_db.get_bind().dialect)
+    # without ANALYZE the insert is only planned, not executed
+    plan = seeded_db.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+
+    nodes = plan_nodes(plan[0]['Plan'])
+    index_scans = [node for node in nodes if node['Node Type'] in ('Index Scan', 'Index Only Scan')]
+
+    assert [node['Index Name'] for node in index_scans] == [COMPOSITE_INDEX]
+    # both ends of the window bound the scan, not only the plate hash
+    assert '"timestamp" >=' in index_scans[0]['Index Cond']
+    assert '"timestamp" <=' in index_scans[0]['Index Cond']
+    assert not any(node['Node Type'] in ('Seq Scan', 'BitmapAnd') for node in nodes)
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.handlers.recent_plate_index import RecentPlateIndex
+
+START = datetime(2025, 1, 1, 10, 0, 0, tzinfo=timezone.utc)
+INTERVAL = timedelta(seconds=60)
+
+
+@pytest.fixture
+def index():
+    """Index that has been recording since START."""
+    return RecentPlateIndex(interval=INTERVAL, max_entries=100, started_at=START)
+
+
+def test_cold_index_falls_back(index):
+    # the window reaches back before the process started
+    assert index.is_duplicate(b'plate', START + timedelta(seconds=30)) is None
+    assert index.stats['fallbacks'] == 1
+
+
+def test_warm_index_answers(index):
+    now = START + timedelta(minutes=5)
+    index.record(b'plate', now - timedelta(seconds=30))
+
+    assert index.is_duplicate(b'plate', now) is True
+    assert index.is_duplicate(b'other', now) is False
+    assert index.stats['hit_ratio'] == 1.0
+
+
+def test_entries_leave_window(index):
+    now = START + timedelta(minutes=5)
+    index.record(b'old', now - timedelta(seconds=90))
+    index.record(b'new', now)
+
+    assert index.stats['size'] == 1
+    assert index.is_duplicate(b'old', now) is False
+
+
+def test_newer_entry_falls_back(index):
+    now = START + timedelta(minutes=5)
+    index.record(b'plate', now + timedelta(seconds=10))
+
+    assert index.is_duplicate(b'plate', now) is None
+
+
+def test_capacity_eviction_falls_back():
+    index = RecentPlateIndex(interval=INTERVAL, max_entries=2, started_at=START)
+    now = START + timedelta(minutes=5)
+    for second, plate in enumerate((b'a', b'b', b'c')):
+        index.record(plate, now + timedelta(seconds=second))
+
+    assert index.stats['size'] == 2
+    assert index.stats['evictions'] == 1
+    # 'a' was dropped while still inside the window, so misses cannot be trusted
+    assert index.is_duplicate(b'a', now + timedelta(seconds=5)) is None
+    assert index.is_duplicate(b'a', now + timedelta(seconds=61)) is False
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.handlers.recognizer_pool import RecognizerPool
+from src.pipeline.recognition_scheduler import AsyncRecognitionScheduler, RecognitionScheduler
+
+
+class TestRecognitionScheduler:
+    def test_caps_concurrent_calls(self):
+        scheduler = RecognitionScheduler(slots=2)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def call(camera_name):
+            with scheduler.slot(camera_name):
+                with lock:
+                    running.append(camera_name)
+                    peak.append(len(running))
+                time.sleep(0.01)
+                with lock:
+                    running.remove(camera_name)
+
+        threads = [threading.Thread(target=call, args=(f'Camera {i % 3}',)) for i in range(9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert scheduler.stats['in_flight'] == 0
+        assert sum(camera['granted'] for camera in scheduler.stats['wait_by_camera'].values()) == 9
+
+    def test_round_robins_across_cameras(self):
+        scheduler = RecognitionScheduler(slots=1)
+        scheduler.acquire('Entrance')
+        order = []
+
+        def call(camera_name):
+            scheduler.acquire(camera_name)
+            order.append(camera_name)
+            scheduler.release()
+
+        # the busy camera queues three calls before the quiet one queues its only call
+        threads = []
+        for camera_name in ['Entrance', 'Entrance', 'Entrance', 'Garden']:
+            thread = threading.Thread(target=call, args=(camera_name,))
+            thread.start()
+            threads.append(thread)
+            while scheduler.stats['waiting'] < len(threads):
+                time.sleep(0.001)
+
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+
+        assert order == ['Entrance', 'Garden', 'Entrance', 'Entrance']
+
+    def test_reports_wait_per_camera(self):
+        scheduler = RecognitionScheduler(slots=1)
+        scheduler.acquire('Entrance')
+
+        thread = threading.Thread(target=scheduler.acquire, args=('Garden',))
+        thread.start()
+        while scheduler.stats['waiting'] < 1:
+            time.sleep(0.001)
+        time.sleep(0.02)
+        scheduler.release()
+        thread.join()
+
+        waits = scheduler.stats['wait_by_camera']
+        assert waits['Entrance']['max_wait_seconds'] == 0.0
+        assert waits['Garden']['max_wait_seconds'] >= 0.02
+
+    def test_capacity_follows_healthy_instances(self):
+        pool = RecognizerPool(urls=['http://a', 'http://b'], failure_threshold=1, probe=lambda url: False)
+        scheduler = RecognitionScheduler(slots=2, instances=lambda: pool.healthy)
+        pool.add_recovery_listener(scheduler.wake)
+        assert scheduler.stats['slots'] == 4
+
+        # one instance is ejected, so only the two slots of the other one are handed out
+        pool.release(pool.acquire(), failed=True)
+        for _ in range(2):
+            scheduler.acquire('Entrance')
+        threads = [
+            threading.Thread(target=scheduler.acquire, args=(camera_name,)) for camera_name in ('Entrance', 'Garden')
+        ]
+        for thread in threads:
+            thread.start()
+        while scheduler.stats['waiting'] < 2:
+            time.sleep(0.001)
+        assert (scheduler.stats['slots'], scheduler.stats['in_flight']) == (2, 2)
+
+        # the instance is back, so both waiting calls get through without waiting for a release
+        pool.probe = lambda url: True
+        pool.probe_ejected()
+        for thread in threads:
+            thread.join(timeout=1)
+        assert scheduler.stats['in_flight'] == 4
+        assert scheduler.stats['waiting'] == 0
+        pool.close()
+
+    def test_keeps_a_share_while_all_instances_are_ejected(self):
+        scheduler = RecognitionScheduler(slots=2, instances=lambda: 0)
+        assert scheduler.stats['slots'] == 2
+
+    def test_requires_a_slot(self):
+        with pytest.raises(ValueError):
+            RecognitionScheduler(slots=0)
+
+
+class TestAsyncRecognitionScheduler:
+    def test_round_robins_across_cameras(self):
+        scheduler = AsyncRecognitionScheduler(slots=1)
+        order = []
+
+        async def call(camera_name):
+            async with scheduler.slot(camera_name):
+                order.append(camera_name)
+                await asyncio.sleep(0)
+
+        async def run():
+            await asyncio.gather(*(call(name) for name in ['Entrance', 'Entrance', 'Entrance', 'Garden', 'Garden']))
+
+        asyncio.run(run())
+        assert order == ['Entrance', 'Entrance', 'Garden', 'Entrance', 'Garden']
+        assert scheduler.stats['in_flight'] == 0
+
+    def test_cancelled_waiter_gives_up_its_turn(self):
+        scheduler = AsyncRecognitionScheduler(slots=1)
+
+        async def run():
+            await scheduler.acquire('Entrance')
+            waiting = asyncio.create_task(scheduler.acquire('Garden'))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+
+            scheduler.release()
+            assert scheduler.stats['in_flight'] == 0
+            await asyncio.wait_for(scheduler.acquire('Entrance'), timeout=1)
+
+        asyncio.run(run())
+
+    def test_wake_from_another_thread_lets_waiters_through(self):
+        healthy = [1]
+        scheduler = AsyncRecognitionScheduler(slots=1, instances=lambda: healthy[0])
+
+        async def run():
+            await scheduler.acquire('Entrance')
+            waiting = asyncio.create_task(scheduler.acquire('Garden'))
+            await asyncio.sleep(0)
+
+            # an instance recovers on the prober thread
+            healthy[0] = 2
+            thread = threading.Thread(target=scheduler.wake)
+            thread.start()
+            thread.join()
+
+            await asyncio.wait_for(waiting, timeout=1)
+            return scheduler.stats
+
+        stats = asyncio.run(run())
+        assert stats['in_flight'] == 2
+        assert stats['waiting'] == 0
@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from src.exceptions.plate_recognizer_exceptions import PlateRecognizerUnavailableError
+from src.handlers.recognizer_pool import RecognizerPool
+
+
+class TestRecognizerPool:
+    def test_routes_to_least_outstanding_instance(self):
+        pool = RecognizerPool(urls=['http://a', 'http://b', 'http://c'])
+
+        busy = [pool.acquire() for _ in range(3)]
+        assert sorted(endpoint.url for endpoint in busy) == ['http://a', 'http://b', 'http://c']
+
+        pool.release(busy[1], failed=False)
+        assert pool.acquire() is busy[1]
+
+    def test_ejects_failing_instance(self):
+        pool = RecognizerPool(urls=['http://a', 'http://b'], failure_threshold=1, probe=lambda url: False)
+
+        failing = pool.acquire()
+        pool.release(failing, failed=True)
+        assert failing.breaker.state == 'open'
+
+        healthy = {pool.acquire().url for _ in range(4)}
+        assert healthy == {'http://a', 'http://b'} - {failing.url}
+        pool.close()
+
+    def test_non_transient_errors_do_not_eject(self):
+        pool = RecognizerPool(urls=['http://a'], failure_threshold=1)
+
+        pool.release(pool.acquire(), failed=None)
+        assert pool.stats[0]['breaker']['state'] == 'closed'
+        assert pool.stats[0]['outstanding'] == 0
+
+    def test_all_ejected_raises(self):
+        pool = RecognizerPool(urls=['http://a'], failure_threshold=1, probe=lambda url: False)
+        pool.release(pool.acquire(), failed=True)
+
+        with pytest.raises(PlateRecognizerUnavailableError):
+            pool.acquire()
+        pool.close()
+
+    def test_probe_puts_instance_back(self):
+        healthy = set()
+        pool = RecognizerPool(urls=['http://a'], failure_threshold=1, probe_interval=0.01, probe=healthy.__contains__)
+        pool.release(pool.acquire(), failed=True)
+        assert pool.stats[0]['breaker']['state'] == 'open'
+
+        healthy.add('http://a')
+        deadline = time.monotonic() + 1
+        while pool.stats[0]['breaker']['state'] == 'open' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert pool.stats[0]['breaker']['state'] == 'closed'
+        assert pool.acquire().url == 'http://a'
+        pool.close()
+
+    def test_client_error_on_trial_puts_instance_back(self):
+        pool = RecognizerPool(urls=['http://a'], failure_threshold=1, reset_timeout=0, probe=lambda url: False)
+        pool.release(pool.acquire(), failed=True)
+
+        # the trial was answered with a client error, the instance itself is reachable
+        pool.release(pool.acquire(), failed=False)
+
+        assert pool.stats[0]['breaker']['state'] == 'closed'
+        pool.close()
+
+    def test_probe_closes_half_open_instance(self):
+        healthy = set()
+        pool = RecognizerPool(
+            urls=['http://a'], failure_threshold=1, reset_timeout=0, probe_interval=0.01, probe=healthy.__contains__
+        )
+        pool.release(pool.acquire(), failed=True)
+        # the trial ends without telling anything about the instance, e.g. it was cancelled
+        pool.release(pool.acquire(), failed=None)
+        time.sleep(0.05)
+        assert pool.stats[0]['breaker']['state'] == 'half_open'
+
+        healthy.add('http://a')
+        deadline = time.monotonic() + 1
+        while pool.stats[0]['breaker']['state'] != 'closed' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert pool.stats[0]['breaker']['state'] == 'closed'
+        pool.close()
+
+    def test_recovery_listeners_are_called_when_an_instance_is_back(self):
+        recovered = []
+        pool = RecognizerPool(urls=['http://a', 'http://b'], failure_threshold=1, probe=lambda url: False)
+        pool.add_recovery_listener(lambda: recovered.append(pool.healthy))
+
+        pool.release(pool.acquire(), failed=True)
+        # answered calls on a closed instance are no recovery
+        pool.release(pool.acquire(), failed=False)
+        assert recovered == []
+
+        pool.probe = lambda url: True
+        pool.probe_ejected()
+
+        assert recovered == [2]
+        pool.close()
+
+    def test_requires_urls(self):
+        with pytest.raises(ValueError):
+            RecognizerPool(urls=[])
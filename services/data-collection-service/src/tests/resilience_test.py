@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from src.handlers.resilience import CircuitBreaker, LatencyRecorder
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(name='test', failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        assert breaker.allow_call()
+        breaker.record_failure()
+
+        assert breaker.state == 'open'
+        assert not breaker.allow_call()
+        assert breaker.stats['rejected'] == 1
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(name='test', failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == 'closed'
+
+    def test_half_open_allows_single_trial(self):
+        breaker = CircuitBreaker(name='test', failure_threshold=1, reset_timeout=30)
+        with patch('src.handlers.resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('src.handlers.resilience.time.monotonic', return_value=131.0):
+            assert breaker.state == 'half_open'
+            assert breaker.allow_call()
+            assert not breaker.allow_call()
+
+            breaker.record_success()
+            assert breaker.state == 'closed'
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(name='test', failure_threshold=1, reset_timeout=30)
+        with patch('src.handlers.resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('src.handlers.resilience.time.monotonic', return_value=131.0):
+            assert breaker.allow_call()
+            breaker.record_failure()
+            assert breaker.state == 'open'
+            assert breaker.stats['opened'] == 2
+
+    def test_neutral_outcome_ends_trial(self):
+        breaker = CircuitBreaker(name='test', failure_threshold=1, reset_timeout=30)
+        with patch('src.handlers.resilience.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+        with patch('src.handlers.resilience.time.monotonic', return_value=131.0):
+            assert breaker.allow_call()
+            breaker.record_neutral()
+
+            assert breaker.state == 'half_open'
+            assert breaker.allow_call()
+
+
+def test_latency_percentiles():
+    recorder = LatencyRecorder(window=100)
+    for ms in range(1, 101):
+        recorder.record(ms / 1000, failed=ms > 95)
+
+    stats = recorder.stats
+    assert stats['calls'] == 100
+    assert stats['failures'] == 5
+    assert stats['p50_seconds'] == 0.0505
+    assert stats['p99_seconds'] >= 0.099
@@ -0,0 +1,57 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.pipeline.snapshot_processor import SnapshotProcessor
+
+
+def make_jpeg(width: int = 1920, height: int = 1080) -> bytes:
+    """Helper to create a jpeg with a white lower half."""
+    image = Image.new('RGB', (width, height), 'black')
+    image.paste('white', (0, height // 2, width, height))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def decode(image_data: bytes) -> Image.Image:
+    """Helper to open a jpeg."""
+    return Image.open(BytesIO(image_data))
+
+
+@pytest.fixture
+def processor():
+    """Processor with a lane region on the lower half of Camera 1."""
+    processor = SnapshotProcessor(regions={'Camera 1': (0.0, 0.5, 1.0, 1.0)}, max_size=0)
+    yield processor
+    processor.shutdown()
+
+
+def test_crops_to_region(processor):
+    prepared = decode(processor.prepare('Camera 1', make_jpeg()))
+
+    assert prepared.size == (1920, 540)
+    assert prepared.getpixel((960, 270))[0] > 200
+    assert processor.stats['processed'] == 1
+
+
+def test_camera_without_region_is_unchanged(processor):
+    image_data = make_jpeg()
+
+    assert processor.prepare('Camera 2', image_data) is image_data
+    assert processor.stats['processed'] == 0
+
+
+def test_downscales_to_max_size():
+    processor = SnapshotProcessor(regions={}, max_size=960)
+    prepared = decode(asyncio.run(processor.prepare_async('Camera 2', make_jpeg())))
+    processor.shutdown()
+
+    assert prepared.size == (960, 540)
+    assert processor.stats['size_ratio'] < 1
+
+
+def test_undecodable_image_is_unchanged(processor):
+    assert processor.prepare('Camera 1', b'not a jpeg') == b'not a jpeg'
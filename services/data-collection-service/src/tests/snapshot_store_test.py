@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from src.pipeline.snapshot_store import SnapshotStore
+from src.tests.snapshot_processor_test import make_jpeg
+
+DETECTION_TIME = datetime(2025, 1, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    """Empty snapshot directory."""
+    return tmp_path / 'snapshots'
+
+
+def test_saves_with_content_addressed_name(store_dir):
+    store = SnapshotStore(directory=str(store_dir), max_bytes=0, max_age_seconds=0)
+    image_data = make_jpeg(64, 64)
+
+    store.save(image_data, 'Camera 1: Entrance', DETECTION_TIME)
+    store.save(image_data, 'Camera 2', DETECTION_TIME + timedelta(seconds=5))
+    store.close()
+
+    name = store.filename(image_data)
+    assert sorted(os.listdir(store_dir)) == [name, name.replace('.jpg', '.jsonl')]
+    assert store.sightings(name) == [
+        {'time': '2025-01-01T10:00:00', 'camera': 'Camera 1: Entrance'},
+        {'time': '2025-01-01T10:00:05', 'camera': 'Camera 2'},
+    ]
+    assert store.stats['saved'] == 1
+
+
+def test_repeated_frame_is_evicted_last(store_dir):
+    store = SnapshotStore(directory=str(store_dir), max_bytes=0, max_age_seconds=0)
+    first, second = make_jpeg(64, 64), make_jpeg(32, 32)
+
+    store.save(first, 'Camera 1', DETECTION_TIME)
+    store.save(second, 'Camera 1', DETECTION_TIME)
+    store.save(first, 'Camera 1', DETECTION_TIME)
+    store.close()
+
+    assert list(store._files) == [store.filename(second), store.filename(first)]
+
+
+def test_transcodes_to_webp(store_dir):
+    store = SnapshotStore(directory=str(store_dir), max_bytes=0, max_age_seconds=0, image_format='webp')
+    image_data = make_jpeg(64, 64)
+    store.save(image_data, 'Camera 1', DETECTION_TIME)
+    store.close()
+
+    assert store.filename(image_data).endswith('.webp')
+    with Image.open(store_dir / store.filename(image_data)) as image:
+        assert image.format == 'WEBP'
+
+
+def test_evicts_oldest_over_size_quota(store_dir):
+    store = SnapshotStore(directory=str(store_dir), max_bytes=1, max_age_seconds=0)
+    first, second = make_jpeg(64, 64), make_jpeg(32, 32)
+
+    store.save(first, 'Camera 1', DETECTION_TIME)
+    store.save(second, 'Camera 1', DETECTION_TIME)
+    store.close()
+
+    # the newest snapshot is evicted as well, because it alone exceeds the quota, with the sidecars
+    assert os.listdir(store_dir) == []
+    assert store.stats['evicted'] == 2
+
+
+def test_evicts_expired_files_on_startup(store_dir):
+    store_dir.mkdir()
+    expired = store_dir / 'old.jpg'
+    expired.write_bytes(b'jpeg')
+    os.utime(expired, (time.time() - 7200, time.time() - 7200))
+    (store_dir / 'new.jpg').write_bytes(b'jpeg')
+
+    store = SnapshotStore(directory=str(store_dir), max_bytes=0, max_age_seconds=3600)
+    store.close()
+
+    assert os.listdir(store_dir) == ['new.jpg']
+    assert store.stats == {'files': 1, 'bytes': 4, 'pending': 0, 'saved': 0, 'dropped': 0, 'evicted': 1}
+
+
+def test_evicts_expired_files_periodically(store_dir):
+    store = SnapshotStore(directory=str(store_dir), max_bytes=0, max_age_seconds=3600, evict_interval_seconds=0.05)
+    store.save(make_jpeg(), 'Camera 1', DETECTION_TIME)
+    deadline = time.monotonic() + 5
+    while store.stats['saved'] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # the snapshot expires while nothing else is saved
+    with patch('src.pipeline.snapshot_store.time.time', return_value=time.time() + 7200):
+        deadline = time.monotonic() + 5
+        while store.stats['evicted'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    store.close()
+
+    assert os.listdir(store_dir) == []
+    assert store.stats['evicted'] == 1
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime
+
+from src.pipeline.ingestion_queue import IngestionQueue
+from src.pipeline.spool import DetectionSpool
+
+DETECTION_TIME = datetime(2025, 1, 1, 10, 0, 0)
+
+
+class TestDetectionSpool:
+    def test_unfinished_records_are_replayed(self, tmp_path):
+        path = str(tmp_path / 'detections.journal')
+
+        async def first_run():
+            spool = DetectionSpool(path=path)
+            await spool.open()
+            done_id = await spool.append('Camera 1', DETECTION_TIME)
+            await spool.append('Camera 2', DETECTION_TIME)
+            spool.mark_done(done_id)
+            await spool.close()
+
+        async def second_run():
+            spool = DetectionSpool(path=path)
+            records = await spool.open()
+            await spool.close()
+            return records
+
+        asyncio.run(first_run())
+        records = asyncio.run(second_run())
+
+        assert [(r.camera_name, r.detection_time) for r in records] == [('Camera 2', DETECTION_TIME)]
+
+    def test_concurrent_appends_share_fsyncs(self, tmp_path):
+        async def run():
+            spool = DetectionSpool(path=str(tmp_path / 'detections.journal'))
+            await spool.open()
+            await asyncio.gather(*(spool.append(f'Camera {i}', DETECTION_TIME) for i in range(200)))
+            await spool.close()
+            return spool.stats
+
+        stats = asyncio.run(run())
+        assert stats['appended'] == 200
+        assert stats['pending'] == 200
+        assert stats['batches'] < 200
+
+    def test_torn_last_line_is_skipped(self, tmp_path):
+        path = tmp_path / 'detections.journal'
+
+        async def first_run():
+            spool = DetectionSpool(path=str(path))
+            await spool.open()
+            await spool.append('Camera 1', DETECTION_TIME)
+            await spool.close()
+
+        async def second_run():
+            spool = DetectionSpool(path=str(path))
+            records = await spool.open()
+            await spool.close()
+            return records
+
+        asyncio.run(first_run())
+        with open(path, 'a') as f:
+            f.write('{"op": "acc')
+
+        records = asyncio.run(second_run())
+        assert [r.camera_name for r in records] == ['Camera 1']
+
+    def test_processed_journal_is_compacted(self, tmp_path):
+        path = tmp_path / 'detections.journal'
+
+        async def run():
+            spool = DetectionSpool(path=str(path), compact_after=4)
+            await spool.open()
+            for _ in range(3):
+                spool.mark_done(await spool.append('Camera 1', DETECTION_TIME))
+            await asyncio.sleep(0.05)
+            await spool.close()
+
+        asyncio.run(run())
+        assert path.read_text() == ''
+
+
+class TestIngestionQueueSpool:
+    def test_queue_replays_and_completes_spooled_events(self, tmp_path):
+        path = str(tmp_path / 'detections.journal')
+        processed = []
+
+        async def process(camera_name, detection_time):
+            processed.append(camera_name)
+            return True
+
+        async def crashed_run():
+            # events are journaled but the workers never run
+            spool = DetectionSpool(path=path)
+            await spool.open()
+            queue = IngestionQueue(process=process, workers=1, max_depth=10, spool=spool)
+            await queue.submit('Camera 1', DETECTION_TIME)
+            await queue.submit('Camera 2', DETECTION_TIME)
+            await spool.close()
+
+        async def restarted_run():
+            queue = IngestionQueue(process=process, workers=2, max_depth=10, spool=DetectionSpool(path=path))
+            await queue.start()
+            await asyncio.sleep(0.05)
+            await queue.join()
+            await queue.stop()
+
+        async def pending_after_restart():
+            spool = DetectionSpool(path=path)
+            records = await spool.open()
+            await spool.close()
+            return records
+
+        asyncio.run(crashed_run())
+        asyncio.run(restarted_run())
+
+        assert sorted(processed) == ['Camera 1', 'Camera 2']
+        assert asyncio.run(pending_after_restart()) == []
+
+    def test_failed_detection_stays_spooled(self, tmp_path):
+        path = str(tmp_path / 'detections.journal')
+
+        async def process(camera_name, detection_time):
+            # e.g. the database is down
+            return camera_name != 'Camera 1'
+
+        async def run():
+            queue = IngestionQueue(
+                process=process, workers=1, max_depth=10, spool=DetectionSpool(path=path), max_attempts=2
+            )
+            await queue.start()
+            await queue.submit('Camera 1', DETECTION_TIME)
+            await queue.submit('Camera 2', DETECTION_TIME)
+            await queue.join()
+            await queue.stop()
+
+        async def pending_after_restart():
+            spool = DetectionSpool(path=path)
+            records = await spool.open()
+            await spool.close()
+            return records
+
+        asyncio.run(run())
+
+        assert [record.camera_name for record in asyncio.run(pending_after_restart())] == ['Camera 1']
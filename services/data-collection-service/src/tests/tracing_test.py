@@ -0,0 +1,89 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+from src.logger import TraceContextFilter
+from src.tracing import SpanFileExporter, Tracer, current_span
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    """Fixture for a SpanFileExporter writing to a temporary file."""
+    exporter = SpanFileExporter(path=str(tmp_path / 'traces' / 'spans.jsonl'), max_bytes=1024 * 1024, backups=1)
+    yield exporter
+    exporter.close()
+
+
+def read_spans(tmp_path) -> list[dict]:
+    """Helper to read the exported spans."""
+    with open(tmp_path / 'traces' / 'spans.jsonl', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestTracer:
+    def test_nests_spans_in_one_trace(self, exporter, tmp_path):
+        tracer = Tracer(exporter=exporter)
+
+        with tracer.span('detection', camera='Entrance') as root:
+            with tracer.span('snapshot') as child:
+                assert current_span.get() is child
+            assert current_span.get() is root
+        exporter.close()
+
+        snapshot, detection = read_spans(tmp_path)
+        assert snapshot['traceId'] == detection['traceId']
+        assert snapshot['parentSpanId'] == detection['spanId']
+        assert detection['parentSpanId'] == ''
+        assert detection['attributes'] == {'camera': 'Entrance'}
+        assert detection['endTimeUnixNano'] >= snapshot['endTimeUnixNano'] >= snapshot['startTimeUnixNano']
+        assert current_span.get() is None
+
+    def test_marks_failed_spans(self, exporter, tmp_path):
+        tracer = Tracer(exporter=exporter)
+
+        with pytest.raises(ValueError), tracer.span('insert'):
+            raise ValueError('constraint violated')
+        exporter.close()
+
+        (span,) = read_spans(tmp_path)
+        assert span['status'] == {'code': 'STATUS_CODE_ERROR', 'message': 'ValueError: constraint violated'}
+
+    def test_explicit_parent_continues_trace(self):
+        tracer = Tracer()
+        with tracer.span('webhook') as webhook:
+            pass
+
+        async def worker():
+            with tracer.span('detection', parent=webhook) as detection:
+                # threads started from the task see the span as well
+                return detection, await asyncio.to_thread(current_span.get)
+
+        detection, in_thread = asyncio.run(worker())
+
+        assert detection.trace_id == webhook.trace_id
+        assert detection.parent_id == webhook.span_id
+        assert in_thread is detection
+
+    def test_drops_spans_when_writer_falls_behind(self, tmp_path):
+        exporter = SpanFileExporter(path=str(tmp_path / 'spans.jsonl'), max_bytes=0, backups=0, queue_size=1)
+        exporter.close()
+        tracer = Tracer(exporter=exporter)
+
+        for _ in range(3):
+            with tracer.span('alpr_attempt'):
+                pass
+
+        assert exporter.exported == 1
+        assert exporter.dropped == 2
+
+
+def test_log_records_carry_trace_id():
+    record = logging.makeLogRecord({'msg': 'Plate Recognizer returned no actual observations'})
+
+    with Tracer().span('detection') as span:
+        TraceContextFilter().filter(record)
+
+    assert record.trace_id == span.trace_id
+    assert record.span_id == span.span_id
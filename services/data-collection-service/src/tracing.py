@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import queue
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging.handlers import QueueListener, RotatingFileHandler
+
+from src.config import settings
+
+# span of the running code, copied into threads started with asyncio.to_thread and into new tasks
+current_span: ContextVar['Span | None'] = ContextVar('current_span', default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed operation within a trace"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+
+    def to_otlp(self) -> dict:
+        """Converts the span to the field names of the OTLP json encoding
+
+        Returns:
+            dict: span as written by the file exporter
+        """
+        status = {'code': 'STATUS_CODE_ERROR', 'message': self.error} if self.error else {'code': 'STATUS_CODE_OK'}
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': status,
+        }
+
+
+class _SpanFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.span.to_otlp(), ensure_ascii=False, default=str)
+
+
+class SpanFileExporter:
+    """Writes finished spans as json lines to a rotating file from a background thread
+
+    Spans are dropped when the writer falls behind by more than `queue_size` spans,
+    exporting never blocks the traced code.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int = 10_000):
+        """
+        Args:
+            path (str): span file, rotated to `path.1`, `path.2`, ...
+            max_bytes (int): size after which the file is rotated
+            backups (int): number of rotated files kept
+            queue_size (int): spans waiting for the writer before new ones are dropped
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(_SpanFormatter())
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+        self._closed = False
+
+        self.exported = 0
+        self.dropped = 0
+
+    def export(self, span: Span) -> None:
+        """Queues a finished span for writing
+
+        Args:
+            span (Span): finished span
+        """
+        try:
+            self._queue.put_nowait(logging.makeLogRecord({'span': span}))
+            self.exported += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Writes the queued spans and stops the writer thread"""
+        if not self._closed:
+            self._closed = True
+            self._listener.stop()
+
+
+class Tracer:
+    """Creates spans, nesting them under the current span of the running code"""
+
+    def __init__(self, exporter: SpanFileExporter | None = None):
+        """
+        Args:
+            exporter (SpanFileExporter | None): receives finished spans, without one the spans only
+                correlate log records
+        """
+        self.exporter = exporter
+
+    @property
+    def stats(self) -> dict:
+        """Exported and dropped spans"""
+        if self.exporter is None:
+            return {'enabled': False}
+        return {'enabled': True, 'exported': self.exporter.exported, 'dropped': self.exporter.dropped}
+
+    @contextmanager
+    def span(self, name: str, parent: Span | None = None, **attributes) -> Iterator[Span]:
+        """Runs a block as a span, marking it failed if the block raises
+
+        Args:
+            name (str): operation name, e.g. 'snapshot'
+            parent (Span | None): parent span, the current span if omitted. A span without
+                parent starts a new trace.
+            **attributes: attributes of the span, more can be added to `span.attributes` in the block
+
+        Yields:
+            Span: the running span, current for the duration of the block
+        """
+        parent = parent or current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else f'{random.getrandbits(128):032x}',
+            span_id=f'{random.getrandbits(64):016x}',
+            parent_id=parent.span_id if parent is not None else None,
+            attributes=attributes,
+        )
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if self.exporter is not None:
+                self.exporter.export(span)
+
+    def close(self) -> None:
+        """Flushes and stops the exporter"""
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+tracer = Tracer(
+    exporter=SpanFileExporter(
+        path=settings.trace_path,
+        max_bytes=settings.trace_max_mb * 1024 * 1024,
+        backups=settings.trace_backups,
+    )
+    if settings.trace_path
+    else None
+)
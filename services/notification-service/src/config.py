@@ -25,6 +25,10 @@ class Settings(BaseSettings):
     # API Key for service authentication
     api_key: str = Field(..., alias='NOTIFICATION_API_KEY')
 
+    # Sampling profiler, the admin endpoint is disabled without a key
+    profiler_api_key: str = Field('', alias='PROFILER_API_KEY')
+    profiler_max_seconds: float = Field(120, alias='PROFILER_MAX_SECONDS')
+
     @property
     def db_uri(self) -> PostgresDsn:
         """Constructs the PostgreSQL connection URI."""
@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.routing import APIRoute
 
+from src.api.auth import verify_profiler_key
 from src.api.router import api_router
+from src.config import settings
+from src.exceptions.profiler_exceptions import ProfilerBusyError
 from src.logger import logger
+from src.profiler import StackSampler
 
 
 def cstm_generate_unique_id(route: APIRoute) -> str:
@@ -18,12 +22,26 @@ app = FastAPI(
 
 app.include_router(api_router, prefix='/api')
 
+profiler = StackSampler(max_seconds=settings.profiler_max_seconds)
+
 
 @app.get('/health', tags=['health'])
 async def health_check():
     return {'status': 'ok'}
 
 
+@app.get('/admin/profile', tags=['admin'], dependencies=[Depends(verify_profiler_key)])
+async def get_profile(
+    seconds: float = Query(10, gt=0, description='duration of the profile'),
+    interval_ms: float = Query(10, ge=1, le=1000, description='time between two samples'),
+):
+    try:
+        stacks = await profiler.profile_async(seconds=seconds, interval=interval_ms / 1000)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Custom exception handler to log all HTTPExceptions before returning the response"""
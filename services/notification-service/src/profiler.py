@@ -0,0 +1,139 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import FrameType
+
+
+from src.exceptions.profiler_exceptions import ProfilerBusyError
+
+
+class StackSampler:
+    """Statistical profiler sampling the stacks of all threads at a fixed interval
+
+    Nothing runs between profiles. While profiling, a thread of its own reads the current
+    frame of every other thread with `sys._current_frames()` once per interval. The
+    sampled threads only wait for the GIL during that walk, a few microseconds per
+    thread and sample.
+    The result is in the collapsed stack format flamegraph tools read: one line per
+    distinct stack, frames from the outermost to the innermost separated by `;`,
+    followed by the number of samples.
+    """
+
+    def __init__(self, max_seconds: float = 120):
+        """
+        Args:
+            max_seconds (float): upper bound of a single profile
+        """
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        # started on the first profile, so it doesn't take a thread of the default pool the sync pipeline uses
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profiler')
+        self.profiles = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether a profile is being recorded"""
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float = 0.01) -> str:
+        """Samples all threads for a while, blocking the caller until done
+
+        Args:
+            seconds (float): duration of the profile, capped at `max_seconds`
+            interval (float): seconds between samples
+
+        Raises:
+            ProfilerBusyError: If another profile is running
+
+        Returns:
+            str: collapsed stacks with their sample counts, most frequent first
+        """
+        self._reserve()
+        return self._record(seconds, interval)
+
+    async def profile_async(self, seconds: float, interval: float = 0.01) -> str:
+        """Samples all threads for a while without blocking the event loop
+
+        Args:
+            seconds (float): duration of the profile, capped at `max_seconds`
+            interval (float): seconds between samples
+
+        Raises:
+            ProfilerBusyError: If another profile is running
+
+        Returns:
+            str: collapsed stacks with their sample counts, most frequent first
+        """
+        # taken before submitting, a request queued behind the running profile could not be refused
+        self._reserve()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._record, seconds, interval)
+        except BaseException:
+            self._lock.release()
+            raise
+        return await future
+
+    def _reserve(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError('A profile is already being recorded')
+
+    def _record(self, seconds: float, interval: float) -> str:
+        # releases the lock only once sampling ends, even if the caller stopped waiting for it
+        try:
+            stacks = self._sample(min(seconds, self.max_seconds), interval)
+            self.profiles += 1
+        finally:
+            self._lock.release()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+    def _sample(self, seconds: float, interval: float) -> Counter:
+        own_id = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    stacks[collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            # a fixed schedule, so slow samples don't stretch the interval
+            next_sample += interval
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+        return stacks
+
+
+def collapse(thread_name: str, frame: FrameType | None) -> str:
+    """Renders a stack in the collapsed format, the thread name as the root frame
+
+    Args:
+        thread_name (str): name of the sampled thread
+        frame (FrameType | None): innermost frame of the thread
+
+    Returns:
+        str: `thread;outer frame;...;inner frame`
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    frames.append(thread_name.replace(';', ':').replace(' ', '_'))
+    return ';'.join(reversed(frames))
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    # site-packages and the service source are enough to tell modules apart
+    for marker in ('site-packages', 'dist-packages'):
+        index = filename.find(marker)
+        if index != -1:
+            return filename[index + len(marker) + 1 :]
+    try:
+        return os.path.relpath(filename)
+    except ValueError:
+        return filename
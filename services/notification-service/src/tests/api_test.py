@@ -1,6 +1,12 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from src.config import settings
+from src.main import app
 from src.models.user_preferences import UserPreferences
 
 
@@ -192,3 +198,54 @@ def test_update_user_preferences_duplicate_email(client: TestClient, db: Session
         json={'email': 'one@example.com'},
     )
     assert response.status_code == 400
+
+
+def test_profile_disabled_without_key():
+    """
+    Test that the profiler endpoint does not exist unless a profiler api key is configured.
+    """
+    with patch.object(settings, 'profiler_api_key', ''):
+        response = TestClient(app).get('/admin/profile', headers={'Authorization': ''})
+    assert response.status_code == 404
+
+
+def test_profile_requires_key():
+    """
+    Test that the profiler endpoint rejects requests without the profiler api key.
+    """
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        response = TestClient(app).get('/admin/profile', headers={'Authorization': 'wrong'})
+    assert response.status_code == 401
+
+
+def test_profile_returns_collapsed_stacks():
+    """
+    Test that the profiler endpoint returns collapsed stacks of the running threads.
+    """
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        response = TestClient(app).get(
+            '/admin/profile', params={'seconds': 0.05, 'interval_ms': 5}, headers={'Authorization': 'secret'}
+        )
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in response.text.splitlines())
+
+
+def test_profile_rejects_concurrent_requests():
+    """
+    Test that a profile requested while another one is being recorded is refused instead of queued.
+    """
+
+    async def request_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as http:
+            return await asyncio.gather(
+                *(
+                    http.get('/admin/profile', params={'seconds': 0.2}, headers={'Authorization': 'secret'})
+                    for _ in range(2)
+                )
+            )
+
+    with patch.object(settings, 'profiler_api_key', 'secret'):
+        responses = asyncio.run(request_twice())
+    assert sorted(response.status_code for response in responses) == [200, 409]